@@ -0,0 +1,411 @@
+"""
+インポートCLI共通のバッチ書き込みと入力の読み込み
+
+    limiter = AdaptiveRateLimiter(writerate, max_rate=max_writerate)
+    with ThrottledBatchWriter(client, table_name, limiter) as writer:
+        for item in items:
+            writer.put(item)
+
+BatchWriteItem(最大25件)でまとめて書き込み、書き込み速度は固定のsleepではなく
+消費キャパシティ(ReturnConsumedCapacity)とスロットリングの有無で調整する。
+    スロットリング・未処理アイテムあり → 速度を半分に
+    1秒間スロットリングなし             → 速度を上げる (max_rateまで)
+                                          最初のスロットリングまでは毎秒2倍、以降は1割ずつ
+max_rate を指定しなければ rate が上限で、指定した速度を超えては書き込まない
+（スロットリングで下げた速度を rate まで戻すだけ）。
+"""
+
+import csv
+import json
+import math
+import os
+import re
+import threading
+import time
+from decimal import Decimal
+
+BATCH_SIZE = 25
+CHUNK_SIZE = 64 * 1024
+WRITE_UNIT_BYTES = 1024
+THROTTLING_ERRORS = frozenset(
+    [
+        "ProvisionedThroughputExceededException",
+        "ThrottlingException",
+        "RequestLimitExceeded",
+    ]
+)
+
+# "id (N)" / "id(N)" のようなDynamoDBのCSVエクスポートのヘッダー
+_TYPED_HEADER = re.compile(
+    r"^\s*(?P<name>.+?)\s*\((?P<type>S|N|BOOL|NULL|L|M|SS|NS)\)\s*$"
+)
+
+
+class AdaptiveRateLimiter:
+    """
+    1秒あたりの書き込みキャパシティユニット(WCU)を上限にするトークンバケット。
+    複数スレッドの書き込みで1つを共有できる。max_rate を省略すると rate が上限
+    """
+
+    def __init__(
+        self,
+        rate,
+        max_rate=None,
+        min_rate=1.0,
+        increase=0.1,
+        decrease=0.5,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.max_rate = float(max_rate) if max_rate else float(rate)
+        self.rate = min(float(rate), self.max_rate)
+        self.min_rate = min(float(min_rate), self.rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.rate
+        self.slow_start = True
+        self._waited = False
+        self.throttles = 0
+        self.consumed = 0.0
+        self._updated = clock()
+        self._last_adjusted = self._updated
+        self._lock = threading.Lock()
+
+    def batch_size(self):
+        """1秒分の予算に収まる件数ずつ送ると書き込みが平らになる"""
+        return max(1, min(BATCH_SIZE, int(self.rate)))
+
+    def acquire(self, units):
+        """
+        unitsぶんのトークンが貯まるまで待つ。1秒分を超える要求は借りを作って通す。
+        先にトークンを差し引いてから待つので、複数スレッドでも到着順に並ぶ
+        """
+        with self._lock:
+            self._refill()
+            wait = max(0.0, (min(units, self.rate) - self.tokens) / self.rate)
+            self.tokens -= units
+            if wait:
+                self._waited = True
+        if wait:
+            self.sleep(wait)
+
+    def record(self, estimated, consumed):
+        """実際の消費量との差を精算し、スロットリングがなければ速度を上げる"""
+        with self._lock:
+            self.tokens += estimated - consumed
+            self.consumed += consumed
+            now = self.clock()
+            if now - self._last_adjusted >= 1:
+                # 速度制限で待たされていない(書き込み側が追いついていない)なら上げない
+                if self._waited:
+                    growth = 2 if self.slow_start else 1 + self.increase
+                    self.rate = min(self.max_rate, self.rate * growth)
+                self._waited = False
+                self._last_adjusted = now
+
+    def throttled(self):
+        with self._lock:
+            self.throttles += 1
+            self.slow_start = False
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = min(self.tokens, 0.0)
+            self._last_adjusted = self.clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.rate, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class ThrottledBatchWriter:
+    """
+    BatchWriteItemで書き込み・削除する。同じキーへの要求は後勝ちで1件にまとめる
+    （1回のBatchWriteItemに同じキーを2件入れるとValidationExceptionになるため）
+
+    client: boto3.resource("dynamodb").meta.client（Pythonの値のまま渡せるクライアント）
+    on_written: 書き込めたアイテム（削除はキー）のリストを受け取るコールバック
+    """
+
+    def __init__(
+        self,
+        client,
+        table_name,
+        limiter,
+        key_names=("chapter_code", "id"),
+        max_retries=10,
+        sleep=time.sleep,
+        on_written=None,
+    ):
+        self.client = client
+        self.table_name = table_name
+        self.limiter = limiter
+        self.key_names = key_names
+        self.max_retries = max_retries
+        self.sleep = sleep
+        self.on_written = on_written
+        self.written = 0
+        self.requests = 0
+        self._pending = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+    def key(self, item):
+        return tuple(item[name] for name in self.key_names)
+
+    def put(self, item):
+        self._add(self.key(item), {"PutRequest": {"Item": item}})
+
+    def delete(self, key):
+        """key: {"chapter_code": ..., "id": ...}"""
+        self._add(self.key(key), {"DeleteRequest": {"Key": key}})
+
+    def _add(self, key, request):
+        self._pending.pop(key, None)
+        self._pending[key] = request
+        if len(self._pending) >= self.limiter.batch_size():
+            self._send(self._take(self.limiter.batch_size()))
+
+    def flush(self):
+        while self._pending:
+            self._send(self._take(self.limiter.batch_size()))
+
+    def _take(self, size):
+        keys = list(self._pending)[:size]
+        return [self._pending.pop(key) for key in keys]
+
+    def _send(self, requests):
+        from botocore.exceptions import ClientError
+
+        attempt = 0
+        while requests:
+            estimated = sum(request_units(r) for r in requests)
+            self.limiter.acquire(estimated)
+            self.requests += 1
+            try:
+                response = self.client.batch_write_item(
+                    RequestItems={self.table_name: requests},
+                    ReturnConsumedCapacity="TOTAL",
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] not in THROTTLING_ERRORS:
+                    raise
+                self.limiter.record(estimated, 0)
+                unprocessed = requests
+            else:
+                unprocessed = response.get("UnprocessedItems", {}).get(
+                    self.table_name, []
+                )
+                self.limiter.record(estimated, consumed_units(response, estimated))
+                self.written += len(requests) - len(unprocessed)
+                if self.on_written is not None:
+                    self._notify(requests, unprocessed)
+            if not unprocessed:
+                return
+            attempt += 1
+            if attempt > self.max_retries:
+                raise RuntimeError(
+                    "{}件が書き込めませんでした(スロットリング)".format(
+                        len(unprocessed)
+                    )
+                )
+            self.limiter.throttled()
+            self.sleep(min(10.0, 0.05 * 2**attempt))
+            # 書き込めたものは送り直さない
+            requests = unprocessed
+
+    def _notify(self, requests, unprocessed):
+        left = {self.key(request_target(r)) for r in unprocessed}
+        self.on_written(
+            [
+                request_target(r)
+                for r in requests
+                if self.key(request_target(r)) not in left
+            ]
+        )
+
+
+def request_target(request):
+    """PutRequestならアイテム、DeleteRequestならキー"""
+    if "PutRequest" in request:
+        return request["PutRequest"]["Item"]
+    return request["DeleteRequest"]["Key"]
+
+
+def request_units(request):
+    # 削除は消すアイテムの大きさで決まるが、手元では分からないので1とみなす
+    if "PutRequest" in request:
+        return write_units(request["PutRequest"]["Item"])
+    return 1
+
+
+def write_units(item):
+    """アイテムサイズから書き込みキャパシティユニットを見積もる"""
+    size = len(json.dumps(item, ensure_ascii=False, default=str).encode("utf-8"))
+    return max(1, math.ceil(size / WRITE_UNIT_BYTES))
+
+
+def consumed_units(response, default):
+    capacity = response.get("ConsumedCapacity")
+    if not capacity:
+        return default
+    return sum(entry.get("CapacityUnits", 0) for entry in capacity)
+
+
+def parse_header(header):
+    """
+    ["chapter_code (S)", "id (N)", "q"]
+        -> [("chapter_code", "S"), ("id", "N"), ("q", None)]
+    """
+    columns = []
+    for column in header:
+        match = _TYPED_HEADER.match(column)
+        if match:
+            columns.append((match.group("name"), match.group("type")))
+        else:
+            columns.append((column.strip(), None))
+    return columns
+
+
+def convert_value(value, value_type):
+    """CSVのセルをヘッダーの型に変換する。型なしは文字列のまま"""
+    if value_type in (None, "S"):
+        return value
+    if value_type == "N":
+        number = Decimal(value)
+        return int(number) if number == number.to_integral_value() else number
+    if value_type == "BOOL":
+        return value.strip().lower() == "true"
+    if value_type == "NULL":
+        return None
+    decoded = json.loads(value, parse_float=Decimal)
+    if value_type == "L":
+        return [_from_json(v) for v in decoded]
+    if value_type == "M":
+        return {k: _from_json(v) for k, v in decoded.items()}
+    members = [_from_json(v) for v in decoded]
+    if value_type == "NS":
+        return {convert_value(str(v), "N") for v in members}
+    return set(members)
+
+
+def row_to_item(columns, row):
+    """空のセルはエクスポート時に属性がなかったものとして書き込まない"""
+    item = {}
+    for (name, value_type), value in zip(columns, row):
+        if value == "" and value_type not in (None, "S"):
+            continue
+        value = convert_value(value, value_type)
+        if isinstance(value, set) and not value:
+            # DynamoDBは空のセットを書き込めない
+            continue
+        item[name] = value
+    return item
+
+
+def iter_file_items(path, delimiter=","):
+    """拡張子でCSV / JSON(配列・JSON Lines)を読み分ける"""
+    if os.path.splitext(path)[1].lower() == ".csv":
+        with open(path, newline="") as f:
+            yield from iter_csv_items(f, delimiter)
+    else:
+        with open(path) as f:
+            yield from iter_json_items(f)
+
+
+def iter_csv_items(f, delimiter=","):
+    """1行目のヘッダー（属性名と型）に合わせて1行ずつアイテムにする"""
+    rows = csv.reader(f, delimiter=delimiter)
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = parse_header(header)
+    for row in rows:
+        yield row_to_item(columns, row)
+
+
+def iter_json_items(f, chunk_size=CHUNK_SIZE):
+    """
+    JSON配列 ([{...}, {...}]) とJSON Lines ({...}\\n{...}) のどちらも1件ずつ読む。
+    chunk_sizeずつ読み進めるのでファイル全体をメモリに載せない。
+    小数はboto3が受け付けるDecimalにする
+    """
+    decoder = json.JSONDecoder(parse_float=Decimal)
+    chunks = _Chunks(f, chunk_size)
+    closing = None
+    if chunks.skip(" \t\r\n") == "[":
+        chunks.pos += 1
+        closing = "]"
+    while True:
+        char = chunks.skip(" \t\r\n,")
+        if char is None:
+            if closing:
+                raise ValueError("JSON配列が閉じていません")
+            return
+        if char == closing:
+            return
+        yield chunks.decode(decoder)
+
+
+class _Chunks:
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+
+    def read_more(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            return False
+        # 読み終えた部分は捨てる
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def skip(self, chars):
+        """chars を読み飛ばして次の文字を返す。ファイルの終わりならNone"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in chars:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read_more():
+                return None
+
+    def decode(self, decoder):
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # 値がチャンクの境目で切れている
+                if not self.read_more():
+                    raise
+                continue
+            if end == len(self.buffer) and not isinstance(value, (dict, list)):
+                # 数値やリテラルは続きがあるかもしれない
+                if self.read_more():
+                    continue
+            self.pos = end
+            return value
+
+
+def _from_json(value):
+    # コンソールのエクスポートは [{"S": "..."}] のようなDynamoDB JSONで入っている
+    if isinstance(value, dict) and len(value) == 1:
+        ((value_type, data),) = value.items()
+        if value_type in ("S", "BOOL"):
+            return data
+        if value_type == "NULL":
+            return None
+        if value_type == "N":
+            return convert_value(str(data), "N")
+        if value_type in ("L", "M", "SS", "NS"):
+            return convert_value(json.dumps(data, default=str), value_type)
+    return value
@@ -0,0 +1,58 @@
+# Lambda側(lex-backend/handler/quiz_cache.py)の META_ID と合わせること
+META_ID = 0
+# ids が章のすべての問題idであることを示す属性。Lambdaはこれがないidsを使わない
+# （lex-backend/handler/quiz_repository.py の CATALOG_COMPLETE と合わせること）
+CATALOG_COMPLETE = "ids_complete"
+
+
+def update_catalog(table, chapter_ids, removed_ids=None):
+    """
+    書き込んだ章のメタ情報アイテム(id=0)を更新する。
+        version: 1つ進める。Lambdaのウォームコンテナはこの値の変化を見て章キャッシュを読み直す
+        ids: 章内の問題id(数値セット)。Lambdaはここから出題する問題を抽出する
+             書き込んだidを足すのではなく章のキーを読み直して作るので、
+             CLIより前に入れた問題やCLIを通さずに消した問題もそろう
+        ids_complete: ids を作り直したしるし
+    chapter_ids: {chapter_code: [id, ...]} 書き込んだ問題
+    removed_ids: {chapter_code: [id, ...]} 削除した問題
+    """
+    removed_ids = removed_ids or {}
+    versions = {}
+    for chapter_code in sorted(set(chapter_ids) | set(removed_ids)):
+        ids = chapter_item_ids(table, chapter_code)
+        values = {":one": 1, ":complete": True}
+        if ids:
+            expression = "SET ids = :ids, #complete = :complete ADD version :one"
+            values[":ids"] = ids
+        else:
+            # 空の数値セットは書き込めない
+            expression = "SET #complete = :complete REMOVE ids ADD version :one"
+        response = table.update_item(
+            Key={"chapter_code": chapter_code, "id": META_ID},
+            UpdateExpression=expression,
+            ExpressionAttributeNames={"#complete": CATALOG_COMPLETE},
+            ExpressionAttributeValues=values,
+            ReturnValues="UPDATED_NEW",
+        )
+        versions[chapter_code] = int(response["Attributes"]["version"])
+    return versions
+
+
+def chapter_item_ids(table, chapter_code):
+    """章内の問題idをキーだけのQueryで読む（書き込んだ直後なので強い整合性で読む）"""
+    query = {
+        "KeyConditionExpression": "chapter_code = :chapter_code AND id > :meta_id",
+        "ExpressionAttributeValues": {
+            ":chapter_code": chapter_code,
+            ":meta_id": META_ID,
+        },
+        "ProjectionExpression": "id",
+        "ConsistentRead": True,
+    }
+    ids = set()
+    while True:
+        response = table.query(**query)
+        ids.update(int(item["id"]) for item in response["Items"])
+        if "LastEvaluatedKey" not in response:
+            return ids
+        query["ExclusiveStartKey"] = response["LastEvaluatedKey"]
@@ -1,10 +1,14 @@
 import os
 import time
-from csv import reader
-from decimal import Decimal
+from collections import defaultdict
 
 import boto3
 import click
+from botocore.config import Config
+
+from batch_import import AdaptiveRateLimiter, ThrottledBatchWriter, iter_csv_items
+from content_version import update_catalog
+from incremental import incremental_options, open_plan
 
 
 @click.command()
@@ -21,13 +25,39 @@ import click
 @click.option("--region", "-r", nargs=1, help="DynamoDBに設置するリージョン")
 @click.option("--overwrite-endpoint", nargs=1, help="ローカルDynamoDBエンドポイント")
 @click.option(
-    "--writerate", default=5, type=int, nargs=1, help="WCU　1秒あたりの書き込む速度 (default:5)"
+    "--writerate",
+    default=5,
+    type=int,
+    nargs=1,
+    help="WCU　1秒あたりの書き込む速度 (default:5)",
+)
+@click.option(
+    "--max-writerate",
+    type=int,
+    nargs=1,
+    help="スロットリングがない間に上げてよい速度の上限 (default:--writerate)",
 )
-def cmd(csvfile, table, profile, region, overwrite_endpoint, writerate, delimiter):
+@incremental_options
+def cmd(
+    csvfile,
+    table,
+    profile,
+    region,
+    overwrite_endpoint,
+    writerate,
+    max_writerate,
+    delimiter,
+    incremental,
+    manifest,
+    delete_missing,
+    dry_run,
+):
     """
     DynamoDBのマネジメントコンソールでエクスポートしたCSVをインポートするPythonスクリプト\n
         [CSVFILE] CSVローカルパス\n
         [TABLE] ImportするDynamoDB テーブル名
+    ヘッダーの "id (N)" のような型指定に合わせて値を変換する（型なしは文字列）\n
+    --incremental なら前回から変わった問題だけを書き込む
     \f
 
     """
@@ -49,7 +79,9 @@ def cmd(csvfile, table, profile, region, overwrite_endpoint, writerate, delimite
         ]
         region = next(r for r in region_check if r)
     except StopIteration:
-        print("リージョンが設定されていないため、デフォルトap-northeast-1にセットします。")
+        print(
+            "リージョンが設定されていないため、デフォルトap-northeast-1にセットします。"
+        )
         region = "ap-northeast-1"
     session = boto3.session.Session(profile_name=profile, region_name=region)
 
@@ -58,33 +90,56 @@ def cmd(csvfile, table, profile, region, overwrite_endpoint, writerate, delimite
         endpointUrl = overwrite_endpoint
     else:
         endpointUrl = "https://dynamodb." + region + ".amazonaws.com"
-    dynamodb = session.resource("dynamodb", endpoint_url=endpointUrl)
+    # スロットリングはThrottledBatchWriterで速度を落として再送する
+    config = Config(retries={"mode": "standard", "max_attempts": 1})
+    dynamodb = session.resource("dynamodb", endpoint_url=endpointUrl, config=config)
     table = dynamodb.Table(table)
     print(endpointUrl)
 
+    plan = open_plan(table, incremental, manifest, delete_missing, dry_run)
+    if dry_run:
+        with open(csvfile, newline="") as csv_file:
+            for _ in plan.select(iter_csv_items(csv_file, str(delimiter))):
+                pass
+        plan.echo_summary(delete_missing, dry_run=True)
+        return
+
+    chapter_ids = defaultdict(set)
+    removed_ids = {}
+    limiter = AdaptiveRateLimiter(writerate, max_rate=max_writerate)
+    started = time.perf_counter()
     # DynamoDBに書き込む
-    with open(csvfile) as csv_file:
-        tokens = reader(csv_file, delimiter=str(delimiter))
-        print(tokens)
-        # ヘッダー
-        header = next(tokens)
-        # コンテンツ読み込む
-        for token in tokens:
-            print(token)
-            item = {}
-            for i, val in enumerate(token):
-                print("======")
-                print(val)
-                # DynamoDBの属性名はHeaderから取り出す
-                key = header[i]
-                # タイプがNumberの場合はCastが必要です。
-                # if val_type == "(N)" and val:
-                #     val = Decimal(val) if float(val) else int(val)
-                item[key] = val
-            table.put_item(Item=item)
+    with open(csvfile, newline="") as csv_file, ThrottledBatchWriter(
+        dynamodb.meta.client, table.name, limiter
+    ) as writer:
+        # ヘッダー（DynamoDBの属性名と型）に合わせて1行ずつ読み込む
+        items = iter_csv_items(csv_file, str(delimiter))
+        if plan is not None:
+            items = plan.select(items)
+        for item in items:
+            writer.put(item)
+            chapter_ids[item["chapter_code"]].add(item["id"])
+        if plan is not None:
+            removed_ids = plan.delete_removed(writer, delete_missing)
+    elapsed = time.perf_counter() - started
+    print(
+        "{}件 {:.1f}秒 ({:.1f}件/秒) WCU={:.1f} リクエスト={} スロットリング={}".format(
+            writer.written,
+            elapsed,
+            writer.written / elapsed if elapsed else 0,
+            limiter.consumed,
+            writer.requests,
+            limiter.throttles,
+        )
+    )
+    if plan is not None:
+        plan.echo_summary(delete_missing, dry_run=False)
+        plan.save(removed_ids)
 
-            # プロビジョンしたWCUと合わせる
-            time.sleep(1 / writerate)
+    # 章のカタログを更新し、Lambdaの章キャッシュを無効化する
+    versions = update_catalog(table, chapter_ids, removed_ids)
+    for chapter_code, version in versions.items():
+        print(f"{chapter_code}章 version={version}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,307 @@
+import glob
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import click
+import tqdm
+from botocore.config import Config
+
+from batch_import import AdaptiveRateLimiter, ThrottledBatchWriter, iter_file_items
+from content_version import update_catalog
+from incremental import incremental_options, open_plan
+
+PATTERNS = ("*.json", "*.jsonl", "*.ndjson", "*.csv")
+QUEUE_SIZE = 1000
+
+
+def expand_paths(paths):
+    """ディレクトリ・globパターン・ファイルをファイルの一覧にする"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in PATTERNS:
+                files.extend(glob.glob(os.path.join(path, pattern)))
+        elif glob.has_magic(path):
+            files.extend(glob.glob(path))
+        else:
+            files.append(path)
+    # 同じキーが複数のファイルにあるときは後のファイルが勝つ
+    return sorted(set(files))
+
+
+def iter_files_items(files, delimiter=","):
+    for path in files:
+        yield from iter_file_items(path, delimiter)
+
+
+class FileStats:
+    """ファイルごとの件数と、最初に読んでから最後に書き込むまでの時間"""
+
+    def __init__(self):
+        self.read = 0
+        self.written = 0
+        self.started = None
+        self.finished = None
+
+    def mark_read(self):
+        if self.started is None:
+            self.started = time.perf_counter()
+        self.read += 1
+
+    def mark_written(self, count):
+        self.finished = time.perf_counter()
+        self.written += count
+
+    def throughput(self):
+        if not self.written:
+            return 0.0
+        return self.written / max(self.finished - self.started, 1e-9)
+
+
+class ParallelImporter:
+    """
+    アイテムのキーでワーカーを決めて書き込む。同じキーは必ず同じワーカーの
+    ThrottledBatchWriterに入るので、ワーカー間で二重に書き込まれず、後勝ちの順序も保たれる。
+    速度はすべてのワーカーで1つのAdaptiveRateLimiterを共有する
+    （--max-writerate がなければ全ワーカー合計で --writerate を超えない）
+    """
+
+    def __init__(self, client, table_name, limiter, workers, on_written=None):
+        self.client = client
+        self.table_name = table_name
+        self.limiter = limiter
+        self.workers = workers
+        self.on_written = on_written
+        self.stats = defaultdict(FileStats)
+        self.writers = []
+        self._lock = threading.Lock()
+        self._queues = [queue.Queue(QUEUE_SIZE) for _ in range(workers)]
+        self._futures = []
+
+    def run(self, files, delimiter=",", plan=None, delete_missing=False):
+        """
+        plan: incremental.IncrementalPlan。変わった問題だけを書き込む
+        返り値: 書き込んだ問題と削除した問題の {chapter_code: [id, ...]}
+        """
+        chapter_ids = defaultdict(set)
+        removed_ids = {}
+        if plan is not None:
+            plan.scan(iter_files_items(files, delimiter))
+        with ThreadPoolExecutor(self.workers) as pool:
+            self._futures = [pool.submit(self._work, q) for q in self._queues]
+            try:
+                for path in files:
+                    for item in iter_file_items(path, delimiter):
+                        self.stats[path].mark_read()
+                        if plan is not None:
+                            item = plan.check(item)
+                            if item is None:
+                                continue
+                        chapter_ids[item["chapter_code"]].add(item["id"])
+                        self._route(path, item)
+                if plan is not None:
+                    removed_ids = plan.delete_removed(self, delete_missing)
+            finally:
+                for index in range(self.workers):
+                    self._put(index, None)
+            for future in self._futures:
+                future.result()
+        return chapter_ids, removed_ids
+
+    def delete(self, key):
+        self._route(None, key, delete=True)
+
+    def _route(self, path, item, delete=False):
+        key = (item["chapter_code"], item["id"])
+        self._put(hash(key) % self.workers, (path, item, delete))
+
+    def _put(self, index, entry):
+        # 書き込み側が例外で止まっていたらキューが空かないので待ち続けない
+        while True:
+            if self._futures[index].done():
+                self._futures[index].result()
+                return
+            try:
+                self._queues[index].put(entry, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def _work(self, items):
+        sources = {}  # key -> 読み込んだファイル
+
+        def written(done):
+            counts = defaultdict(int)
+            for item in done:
+                counts[sources.pop(writer.key(item))] += 1
+            with self._lock:
+                for path, count in counts.items():
+                    # 削除はファイルの件数に数えない
+                    if path is not None:
+                        self.stats[path].mark_written(count)
+            if self.on_written is not None:
+                self.on_written(len(done))
+
+        writer = ThrottledBatchWriter(
+            self.client, self.table_name, self.limiter, on_written=written
+        )
+        with self._lock:
+            self.writers.append(writer)
+        while True:
+            entry = items.get()
+            if entry is None:
+                break
+            path, item, delete = entry
+            sources[writer.key(item)] = path
+            if delete:
+                writer.delete(item)
+            else:
+                writer.put(item)
+        writer.flush()
+
+
+@click.command()
+@click.argument("paths", required=True, type=str, nargs=-1)
+@click.argument("table", required=True, type=str, nargs=1)
+@click.option("--profile", "-p", default="default", help="ローカルAWSプロフィール")
+@click.option("--region", "-r", nargs=1, help="DynamoDBに設置するリージョン")
+@click.option("--overwrite-endpoint", nargs=1, help="ローカルDynamoDBエンドポイント")
+@click.option(
+    "--writerate",
+    default=5,
+    type=int,
+    nargs=1,
+    help="WCU 全ワーカー合計で1秒あたりの書き込む速度(default:5)",
+)
+@click.option(
+    "--max-writerate",
+    type=int,
+    nargs=1,
+    help="スロットリングがない間に上げてよい速度の上限 (default:--writerate)",
+)
+@click.option(
+    "--workers", "-w", default=4, type=int, help="書き込むスレッド数 (default:4)"
+)
+@click.option(
+    "--delimiter",
+    "-d",
+    default=",",
+    nargs=1,
+    help="Delimiter for csv records (default=',')",
+)
+@incremental_options
+def cmd(
+    paths,
+    table,
+    profile,
+    region,
+    overwrite_endpoint,
+    writerate,
+    max_writerate,
+    workers,
+    delimiter,
+    incremental,
+    manifest,
+    delete_missing,
+    dry_run,
+):
+    """
+    ディレクトリ・globパターンに一致するJSON / JSON Lines / CSVをまとめてインポート
+        [PATHS] ディレクトリ、globパターン、またはファイル（複数可）\n
+        [TABLE] ImportするDynamoDB テーブル名\n
+    --incremental なら前回から変わった問題だけを書き込む
+    \f
+    """
+    # オプションをチェック
+    profile_check = [
+        profile,
+        os.environ.get("AWS_PROFILE"),
+        os.environ.get("AWS_DEFAULT_PROFILE"),
+    ]
+    profile = next(p for p in profile_check if p)
+    session = boto3.session.Session(profile_name=profile)
+
+    try:
+        region_check = [
+            region,
+            session.region_name,
+            os.environ.get("AWS_REGION"),
+            os.environ.get("AWS_DEFAULT_REGION"),
+        ]
+        region = next(r for r in region_check if r)
+    except StopIteration:
+        click.echo("リージョンが設定されていないため、デフォルトap-northeast-1にセット")
+        region = "ap-northeast-1"
+    session = boto3.session.Session(profile_name=profile, region_name=region)
+
+    # DynamoDB エンドポイントとテーブル名
+    if overwrite_endpoint:
+        endpointUrl = overwrite_endpoint
+    else:
+        endpointUrl = "https://dynamodb." + region + ".amazonaws.com"
+    # スロットリングはThrottledBatchWriterで速度を落として再送する
+    config = Config(
+        retries={"mode": "standard", "max_attempts": 1},
+        max_pool_connections=max(10, workers),
+    )
+    dynamodb = session.resource("dynamodb", endpoint_url=endpointUrl, config=config)
+    table = dynamodb.Table(table)
+    click.echo(endpointUrl)
+
+    files = expand_paths(paths)
+    if not files:
+        raise click.ClickException("インポートするファイルがありません")
+    plan = open_plan(table, incremental, manifest, delete_missing, dry_run)
+    if dry_run:
+        plan.scan(iter_files_items(files, str(delimiter)))
+        for _ in plan.select(iter_files_items(files, str(delimiter))):
+            pass
+        plan.echo_summary(delete_missing, dry_run=True)
+        return
+
+    limiter = AdaptiveRateLimiter(writerate, max_rate=max_writerate)
+    started = time.perf_counter()
+    with tqdm.tqdm(unit="item", desc="written") as progress:
+        importer = ParallelImporter(
+            dynamodb.meta.client, table.name, limiter, workers, progress.update
+        )
+        chapter_ids, removed_ids = importer.run(
+            files, str(delimiter), plan, delete_missing
+        )
+    elapsed = time.perf_counter() - started
+
+    for path in files:
+        stats = importer.stats[path]
+        click.echo(
+            "{}: 読み込み{}件 書き込み{}件 ({:.1f}件/秒)".format(
+                path, stats.read, stats.written, stats.throughput()
+            )
+        )
+    written = sum(writer.written for writer in importer.writers)
+    click.echo(
+        "合計 {}件 {:.1f}秒 ({:.1f}件/秒) WCU={:.1f} リクエスト={} スロットリング={}".format(
+            written,
+            elapsed,
+            written / elapsed if elapsed else 0,
+            limiter.consumed,
+            sum(writer.requests for writer in importer.writers),
+            limiter.throttles,
+        )
+    )
+    if plan is not None:
+        plan.echo_summary(delete_missing, dry_run=False)
+        plan.save(removed_ids)
+
+    # 章のカタログを更新し、Lambdaの章キャッシュを無効化する
+    versions = update_catalog(table, chapter_ids, removed_ids)
+    for chapter_code, version in versions.items():
+        click.echo(f"{chapter_code}章 version={version}")
+
+
+if __name__ == "__main__":
+    cmd()
@@ -0,0 +1,296 @@
+"""
+Image問題の画像を縮小・再圧縮した派生ファイルを作る（インポートの前に実行する）
+
+    python image_assets.py images/ thumbs/ --width 640 --quality 80 \\
+        --quizset quizset/ \\
+        --base-url https://lex-demo-buckets-qb.s3.amazonaws.com/thumbs/
+
+派生ファイルの名前は 元の名前 + 元画像と設定のハッシュ（例: 108E021.3f2a9c1b7d4e.jpg）。
+内容か設定が変わると名前も変わるので、CDNやクライアントのキャッシュを長くしても古い画像が出ない。
+
+出力先の manifest.json に元画像のサイズ・更新時刻・ハッシュと派生ファイル名を保存し、
+次の実行ではサイズ・更新時刻が同じなら読み直さず、ハッシュが同じなら作り直さない。
+縮小はプロセスプールで並列に行う。--quizset を指定すると問題ファイル(JSON配列・JSON Lines)の
+image を派生ファイルのURLに書き換える（書式はそのまま、image の値だけを置き換える）。
+
+Pillowが必要: pip install Pillow（または pip install -e .[images]）
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import click
+import tqdm
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # インポートCLIだけを使うときはPillowなしで動く
+    Image = ImageOps = None
+
+EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp")
+MANIFEST_NAME = "manifest.json"
+HASH_LENGTH = 12
+QUIZSET_PATTERNS = ("*.json", "*.jsonl", "*.ndjson")
+VARIANT = re.compile(r"^(?P<stem>.+)\.[0-9a-f]{%d}\.jpg$" % HASH_LENGTH)
+IMAGE_VALUE = re.compile(r'("image"\s*:\s*)"((?:[^"\\]|\\.)*)"')
+
+
+def settings_key(width, quality):
+    return "w{}q{}".format(width, quality)
+
+
+def source_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def variant_name(name, digest, width, quality):
+    """元画像と設定が同じなら同じ名前になる"""
+    stem = os.path.splitext(name)[0]
+    key = hashlib.sha256(
+        "{}:{}".format(digest, settings_key(width, quality)).encode("ascii")
+    ).hexdigest()
+    return "{}.{}.jpg".format(stem, key[:HASH_LENGTH])
+
+
+def render(source, destination, width, quality):
+    """縮小してJPEGで保存する（プロセスプールで実行する）。(元のバイト数, 派生のバイト数)"""
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        if image.width > width:
+            image = image.resize(
+                (width, max(1, round(image.height * width / image.width))),
+                Image.LANCZOS,
+            )
+        temporary = destination + ".tmp"
+        image.save(temporary, "JPEG", quality=quality, optimize=True, progressive=True)
+    os.replace(temporary, destination)
+    return os.path.getsize(source), os.path.getsize(destination)
+
+
+class ImageManifest:
+    """{"images": {元の名前: {"size", "mtime_ns", "hash", "file"}}}"""
+
+    def __init__(self, path):
+        self.path = path
+        self.images = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.images = json.load(f).get("images", {})
+
+    def cached_hash(self, name, stat):
+        """サイズと更新時刻が前回と同じなら前回のハッシュを返す"""
+        entry = self.images.get(name)
+        if (
+            entry
+            and entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return entry["hash"]
+        return None
+
+    def update(self, name, stat, digest, file):
+        self.images[name] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": digest,
+            "file": file,
+        }
+
+    def save(self):
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump({"images": self.images}, f, indent=2, sort_keys=True)
+        os.replace(temporary, self.path)
+
+
+def list_images(directory):
+    return sorted(
+        name
+        for name in os.listdir(directory)
+        if os.path.splitext(name)[1].lower() in EXTENSIONS
+    )
+
+
+def check_stems(names):
+    """
+    拡張子だけが違う元画像（108E021.jpg と 108E021.png など）は、以前の派生ファイルの
+    URLからどちらの画像か決められないので受け付けない
+    """
+    seen = {}
+    duplicates = []
+    for name in names:
+        stem = os.path.splitext(name)[0]
+        if stem in seen:
+            duplicates.append("{} / {}".format(seen[stem], name))
+        else:
+            seen[stem] = name
+    if duplicates:
+        raise click.ClickException(
+            "拡張子だけが違う元画像があります: " + ", ".join(duplicates)
+        )
+
+
+def plan(source_dir, output_dir, manifest, width, quality, names=None):
+    """
+    作り直す画像を決める。返り値: [(元の名前, stat, ハッシュ, 派生ファイル名, 作るか)]
+    派生ファイル名がすでに出力先にあれば作らない
+    """
+    names = list_images(source_dir) if names is None else names
+    check_stems(names)
+    tasks = []
+    for name in names:
+        path = os.path.join(source_dir, name)
+        stat = os.stat(path)
+        digest = manifest.cached_hash(name, stat) or source_hash(path)
+        file = variant_name(name, digest, width, quality)
+        build = not os.path.exists(os.path.join(output_dir, file))
+        tasks.append((name, stat, digest, file, build))
+    return tasks
+
+
+def build_variants(source_dir, output_dir, tasks, width, quality, workers):
+    """派生ファイルを並列に作り、(作った数, 元の合計バイト数, 派生の合計バイト数) を返す"""
+    todo = [task for task in tasks if task[4]]
+    totals = [0, 0, 0]
+    if not todo:
+        return tuple(totals)
+    if Image is None:
+        raise click.ClickException("画像の縮小にはPillowが必要です: pip install Pillow")
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [
+            pool.submit(
+                render,
+                os.path.join(source_dir, name),
+                os.path.join(output_dir, file),
+                width,
+                quality,
+            )
+            for name, _, _, file, _ in todo
+        ]
+        for future in tqdm.tqdm(as_completed(futures), total=len(futures)):
+            original, resized = future.result()
+            totals[0] += 1
+            totals[1] += original
+            totals[2] += resized
+    return tuple(totals)
+
+
+def rewrite_image_url(url, files, base_url):
+    """元画像・以前の派生ファイルのどちらを指していても今の派生ファイルのURLにする"""
+    name = url.rsplit("/", 1)[-1]
+    file = files.get(name)
+    if file is None:
+        match = VARIANT.match(name)
+        if match is not None:
+            stems = {os.path.splitext(source)[0]: f for source, f in files.items()}
+            file = stems.get(match.group("stem"))
+    return url if file is None else base_url + file
+
+
+def rewrite_quizset(path, files, base_url, dry_run=False):
+    """問題ファイルの image を書き換え、書き換えた数を返す"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    changed = 0
+
+    def replace(match):
+        nonlocal changed
+        url = json.loads('"{}"'.format(match.group(2)))
+        new_url = rewrite_image_url(url, files, base_url)
+        if new_url == url:
+            return match.group(0)
+        changed += 1
+        return match.group(1) + json.dumps(new_url, ensure_ascii=False)
+
+    text = IMAGE_VALUE.sub(replace, text)
+    if changed and not dry_run:
+        temporary = path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temporary, path)
+    return changed
+
+
+def expand_quizsets(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in QUIZSET_PATTERNS:
+                files.extend(glob.glob(os.path.join(path, pattern)))
+        else:
+            files.extend(glob.glob(path) if glob.has_magic(path) else [path])
+    return sorted(set(files))
+
+
+@click.command()
+@click.argument("source_dir", type=click.Path(exists=True, file_okay=False))
+@click.argument("output_dir", type=click.Path(file_okay=False))
+@click.option("--width", default=640, type=int, help="最大の幅(px) (default:640)")
+@click.option("--quality", default=80, type=int, help="JPEGの品質 (default:80)")
+@click.option(
+    "--workers", default=os.cpu_count() or 1, type=int, help="縮小するプロセス数"
+)
+@click.option(
+    "--quizset",
+    multiple=True,
+    help="image を書き換える問題ファイル・ディレクトリ・glob（複数指定可）",
+)
+@click.option("--base-url", help="派生ファイルを置くURL（末尾の / まで）")
+@click.option("--dry-run", is_flag=True, help="作る画像と書き換える数を表示するだけ")
+def cmd(source_dir, output_dir, width, quality, workers, quizset, base_url, dry_run):
+    """
+    Image問題の画像を縮小し、問題ファイルの image を書き換える
+        [SOURCE_DIR] 元画像のディレクトリ\n
+        [OUTPUT_DIR] 派生ファイルと manifest.json の出力先（S3などに同期する）
+    \f
+    """
+    if quizset and not base_url:
+        raise click.UsageError("--quizset には --base-url が必要です")
+    if base_url and not base_url.endswith("/"):
+        base_url += "/"
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = ImageManifest(os.path.join(output_dir, MANIFEST_NAME))
+    tasks = plan(source_dir, output_dir, manifest, width, quality)
+    todo = sum(1 for task in tasks if task[4])
+    click.echo(
+        "画像{}件 作成{}件 変更なし{}件".format(len(tasks), todo, len(tasks) - todo)
+    )
+
+    if not dry_run:
+        built, original, resized = build_variants(
+            source_dir, output_dir, tasks, width, quality, workers
+        )
+        if built:
+            click.echo(
+                "{}件の画像を作成: {:.1f} KB -> {:.1f} KB".format(
+                    built, original / 1024, resized / 1024
+                )
+            )
+        # 元画像がなくなったものはマニフェストから外す
+        manifest.images = {}
+        for name, stat, digest, file, _ in tasks:
+            manifest.update(name, stat, digest, file)
+        manifest.save()
+
+    files = {name: file for name, _, _, file, _ in tasks}
+    for path in expand_quizsets(quizset):
+        changed = rewrite_quizset(path, files, base_url, dry_run)
+        click.echo(
+            "{}: 画像{}件を{}".format(
+                path, changed, "書き換え予定" if dry_run else "書き換え"
+            )
+        )
+
+
+if __name__ == "__main__":
+    cmd()
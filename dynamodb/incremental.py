@@ -0,0 +1,282 @@
+"""
+差分インポート
+
+問題ごとに内容のハッシュを (chapter_code, id) 単位で持ち、前回から変わった問題だけを書き込む。
+前回のハッシュは次のどちらかから読む。
+    --manifest PATH  ローカルのマニフェスト(JSON)。インポート後に更新する
+    指定なし         テーブルに保存した content_hash 属性（入力に含まれる章だけQueryする）
+
+--delete-missing を付けると入力にない問題を削除する。どちらの場合も入力に含まれる章だけが
+対象で、1章分のファイルを取り込んでもマニフェストにある他の章は消さない。--dry-run は差分を表示するだけで書き込まない。
+--manifest / --delete-missing / --dry-run だけを指定しても差分インポートになる。
+"""
+
+import hashlib
+import json
+import os
+from collections import defaultdict
+from decimal import Decimal
+
+import click
+
+from content_version import META_ID
+
+HASH_ATTRIBUTE = "content_hash"
+DIFF_LINES = 50
+
+
+def incremental_options(command):
+    """差分インポートのオプションをCLIに追加する"""
+    options = [
+        click.option(
+            "--incremental",
+            is_flag=True,
+            help="前回から変わった問題だけを書き込む",
+        ),
+        click.option(
+            "--manifest",
+            type=click.Path(dir_okay=False),
+            help="前回のハッシュを保存するローカルのマニフェスト(JSON)",
+        ),
+        click.option(
+            "--delete-missing",
+            is_flag=True,
+            help="入力にない問題を削除する",
+        ),
+        click.option(
+            "--dry-run",
+            is_flag=True,
+            help="差分を表示するだけで書き込まない",
+        ),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+def content_hash(item):
+    """属性の順番・数値の書き方・セットの順番によらないハッシュ"""
+    body = {k: _canonical(v) for k, v in item.items() if k != HASH_ATTRIBUTE}
+    text = json.dumps(body, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _canonical(value):
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float, Decimal)):
+        number = Decimal(str(value)).normalize()
+        return {"N": "{:f}".format(number)}
+    if isinstance(value, (set, frozenset)):
+        return {"set": sorted(json.dumps(_canonical(v), sort_keys=True) for v in value)}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _canonical(v) for k, v in value.items()}
+    return str(value)
+
+
+class ManifestHashes:
+    """ローカルのマニフェスト {"table": ..., "items": {chapter_code: {id: hash}}}"""
+
+    def __init__(self, path, table_name):
+        self.path = path
+        self.table_name = table_name
+        self.hashes = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+            if manifest.get("table") not in (None, table_name):
+                raise click.ClickException(
+                    "マニフェスト{}は{}テーブル用です".format(path, manifest["table"])
+                )
+            self.hashes = {
+                chapter_code: {int(q_id): h for q_id, h in items.items()}
+                for chapter_code, items in manifest.get("items", {}).items()
+            }
+
+    def chapter(self, chapter_code):
+        return self.hashes.get(chapter_code, {})
+
+    def chapters(self):
+        return list(self.hashes)
+
+    def save(self, plan, deleted):
+        for chapter_code, items in plan.current.items():
+            self.hashes.setdefault(chapter_code, {}).update(items)
+        for chapter_code, q_id in deleted:
+            self.hashes.get(chapter_code, {}).pop(q_id, None)
+        manifest = {
+            "table": self.table_name,
+            "items": {
+                chapter_code: {str(q_id): h for q_id, h in sorted(items.items())}
+                for chapter_code, items in sorted(self.hashes.items())
+                if items
+            },
+        }
+        # 途中で止まっても壊れたマニフェストを残さない
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(temporary, self.path)
+
+
+class StoredHashes:
+    """テーブルの content_hash 属性。章ごとに初めて必要になったときにQueryする"""
+
+    def __init__(self, table):
+        self.table = table
+        self.hashes = {}
+
+    def chapter(self, chapter_code):
+        if chapter_code not in self.hashes:
+            self.hashes[chapter_code] = self._load(chapter_code)
+        return self.hashes[chapter_code]
+
+    def chapters(self):
+        return list(self.hashes)
+
+    def save(self, plan, deleted):
+        pass
+
+    def _load(self, chapter_code):
+        hashes = {}
+        kwargs = {
+            "KeyConditionExpression": "chapter_code = :chapter_code AND id > :meta_id",
+            "ProjectionExpression": "id, #hash",
+            "ExpressionAttributeNames": {"#hash": HASH_ATTRIBUTE},
+            "ExpressionAttributeValues": {
+                ":chapter_code": chapter_code,
+                ":meta_id": META_ID,
+            },
+        }
+        while True:
+            response = self.table.query(**kwargs)
+            for item in response["Items"]:
+                # content_hash がない問題は変わったものとして扱う
+                hashes[int(item["id"])] = item.get(HASH_ATTRIBUTE)
+            if "LastEvaluatedKey" not in response:
+                return hashes
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+class IncrementalPlan:
+    def __init__(self, previous):
+        self.previous = previous
+        self.current = defaultdict(dict)  # chapter_code -> {id: hash}
+        self.added = set()
+        self.changed = set()
+        self.unchanged = set()
+        self.removed_keys = None
+        self._final = None
+        self._written = set()
+
+    def scan(self, items):
+        """
+        入力を先に読み、キーごとに最後に出てくる内容のハッシュを覚えておく。
+        複数のファイルに同じキーがあるとき、後のファイルで上書きされるものを書き込まない
+        """
+        self._final = {}
+        for item in items:
+            key = (item["chapter_code"], int(item["id"]))
+            self._final[key] = content_hash(item)
+
+    def select(self, items):
+        """変わった問題だけに content_hash を付けて返す"""
+        for item in items:
+            item = self.check(item)
+            if item is not None:
+                yield item
+
+    def check(self, item):
+        """書き込む必要があれば content_hash を付けたアイテム、なければNone"""
+        chapter_code, q_id = item["chapter_code"], int(item["id"])
+        key = (chapter_code, q_id)
+        digest = content_hash(item)
+        if self._final is not None and (
+            self._final.get(key) != digest or key in self._written
+        ):
+            return None
+        self.current[chapter_code][q_id] = digest
+        previous = self.previous.chapter(chapter_code)
+        for keys in (self.added, self.changed, self.unchanged):
+            keys.discard(key)
+        if q_id not in previous:
+            self.added.add(key)
+        elif previous[q_id] != digest:
+            self.changed.add(key)
+        else:
+            self.unchanged.add(key)
+            # 入力内で同じキーが重複し、先のものを書き込んでいたら戻す
+            if key not in self._written:
+                return None
+        self._written.add(key)
+        return dict(item, **{HASH_ATTRIBUTE: digest})
+
+    def removed(self):
+        """
+        前回あって今回の入力にない問題。入力を最後まで読んでから呼ぶ。
+        入力に含まれない章は対象にしない
+        """
+        removed = []
+        for chapter_code in sorted(self.previous.chapters()):
+            current = self.current.get(chapter_code)
+            if not current:
+                continue
+            removed.extend(
+                (chapter_code, q_id)
+                for q_id in sorted(self.previous.chapter(chapter_code))
+                if q_id not in current
+            )
+        return removed
+
+    def delete_removed(self, writer, delete):
+        """入力にない問題を（deleteなら）削除し、{chapter_code: [id, ...]} を返す"""
+        removed_ids = defaultdict(list)
+        self.removed_keys = self.removed()
+        if delete:
+            for chapter_code, q_id in self.removed_keys:
+                writer.delete({"chapter_code": chapter_code, "id": q_id})
+                removed_ids[chapter_code].append(q_id)
+        return removed_ids
+
+    def save(self, deleted_ids):
+        """書き込みが終わってから前回のハッシュとして保存する"""
+        self.previous.save(
+            self,
+            [(c, q_id) for c, q_ids in deleted_ids.items() for q_id in q_ids],
+        )
+
+    def echo_summary(self, delete, dry_run):
+        removed = self.removed_keys
+        if removed is None:
+            removed = self.removed()
+        click.echo(
+            "追加{}件 変更{}件 変更なし{}件 {}{}件".format(
+                len(self.added),
+                len(self.changed),
+                len(self.unchanged),
+                "削除" if delete else "入力にない(削除しない)",
+                len(removed),
+            )
+        )
+        if not dry_run:
+            return
+        for mark, keys in (
+            ("+", sorted(self.added)),
+            ("~", sorted(self.changed)),
+            ("-", removed),
+        ):
+            for chapter_code, q_id in keys[:DIFF_LINES]:
+                click.echo("{} {}/{}".format(mark, chapter_code, q_id))
+            if len(keys) > DIFF_LINES:
+                click.echo("{} ... 他{}件".format(mark, len(keys) - DIFF_LINES))
+
+
+def open_plan(table, incremental, manifest, delete_missing, dry_run):
+    """差分インポートでなければNone。--manifest などは --incremental を含む"""
+    if not (incremental or manifest or delete_missing or dry_run):
+        return None
+    if manifest:
+        return IncrementalPlan(ManifestHashes(manifest, table.name))
+    return IncrementalPlan(StoredHashes(table))
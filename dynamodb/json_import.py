@@ -1,10 +1,15 @@
-import json
 import os
 import time
+from collections import defaultdict
 
 import boto3
 import click
 import tqdm
+from botocore.config import Config
+
+from batch_import import AdaptiveRateLimiter, ThrottledBatchWriter, iter_json_items
+from content_version import update_catalog
+from incremental import incremental_options, open_plan
 
 
 @click.command()
@@ -14,13 +19,38 @@ import tqdm
 @click.option("--region", "-r", nargs=1, help="DynamoDBに設置するリージョン")
 @click.option("--overwrite-endpoint", nargs=1, help="ローカルDynamoDBエンドポイント")
 @click.option(
-    "--writerate", default=5, type=int, nargs=1, help="WCU 1秒あたりの書き込む速度(default:5)"
+    "--writerate",
+    default=5,
+    type=int,
+    nargs=1,
+    help="WCU 1秒あたりの書き込む速度(default:5)",
+)
+@click.option(
+    "--max-writerate",
+    type=int,
+    nargs=1,
+    help="スロットリングがない間に上げてよい速度の上限 (default:--writerate)",
 )
-def cmd(jsonfile, table, profile, region, overwrite_endpoint, writerate):
+@incremental_options
+def cmd(
+    jsonfile,
+    table,
+    profile,
+    region,
+    overwrite_endpoint,
+    writerate,
+    max_writerate,
+    incremental,
+    manifest,
+    delete_missing,
+    dry_run,
+):
     """
     JSONファイルをDynamoDBにインポート
-        [JSONFILE] jsonローカルパス\n
+        [JSONFILE] jsonローカルパス（JSON配列またはJSON Lines）\n
         [TABLE] ImportするDynamoDB テーブル名
+    ファイルは少しずつ読むので大きなファイルでもメモリを使わない\n
+    --incremental なら前回から変わった問題だけを書き込む
     \f
     """
     # オプションをチェック
@@ -50,15 +80,52 @@ def cmd(jsonfile, table, profile, region, overwrite_endpoint, writerate):
         endpointUrl = overwrite_endpoint
     else:
         endpointUrl = "https://dynamodb." + region + ".amazonaws.com"
-    dynamodb = session.resource("dynamodb", endpoint_url=endpointUrl)
+    # スロットリングはThrottledBatchWriterで速度を落として再送する
+    config = Config(retries={"mode": "standard", "max_attempts": 1})
+    dynamodb = session.resource("dynamodb", endpoint_url=endpointUrl, config=config)
     table = dynamodb.Table(table)
     click.echo(endpointUrl)
-    items = json.load(jsonfile)
-    # DynamoDBに書き込む
-    with table.batch_writer() as batch:
+    plan = open_plan(table, incremental, manifest, delete_missing, dry_run)
+    items = iter_json_items(jsonfile)
+    if plan is not None:
+        items = plan.select(items)
+    if dry_run:
+        for _ in items:
+            pass
+        plan.echo_summary(delete_missing, dry_run=True)
+        return
+
+    chapter_ids = defaultdict(set)
+    removed_ids = {}
+    limiter = AdaptiveRateLimiter(writerate, max_rate=max_writerate)
+    started = time.perf_counter()
+    # DynamoDBに書き込む（速度の調整は25件までのバッチごと）
+    with ThrottledBatchWriter(
+        dynamodb.meta.client, table.name, limiter
+    ) as writer, tqdm.tqdm(unit="item", desc=jsonfile.name) as progress:
         for item in items:
-            print(item)
-            batch.put_item(Item=item)
+            writer.put(item)
+            chapter_ids[item["chapter_code"]].add(item["id"])
+            progress.update()
+            progress.set_postfix(wcu="{:.0f}/s".format(limiter.rate), refresh=False)
+        if plan is not None:
+            removed_ids = plan.delete_removed(writer, delete_missing)
+    elapsed = time.perf_counter() - started
+    click.echo(
+        "{}件 {:.1f}秒 ({:.1f}件/秒) WCU={:.1f} リクエスト={} スロットリング={}".format(
+            writer.written,
+            elapsed,
+            writer.written / elapsed if elapsed else 0,
+            limiter.consumed,
+            writer.requests,
+            limiter.throttles,
+        )
+    )
+    if plan is not None:
+        plan.echo_summary(delete_missing, dry_run=False)
+        plan.save(removed_ids)
 
-            # プロビジョンしたWCUと合わせる
-            time.sleep(1 / writerate)
+    # 章のカタログを更新し、Lambdaの章キャッシュを無効化する
+    versions = update_catalog(table, chapter_ids, removed_ids)
+    for chapter_code, version in versions.items():
+        click.echo(f"{chapter_code}章 version={version}")
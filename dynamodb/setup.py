@@ -3,9 +3,24 @@ from setuptools import setup
 setup(
     name="cli-tools",
     version="1.0",
-    py_modules=["csv_import"],
+    py_modules=[
+        "csv_import",
+        "json_import",
+        "dir_import",
+        "content_version",
+        "batch_import",
+        "incremental",
+        "image_assets",
+    ],
     install_requires=["boto3", "click", "tqdm"],
+    # 画像の縮小(image_assets)だけで使う
+    extras_require={"images": ["Pillow"]},
     entry_points={
-        "console_scripts": ["import_csv=csv_import:cmd", "import_json=json_import:cmd"]
+        "console_scripts": [
+            "import_csv=csv_import:cmd",
+            "import_json=json_import:cmd",
+            "import_dir=dir_import:cmd",
+            "build_images=image_assets:cmd",
+        ]
     },  # greetingsコマンド=greeterモジュールのgreetメソッド
 )
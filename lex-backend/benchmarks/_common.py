@@ -0,0 +1,43 @@
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HANDLER_DIR = os.path.join(ROOT_DIR, "handler")
+DYNAMODB_DIR = os.path.join(os.path.dirname(ROOT_DIR), "dynamodb")
+QUIZSET_DIR = os.path.join(DYNAMODB_DIR, "quizset")
+
+if HANDLER_DIR not in sys.path:
+    sys.path.insert(0, HANDLER_DIR)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(func, repeat):
+    """funcをrepeat回実行して各回の所要時間(ms)を返す"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    print(
+        "{:<36} n={:<6} mean={:8.3f}ms p50={:8.3f}ms p95={:8.3f}ms p99={:8.3f}ms".format(
+            label,
+            len(samples),
+            statistics.fmean(samples),
+            percentile(samples, 50),
+            percentile(samples, 95),
+            percentile(samples, 99),
+        )
+    )
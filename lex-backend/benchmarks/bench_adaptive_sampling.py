@@ -0,0 +1,72 @@
+"""
+苦手度で重み付けした出題(handler/adaptive.py)の抽出時間
+
+    python -m benchmarks.bench_adaptive_sampling [--chapter-size 50000] [--k 10]
+
+章の問題数 --chapter-size のうち --weak-ratio を苦手（重み 1 + MAX_LEVEL）にして、
+重複なしでk問引く時間を比べる。
+    cumulative scan   1問引くたびに累積和を作り直して線形に探す: O(k n)
+    fenwick           sampling.weighted_sample: O(n + k log n)
+"""
+
+import argparse
+import bisect
+import itertools
+import random
+
+from benchmarks._common import measure, report
+
+import adaptive  # noqa: E402
+from sampling import weighted_sample  # noqa: E402
+
+
+def cumulative_sample(items, weights, k, rng):
+    weights = list(weights)
+    picked = []
+    while len(picked) < k:
+        sums = list(itertools.accumulate(weights))
+        if not sums or sums[-1] <= 0:
+            break
+        index = bisect.bisect_right(sums, rng.random() * sums[-1])
+        index = min(index, len(items) - 1)
+        picked.append(items[index])
+        weights[index] = 0
+    return picked
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chapter-size", type=int, default=50000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--weak-ratio", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    ids = list(range(1, args.chapter_size + 1))
+    weak = set(rng.sample(ids, int(len(ids) * args.weak_ratio)))
+    profile = adaptive.WeaknessProfile({q_id: adaptive.MAX_LEVEL for q_id in weak})
+    weights = [profile.weight(q_id) for q_id in ids]
+
+    for label, sample in (
+        ("cumulative scan", cumulative_sample),
+        ("fenwick", weighted_sample),
+    ):
+        picked = []
+        report(
+            label,
+            measure(
+                lambda: picked.extend(sample(ids, weights, args.k, rng)),
+                args.repeat,
+            ),
+        )
+        share = sum(q_id in weak for q_id in picked) / len(picked)
+        print(
+            "  苦手な問題の割合 {:.1%}（章全体では {:.1%}）".format(
+                share, args.weak_ratio
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
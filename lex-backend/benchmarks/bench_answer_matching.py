@@ -0,0 +1,88 @@
+"""
+回答判定: リストへの in 判定 と 正規化済みsetによる判定の比較
+
+    python -m benchmarks.bench_answer_matching [--answers 500]
+
+dynamodb/quizset/*.json の全問題について、正解・表記ゆれ・不正解の回答を判定する。
+--answers で解答リストを水増しした場合(大きな解答リスト)も計測する。
+"""
+
+import argparse
+import glob
+import json
+import os
+
+from benchmarks._common import QUIZSET_DIR, measure, report
+
+import answer_matcher  # noqa: E402
+
+
+def load_quizset():
+    items = []
+    for path in sorted(glob.glob(os.path.join(QUIZSET_DIR, "*.json"))):
+        with open(path) as f:
+            items.extend(json.load(f))
+    return items
+
+
+def grading_cases(items):
+    cases = []
+    for item in items:
+        for answer in item["a"][:2]:
+            cases.append((item, answer))
+            cases.append((item, answer.upper()))
+        cases.append((item, "わからない"))
+    return cases
+
+
+def legacy_judge(quiz, answer):
+    if answer in quiz["a"]:
+        return answer_matcher.CORRECT
+    if answer in quiz["secondary_a"]:
+        return answer_matcher.NEAR_MISS
+    return answer_matcher.INCORRECT
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--answers", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    items = load_quizset()
+    cases = grading_cases(items)
+    padded = [
+        dict(item, a=["dummy{}".format(i) for i in range(args.answers)] + item["a"])
+        for item in items
+    ]
+    padded_cases = grading_cases(padded)
+
+    legacy_hits = sum(legacy_judge(q, a) == answer_matcher.CORRECT for q, a in cases)
+    new_hits = sum(
+        answer_matcher.judge(q, a) == answer_matcher.CORRECT for q, a in cases
+    )
+    print(
+        "{} answers, correct: list in={} normalized={}".format(
+            len(cases), legacy_hits, new_hits
+        )
+    )
+
+    def run(judge, graded):
+        def grade_all():
+            for quiz, answer in graded:
+                judge(quiz, answer)
+
+        return grade_all
+
+    report("quizset: list in", measure(run(legacy_judge, cases), args.repeat))
+    report("quizset: compiled", measure(run(answer_matcher.judge, cases), args.repeat))
+    label = "{} answers/item".format(args.answers)
+    report(label + ": list in", measure(run(legacy_judge, padded_cases), args.repeat))
+    report(
+        label + ": compiled",
+        measure(run(answer_matcher.judge, padded_cases), args.repeat),
+    )
+
+
+if __name__ == "__main__":
+    main()
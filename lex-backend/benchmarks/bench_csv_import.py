@@ -0,0 +1,134 @@
+"""
+csv_import の書き込み速度(件/秒)の計測
+
+    python -m benchmarks.bench_csv_import [--rows 2000] [--write-capacity 100]
+        [--writerate 5] [--endpoint http://localhost:8000]
+
+--endpoint を省略すると、1秒あたり --write-capacity WCUを超えるとスロットリングする
+インメモリのDynamoDB代替をHTTPで起動し、--overwrite-endpoint に渡す。
+DynamoDB Localなど実際のエンドポイントを指定した場合はテーブルがなければ作る。
+"""
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks._common import DYNAMODB_DIR
+
+if DYNAMODB_DIR not in sys.path:
+    sys.path.insert(0, DYNAMODB_DIR)
+
+TABLE_NAME = "QuizImportBench"
+HEADER = ["chapter_code (S)", "id (N)", "kind (S)", "q (S)", "a (L)", "comment (S)"]
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for i in range(rows):
+            writer.writerow(
+                [
+                    "ABC"[i % 3],
+                    i // 3 + 1,
+                    "ChoiceBool",
+                    "問題文{}：腸軸捻転は，S状結腸に生じることが最も多い？".format(i),
+                    '[{"S": "はい"}]',
+                    "コメント" * 20,
+                ]
+            )
+
+
+def write_aws_config(directory):
+    """--profile default で読めるダミーの認証情報"""
+    config = os.path.join(directory, "config")
+    credentials = os.path.join(directory, "credentials")
+    with open(config, "w") as f:
+        f.write("[default]\nregion = us-east-1\n")
+    with open(credentials, "w") as f:
+        f.write("[default]\naws_access_key_id = local\naws_secret_access_key = local\n")
+    os.environ["AWS_CONFIG_FILE"] = config
+    os.environ["AWS_SHARED_CREDENTIALS_FILE"] = credentials
+
+
+def ensure_table(endpoint):
+    import boto3
+
+    client = boto3.client("dynamodb", endpoint_url=endpoint, region_name="us-east-1")
+    if TABLE_NAME in client.list_tables()["TableNames"]:
+        return
+    client.create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[
+            {"AttributeName": "chapter_code", "KeyType": "HASH"},
+            {"AttributeName": "id", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "chapter_code", "AttributeType": "S"},
+            {"AttributeName": "id", "AttributeType": "N"},
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--write-capacity", type=int, default=100)
+    parser.add_argument("--writerate", type=int, default=5)
+    parser.add_argument("--max-writerate", type=int)
+    parser.add_argument("--endpoint")
+    args = parser.parse_args()
+
+    import csv_import
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_aws_config(directory)
+        path = os.path.join(directory, "quiz.csv")
+        write_csv(path, args.rows)
+
+        local = None
+        endpoint = args.endpoint
+        if endpoint is None:
+            from benchmarks.local_dynamodb import LocalDynamoDB
+
+            local = LocalDynamoDB(write_capacity=args.write_capacity)
+            local.create_table(TABLE_NAME, "chapter_code", "id")
+            server = local.serve()
+            endpoint = "http://{}:{}".format(*server.server_address)
+        else:
+            ensure_table(endpoint)
+
+        options = [path, TABLE_NAME, "--region", "us-east-1"]
+        options += ["--overwrite-endpoint", endpoint]
+        options += ["--writerate", str(args.writerate)]
+        if args.max_writerate:
+            options += ["--max-writerate", str(args.max_writerate)]
+        started = time.perf_counter()
+        csv_import.cmd.main(options, standalone_mode=False)
+        elapsed = time.perf_counter() - started
+
+    print(
+        "batched + adaptive: {} rows in {:.2f}s = {:.1f} items/s".format(
+            args.rows, elapsed, args.rows / elapsed
+        )
+    )
+    print(
+        "put_item per row + sleep(1/{}): about {:.1f}s = {} items/s".format(
+            args.writerate, args.rows / args.writerate, args.writerate
+        )
+    )
+    if local is not None:
+        server.shutdown()
+        print(
+            "server: WCU limit {}/s, calls {}, throttled {}".format(
+                args.write_capacity, dict(local.calls), dict(local.throttled)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+dir_import の並列書き込みの計測
+
+    python -m benchmarks.bench_dir_import [--files 8] [--items 2000]
+        [--workers 1,4,8] [--write-capacity 2000]
+
+--files 個のJSON Linesファイル（一部のキーはファイル間で重複）を作り、ワーカー数ごとに
+dir_import で書き込む。スロットリングするインメモリのDynamoDB代替をHTTPで起動し、
+件/秒と、再送で書き込みが重複していないか（サーバーが受け付けた書き込み件数 = 読み込んだ件数）
+を表示する。--latency-ms でリクエストごとのネットワーク遅延を模す。
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.bench_csv_import import TABLE_NAME, write_aws_config
+from benchmarks.local_dynamodb import LocalDynamoDB
+
+
+def write_files(directory, files, items):
+    keys = set()
+    for index in range(files):
+        with open(os.path.join(directory, "quiz{:02}.jsonl".format(index)), "w") as f:
+            for i in range(items):
+                # 10件に1件は前のファイルと同じキーにする（後のファイルが勝つ）
+                q_id = index * items + i if i % 10 else max(0, index - 1) * items + i
+                item = {
+                    "chapter_code": "ABC"[q_id % 3],
+                    "id": q_id + 1,
+                    "kind": "ChoiceBool",
+                    "q": "問題文{}-{}".format(index, i),
+                    "a": ["はい"],
+                }
+                keys.add((item["chapter_code"], item["id"]))
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+    return keys
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--workers", default="1,4,8")
+    parser.add_argument("--write-capacity", type=int, default=2000)
+    parser.add_argument("--writerate", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    import dir_import
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_aws_config(directory)
+        data_dir = os.path.join(directory, "quizset")
+        os.mkdir(data_dir)
+        keys = write_files(data_dir, args.files, args.items)
+
+        results = []
+        for workers in [int(w) for w in args.workers.split(",")]:
+            local = LocalDynamoDB(write_capacity=args.write_capacity)
+            local.create_table(TABLE_NAME, "chapter_code", "id")
+            server = local.serve(latency=args.latency_ms / 1000)
+            started = time.perf_counter()
+            dir_import.cmd.main(
+                [
+                    data_dir,
+                    TABLE_NAME,
+                    "--region",
+                    "us-east-1",
+                    "--overwrite-endpoint",
+                    "http://{}:{}".format(*server.server_address),
+                    "--writerate",
+                    str(args.writerate),
+                    "--workers",
+                    str(workers),
+                ],
+                standalone_mode=False,
+            )
+            elapsed = time.perf_counter() - started
+            server.shutdown()
+            stored = len(local.tables[TABLE_NAME]["items"]) - 3  # 章のメタ情報を除く
+            accepted = local.applied["BatchWriteItem"]
+            results.append(
+                (workers, elapsed, stored, accepted, sum(local.throttled.values()))
+            )
+
+    items = args.files * args.items
+    print()
+    print(
+        "{} files x {} items ({} unique keys), WCU limit {}/s, latency {}ms".format(
+            args.files, args.items, len(keys), args.write_capacity, args.latency_ms
+        )
+    )
+    for workers, elapsed, stored, accepted, throttled in results:
+        print(
+            "workers={:<3} {:.2f}s {:8.1f} items/s  stored={} accepted writes={} "
+            "throttled={}".format(
+                workers, elapsed, items / elapsed, stored, accepted, throttled
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
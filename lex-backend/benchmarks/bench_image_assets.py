@@ -0,0 +1,86 @@
+"""
+dynamodb/image_assets.py（Image問題の画像の縮小）の計測
+
+    python -m benchmarks.bench_image_assets [--images 200] [--size 2000x1500]
+        [--workers 1,4] [--changed 5]
+
+ノイズ画像を --images 枚作り（圧縮しにくいので大きな元画像の代わりになる）、次の順で実行する。
+    1. --workers ごとに全件を縮小（出力先は毎回空）
+    2. そのまま再実行（マニフェストのサイズ・更新時刻で読み直さない）
+    3. --changed %の画像を置き換えて再実行（置き換えた画像だけ作る）
+各回の秒数・作った枚数と、元画像・派生ファイルの合計サイズを表示する。Pillowが必要。
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import benchmarks.bench_csv_import  # noqa: F401  dynamodb/ を sys.path に入れる
+
+
+def make_image(path, size, seed):
+    from PIL import Image
+
+    image = Image.effect_noise(size, 40 + seed % 20).convert("RGB")
+    image.save(path, quality=95)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--size", default="2000x1500")
+    parser.add_argument("--workers", default="1,{}".format(os.cpu_count() or 1))
+    parser.add_argument("--changed", type=int, default=5, help="置き換える割合(%%)")
+    args = parser.parse_args()
+
+    import image_assets
+
+    size = tuple(int(n) for n in args.size.split("x"))
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "images")
+        os.makedirs(source)
+        names = ["{:05d}.jpg".format(i) for i in range(args.images)]
+        for i, name in enumerate(names):
+            make_image(os.path.join(source, name), size, i)
+        original = sum(os.path.getsize(os.path.join(source, n)) for n in names)
+
+        def run(label, output, workers):
+            stdout = io.StringIO()
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(
+                io.StringIO()
+            ):
+                image_assets.cmd.main(
+                    [source, output, "--workers", str(workers)], standalone_mode=False
+                )
+            elapsed = time.perf_counter() - started
+            summary = stdout.getvalue().splitlines()[0]
+            print("{:<28} {:7.2f}s  {}".format(label, elapsed, summary))
+
+        output = None
+        for workers in [int(n) for n in args.workers.split(",")]:
+            output = os.path.join(directory, "out-{}".format(workers))
+            run("full, {} workers".format(workers), output, workers)
+        resized = sum(
+            os.path.getsize(os.path.join(output, n))
+            for n in os.listdir(output)
+            if n.endswith(".jpg")
+        )
+        print(
+            "originals {:.1f} MB -> variants {:.1f} MB".format(
+                original / 2**20, resized / 2**20
+            )
+        )
+
+        run("re-run (no change)", output, workers)
+        changed = names[: len(names) * args.changed // 100]
+        for i, name in enumerate(changed):
+            make_image(os.path.join(source, name), size, i + 7)
+        run("re-run ({} changed)".format(len(changed)), output, workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+json_import --incremental の計測
+
+    python -m benchmarks.bench_incremental_import [--items 20000] [--changed 1]
+        [--removed 1] [--manifest]
+
+bench_json_import と同じJSON Linesを作り、インメモリのDynamoDB代替に次の順で取り込む。
+    1. 全件（空のテーブルへの --incremental。content_hash を付けて書き込む）
+    2. そのまま再実行（--incremental）
+    3. --changed %の問題を書き換え、--removed %を消して --dry-run
+    4. 同じ入力を --incremental --delete-missing
+各回の秒数、サーバーが受け付けた書き込み・削除の件数、消費したWCU/RCUを表示する。
+--manifest でテーブルの content_hash 属性の代わりにローカルのマニフェストを使う。
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.bench_csv_import import TABLE_NAME, write_aws_config
+from benchmarks.bench_json_import import write_items
+from benchmarks.local_dynamodb import LocalDynamoDB
+
+
+def rewrite(path, changed, removed):
+    """先頭から changed % を書き換え、続く removed % を消す"""
+    with open(path) as f:
+        lines = f.readlines()
+    change = len(lines) * changed // 100
+    remove = len(lines) * removed // 100
+    kept = []
+    for index, line in enumerate(lines):
+        if index < change:
+            item = json.loads(line)
+            item["comment"] = "書き換えたコメント"
+            line = json.dumps(item, ensure_ascii=False) + "\n"
+        elif index < change + remove:
+            continue
+        kept.append(line)
+    with open(path, "w") as f:
+        f.writelines(kept)
+    return change, remove
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--changed", type=int, default=1, help="書き換える割合(%%)")
+    parser.add_argument("--removed", type=int, default=1, help="消す割合(%%)")
+    parser.add_argument("--writerate", type=int, default=1000)
+    parser.add_argument("--manifest", action="store_true")
+    args = parser.parse_args()
+
+    import json_import
+
+    local = LocalDynamoDB()
+    local.create_table(TABLE_NAME, "chapter_code", "id")
+    server = local.serve()
+    endpoint = "http://{}:{}".format(*server.server_address)
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_aws_config(directory)
+        path = write_items(directory, args.items)["jsonl"]
+        common = [
+            "--region",
+            "us-east-1",
+            "--overwrite-endpoint",
+            endpoint,
+            "--writerate",
+            str(args.writerate),
+        ]
+        if args.manifest:
+            common += ["--manifest", os.path.join(directory, "manifest.json")]
+
+        def run(label, *options):
+            before = (
+                local.applied["BatchWriteItem"],
+                local.consumed["write"],
+                local.consumed["read"],
+            )
+            output = io.StringIO()
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(
+                io.StringIO()
+            ):
+                json_import.cmd.main(
+                    [path, TABLE_NAME, *common, *options], standalone_mode=False
+                )
+            elapsed = time.perf_counter() - started
+            print(
+                "{:<28} {:6.2f}s  writes+deletes={:<6} WCU={:<8.1f} RCU={:.1f}".format(
+                    label,
+                    elapsed,
+                    local.applied["BatchWriteItem"] - before[0],
+                    local.consumed["write"] - before[1],
+                    local.consumed["read"] - before[2],
+                )
+            )
+            for line in output.getvalue().splitlines():
+                if line.startswith("追加"):
+                    print("    " + line)
+
+        run("first import", "--incremental")
+        run("incremental (no change)", "--incremental")
+        change, remove = rewrite(path, args.changed, args.removed)
+        print("changed {} items, removed {} items".format(change, remove))
+        run("dry run", "--dry-run")
+        run("incremental --delete-missing", "--incremental", "--delete-missing")
+
+    server.shutdown()
+    stored = len(local.tables[TABLE_NAME]["items"]) - 3  # 章のメタ情報を除く
+    print("stored {} items".format(stored))
+
+
+if __name__ == "__main__":
+    main()
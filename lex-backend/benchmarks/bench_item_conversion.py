@@ -0,0 +1,72 @@
+"""
+DynamoDBアイテムの変換: json.dumps/json.loads の往復 と 1パス変換の比較
+
+    python -m benchmarks.bench_item_conversion [--copies 20]
+
+dynamodb/quizset/*.json をリソースAPIが返す形(数値はDecimal)と
+低レベルクライアントが返す形({"S": ...})に変換して計測する。
+"""
+
+import argparse
+import glob
+import json
+import os
+from decimal import Decimal
+
+from benchmarks._common import QUIZSET_DIR, measure, report
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer  # noqa: E402
+
+import app  # noqa: E402
+import dynamo  # noqa: E402
+
+
+def load_resource_items(copies):
+    items = []
+    for path in sorted(glob.glob(os.path.join(QUIZSET_DIR, "*.json"))):
+        with open(path) as f:
+            items.extend(json.load(f, parse_int=Decimal, parse_float=Decimal))
+    return items * copies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    items = load_resource_items(args.copies)
+    serializer = TypeSerializer()
+    deserializer = TypeDeserializer()
+    low_level = [{k: serializer.serialize(v) for k, v in i.items()} for i in items]
+    print("{} items".format(len(items)))
+
+    def json_round_trip():
+        return json.loads(json.dumps(items, default=app.decimal_default_proc))
+
+    def single_pass():
+        return dynamo.to_plain(items)
+
+    def type_deserializer_round_trip():
+        converted = [
+            {k: deserializer.deserialize(v) for k, v in i.items()} for i in low_level
+        ]
+        return json.loads(json.dumps(converted, default=app.decimal_default_proc))
+
+    def lean_deserializer():
+        return [dynamo.deserialize_item(item) for item in low_level]
+
+    assert json_round_trip() == single_pass()
+    assert type_deserializer_round_trip() == lean_deserializer()
+
+    report("resource: json round trip", measure(json_round_trip, args.repeat))
+    report("resource: to_plain", measure(single_pass, args.repeat))
+    report(
+        "client: TypeDeserializer + json",
+        measure(type_deserializer_round_trip, args.repeat),
+    )
+    report("client: deserialize_item", measure(lean_deserializer, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
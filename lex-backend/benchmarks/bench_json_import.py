@@ -0,0 +1,135 @@
+"""
+json_import のストリーミング読み込みの計測
+
+    python -m benchmarks.bench_json_import [--items 50000] [--write-capacity 1000]
+
+1. 読み込みだけのピークメモリ: json.load と batch_import.iter_json_items (配列 / JSON Lines)
+2. json_import の書き込み速度(件/秒): bench_csv_import と同じくインメモリのDynamoDB代替を
+   HTTPで起動して --overwrite-endpoint に渡す（--endpoint で実際のエンドポイントも可）
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_csv_import import TABLE_NAME, ensure_table, write_aws_config
+
+
+def write_items(directory, count):
+    paths = {
+        "json": os.path.join(directory, "quiz.json"),
+        "jsonl": os.path.join(directory, "quiz.jsonl"),
+    }
+    with open(paths["json"], "w") as array, open(paths["jsonl"], "w") as lines:
+        array.write("[\n")
+        for i in range(count):
+            item = {
+                "chapter_code": "ABC"[i % 3],
+                "id": i // 3 + 1,
+                "kind": "ChoiceBool",
+                "q": "問題文{}：腸軸捻転は，S状結腸に生じることが最も多い？".format(i),
+                "a": ["はい"],
+                "comment": "コメント" * 20,
+            }
+            line = json.dumps(item, ensure_ascii=False)
+            array.write(("  " if i == 0 else ", ") + line + "\n")
+            lines.write(line + "\n")
+        array.write("]\n")
+    return paths
+
+
+def peak_memory(read):
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = read()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--write-capacity", type=int, default=1000)
+    parser.add_argument("--writerate", type=int, default=5)
+    parser.add_argument("--endpoint")
+    args = parser.parse_args()
+
+    from batch_import import iter_json_items
+    import json_import
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_aws_config(directory)
+        paths = write_items(directory, args.items)
+
+        def load_all():
+            with open(paths["json"]) as f:
+                return len(json.load(f))
+
+        def stream(path):
+            def read():
+                with open(path) as f:
+                    return sum(1 for _ in iter_json_items(f))
+
+            return read
+
+        for label, read in (
+            ("json.load", load_all),
+            ("iter_json_items (array)", stream(paths["json"])),
+            ("iter_json_items (JSON Lines)", stream(paths["jsonl"])),
+        ):
+            count, elapsed, peak = peak_memory(read)
+            print(
+                "{:<30} {} items in {:.2f}s, peak {:.1f} MB".format(
+                    label, count, elapsed, peak
+                )
+            )
+
+        local = None
+        endpoint = args.endpoint
+        if endpoint is None:
+            from benchmarks.local_dynamodb import LocalDynamoDB
+
+            local = LocalDynamoDB(write_capacity=args.write_capacity)
+            local.create_table(TABLE_NAME, "chapter_code", "id")
+            server = local.serve()
+            endpoint = "http://{}:{}".format(*server.server_address)
+        else:
+            ensure_table(endpoint)
+
+        started = time.perf_counter()
+        json_import.cmd.main(
+            [
+                paths["jsonl"],
+                TABLE_NAME,
+                "--region",
+                "us-east-1",
+                "--overwrite-endpoint",
+                endpoint,
+                "--writerate",
+                str(args.writerate),
+            ],
+            standalone_mode=False,
+        )
+        elapsed = time.perf_counter() - started
+
+    print(
+        "json_import (JSON Lines): {} items in {:.2f}s = {:.1f} items/s".format(
+            args.items, elapsed, args.items / elapsed
+        )
+    )
+    if local is not None:
+        server.shutdown()
+        print(
+            "server: WCU limit {}/s, calls {}, throttled {}".format(
+                args.write_capacity, dict(local.calls), dict(local.throttled)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
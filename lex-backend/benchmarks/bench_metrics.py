@@ -0,0 +1,92 @@
+"""
+ターン内の計測(handler/metrics.py)のオーバーヘッドと段階ごとの内訳
+
+    python -m benchmarks.bench_metrics [--iterations 200]
+
+記録した会話(events/lex/*.json)を METRICS_ENABLED=false / true で再生してターンの
+レイテンシを比べ、true のときに出たEMFの行をパースしてインテント×段階の p50/p99 を表示する。
+    timer (disabled)   無効なときの metrics.timer 1回の時間
+"""
+
+import argparse
+import glob
+import json
+import os
+from collections import defaultdict
+
+from benchmarks._common import measure, percentile, report
+from benchmarks.lex_events import load_sequence
+from benchmarks.local_dynamodb import LocalDynamoDB
+from benchmarks.replay import DEFAULT_SEQUENCES, replay
+
+import app  # noqa: E402
+import metrics  # noqa: E402
+
+
+def all_latencies(stats):
+    return [ms for samples in stats.latencies.values() for ms in samples]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ["LOG_LEVEL"] = "WARNING"
+    app.structured_log.configure()
+    sequences = [load_sequence(path) for path in sorted(glob.glob(DEFAULT_SEQUENCES))]
+    local = LocalDynamoDB().install()
+    local.seed_quizset()
+
+    def noop():
+        with metrics.timer("stage"):
+            pass
+
+    os.environ["METRICS_ENABLED"] = "false"
+    report("timer (disabled)", measure(noop, 100000))
+    replay(sequences, 1, local=local)
+    report(
+        "turn, metrics disabled",
+        all_latencies(replay(sequences, args.iterations, local=local)),
+    )
+
+    lines = []
+    original = metrics._write
+    metrics._write = lines.append
+    os.environ["METRICS_ENABLED"] = "true"
+    try:
+        stats = replay(sequences, args.iterations, local=local)
+    finally:
+        metrics._write = original
+        os.environ["METRICS_ENABLED"] = "false"
+    report("turn, metrics enabled", all_latencies(stats))
+
+    stages = defaultdict(list)  # (intent, stage) -> [ms]
+    for line in lines:
+        document = json.loads(line)
+        (directive,) = document["_aws"]["CloudWatchMetrics"]
+        for metric in directive["Metrics"]:
+            stages[(document["Intent"], metric["Name"])].extend(
+                document[metric["Name"]]
+            )
+    print()
+    print("{} EMF lines for {} turns".format(len(lines), len(all_latencies(stats))))
+    print(
+        "{:<14} {:<20} {:>7} {:>9} {:>9}".format(
+            "intent", "stage", "n", "p50(ms)", "p99(ms)"
+        )
+    )
+    for (intent_name, stage), samples in sorted(stages.items()):
+        print(
+            "{:<14} {:<20} {:>7} {:>9.3f} {:>9.3f}".format(
+                intent_name,
+                stage,
+                len(samples),
+                percentile(samples, 50),
+                percentile(samples, 99),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+問題カードの組み立て: ターンごとに作る従来の方法と問題ごとのテンプレート(handler/question_cards.py)
+
+    python -m benchmarks.bench_question_cards [--repeat 2000] [--batch 100]
+
+dynamodb/quizset/*.json の問題をランダムな問題番号で --batch 枚ずつ組み立てる
+（1枚は計測のオーバーヘッドと同じくらい短いので、時間は --batch 枚あたり）。
+    rebuild     if/elif で選択肢のリストを作り、f-stringとボタンのスライスを毎回行う（従来）
+    template    app.build_question_card（テンプレートの浅いコピー）
+    template (no metrics wrapper)  question_cards.question_card を直接
+"""
+
+import argparse
+import glob
+import itertools
+import json
+import os
+import random
+
+from benchmarks._common import QUIZSET_DIR, measure, report
+
+import app  # noqa: E402
+import question_cards  # noqa: E402
+
+
+def rebuild_options(slot):
+    if slot == "ChoiceBool":
+        return [
+            {"text": "うん!!", "value": "はい"},
+            {"text": "ちがう！！", "value": "いいえ"},
+        ]
+    return [{"text": "3問", "value": 3}, {"text": "5問", "value": 5}]
+
+
+def rebuild_card(quiz, subtitle, current_num):
+    options = rebuild_options("ChoiceBool") if quiz["kind"] == "ChoiceBool" else None
+    buttons = None
+    if options is not None:
+        buttons = []
+        for i in range(min(5, len(options))):
+            buttons.append(options[i])
+    return {
+        "contentType": "ImageResponseCard",
+        "content": f"第{current_num + 1}問：{quiz['q']}",
+        "imageResponseCard": {
+            "title": f"第{current_num + 1}問：{quiz['q']}",
+            "subtitle": subtitle,
+            "imageUrl": quiz["image"] if quiz["kind"] == "Image" else None,
+            "buttons": buttons,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=100)
+    args = parser.parse_args()
+
+    items = []
+    for path in sorted(glob.glob(os.path.join(QUIZSET_DIR, "*.json"))):
+        with open(path) as f:
+            items.extend(json.load(f))
+    rng = random.Random(0)
+    turns = [(rng.choice(items), rng.randrange(7)) for _ in range(args.batch * 10)]
+
+    for label, build in (
+        ("rebuild", rebuild_card),
+        ("template", app.build_question_card),
+        ("template (no metrics wrapper)", question_cards.question_card),
+    ):
+
+        batches = itertools.cycle(
+            [turns[i : i + args.batch] for i in range(0, len(turns), args.batch)]
+        )
+
+        def build_batch():
+            for quiz, current_num in next(batches):
+                build(quiz, "正解！", current_num)
+
+        report(label, measure(build_batch, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+同梱の問題バンドル(handler/quiz_bundle.py)と DynamoDB の1問あたりの読み込み時間
+
+    python -m benchmarks.bench_quiz_bundle [--copies 100] [--repeat 2000]
+
+dynamodb/quizset/*.json を --copies 倍（idをずらす）にしてバンドルを作り、次を比べる。
+    bundle open        コールドスタートでバンドルを開く時間
+    bundle get         QuizBundle.get で1問読む
+    set_quiz bundle    QUIZ_BACKEND=bundle での app.set_quiz
+    set_quiz dynamodb  キャッシュなしの app.set_quiz（インメモリのDynamoDB代替。
+                       ネットワーク遅延を含まないので実際のDynamoDBより速い）
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import tempfile
+
+from benchmarks._common import QUIZSET_DIR, measure, report
+from benchmarks.local_dynamodb import LocalDynamoDB
+
+import app  # noqa: E402
+import quiz_bundle  # noqa: E402
+
+
+def load_items(copies):
+    base = []
+    for path in sorted(glob.glob(os.path.join(QUIZSET_DIR, "*.json"))):
+        with open(path) as f:
+            base.extend(json.load(f))
+    width = max(item["id"] for item in base)
+    return [
+        dict(item, id=item["id"] + copy * width)
+        for copy in range(copies)
+        for item in base
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    items = load_items(args.copies)
+    keys = [(item["chapter_code"], item["id"]) for item in items]
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "quiz_bundle.bin")
+        version = quiz_bundle.build(items, path)
+        print(
+            "{} items, bundle {} bytes, version {}".format(
+                len(items), os.path.getsize(path), version
+            )
+        )
+
+        report(
+            "bundle open",
+            measure(lambda: quiz_bundle.QuizBundle(path).close(), args.repeat // 10),
+        )
+        bundle = quiz_bundle.QuizBundle(path)
+        report(
+            "bundle get",
+            measure(lambda: bundle.get(*rng.choice(keys)), args.repeat),
+        )
+        bundle.close()
+
+        os.environ["QUIZ_BUNDLE_PATH"] = path
+        os.environ["QUIZ_CACHE_ENABLED"] = "false"
+        local = LocalDynamoDB().install()
+        for item in items:
+            local.put("QuizTable", item)
+
+        def set_quiz():
+            chapter_code, q_id = rng.choice(keys)
+            return app.set_quiz(chapter_code, [q_id], 0)
+
+        for backend in ("bundle", "dynamodb"):
+            os.environ["QUIZ_BACKEND"] = backend
+            set_quiz()
+            report("set_quiz " + backend, measure(set_quiz, args.repeat))
+        print("DynamoDB calls: {}".format(dict(local.calls)))
+        local.uninstall()
+        quiz_bundle.reset()
+
+
+if __name__ == "__main__":
+    main()
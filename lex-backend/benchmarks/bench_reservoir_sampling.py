@@ -0,0 +1,81 @@
+"""
+大きな章からの出題id抽出: 全件読み込み+shuffle と ページ単位のリザーバーサンプリングの比較
+
+    python -m benchmarks.bench_reservoir_sampling [--chapter-size 50000] [--k 7]
+
+DynamoDBの代わりに、キーだけを射影したページ(1MB相当)を順に返す
+合成の章を使う。実行時間と tracemalloc のピークメモリを表示する。
+"""
+
+import argparse
+import os
+import random
+import tracemalloc
+
+from benchmarks._common import measure, report
+
+import dynamo  # noqa: E402
+import quiz_repository  # noqa: E402
+
+# キーだけのアイテムはおよそ20bytesなので1MBページには約5万件入る
+PAGE_SIZE = 50000
+
+
+class SyntheticChapterClient:
+    def __init__(self, chapter_size):
+        self.chapter_size = chapter_size
+
+    def get_paginator(self, operation_name):
+        return self
+
+    def paginate(self, **kwargs):
+        for start in range(1, self.chapter_size + 1, PAGE_SIZE):
+            stop = min(start + PAGE_SIZE, self.chapter_size + 1)
+            yield {"Items": [{"id": {"N": str(q_id)}} for q_id in range(start, stop)]}
+
+
+def load_all_then_shuffle(client, k):
+    quiz_sets = []
+    for page in client.paginate():
+        quiz_sets.extend(page["Items"])
+    random.shuffle(quiz_sets)
+    return [int(item["id"]["N"]) for item in quiz_sets[:k]]
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chapter-size", type=int, default=50000)
+    parser.add_argument("--k", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    client = SyntheticChapterClient(args.chapter_size)
+    dynamo.get_client = lambda region=None: client
+    # 章キャッシュを使わない出題（カタログ→リザーバーサンプリング）を測る
+    os.environ["QUIZ_CACHE_ENABLED"] = "false"
+    repository = quiz_repository.dynamodb_repository
+    repository.load_chapter_catalog = lambda chapter_code: None
+
+    def baseline():
+        return load_all_then_shuffle(client, args.k)
+
+    def reservoir():
+        return repository.sample_ids("A", args.k)
+
+    print("chapter size={} k={}".format(args.chapter_size, args.k))
+    report("load all + shuffle", measure(baseline, args.repeat))
+    report("reservoir (paginated)", measure(reservoir, args.repeat))
+    print("peak memory load all + shuffle: {:,} bytes".format(peak_memory(baseline)))
+    print("peak memory reservoir:          {:,} bytes".format(peak_memory(reservoir)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Lexハンドラのコールドスタート計測
+
+    python -m benchmarks.bench_startup [--runs 10]
+
+インテントごとに新しいPythonプロセスを起動し、app の import 時間と
+最初・2回目の lambda_handler 呼び出しの所要時間を測る。
+DynamoDBは benchmarks.local_dynamodb のインメモリ代替を使う。
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks._common import ROOT_DIR, report
+
+
+def child(intent_name):
+    started = time.perf_counter()
+    import app
+
+    imported = time.perf_counter()
+    # import だけでSDKを読み込んでいないか（botocoreだけでも遅い）
+    sdk_on_import = [name for name in ("boto3", "botocore") if name in sys.modules]
+
+    from benchmarks.lex_events import first_turn_events
+    from benchmarks.local_dynamodb import LocalDynamoDB
+
+    local = LocalDynamoDB()
+    local.seed_quizset()
+    local.install()
+    event = first_turn_events()[intent_name]
+
+    begin = time.perf_counter()
+    app.lambda_handler(json.loads(json.dumps(event)), None)
+    first = time.perf_counter()
+    app.lambda_handler(json.loads(json.dumps(event)), None)
+    second = time.perf_counter()
+    print(
+        json.dumps(
+            {
+                "import_ms": (imported - started) * 1000,
+                "first_ms": (first - begin) * 1000,
+                "warm_ms": (second - first) * 1000,
+                "boto3_loaded": "boto3" in sys.modules,
+                "sdk_on_import": sdk_on_import,
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    for intent_name in ("Welcome", "CheckChapter", "StartQuiz"):
+        results = []
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.bench_startup",
+                    "--child",
+                    intent_name,
+                ],
+                cwd=ROOT_DIR,
+                check=True,
+                capture_output=True,
+                text=True,
+                env={**os.environ, "LOG_LEVEL": "WARNING"},
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+        print(
+            "[{}] boto3 loaded: {} (SDK on import: {})".format(
+                intent_name,
+                results[0]["boto3_loaded"],
+                ", ".join(results[0]["sdk_on_import"]) or "none",
+            )
+        )
+        for field in ("import_ms", "first_ms", "warm_ms"):
+            report("  " + field, [r[field] for r in results])
+
+
+if __name__ == "__main__":
+    main()
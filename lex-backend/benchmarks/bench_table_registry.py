@@ -0,0 +1,50 @@
+"""
+DynamoDBテーブルハンドル取得のコールド/ウォーム比較
+
+    python -m benchmarks.bench_table_registry [--turns 200]
+
+1回の回答ターンでは set_quiz が最大2回呼ばれるため、1ターンあたり
+2回分のハンドル取得コストを比較する（ネットワークアクセスは発生しない）。
+"""
+
+import argparse
+import os
+
+from benchmarks._common import measure, report
+
+import boto3  # noqa: E402
+import dynamo  # noqa: E402
+
+
+def per_turn_without_registry():
+    table_name, region = dynamo.table_settings()
+    for _ in range(2):
+        boto3.resource("dynamodb", region_name=region).Table(table_name)
+
+
+def per_turn_with_registry():
+    for _ in range(2):
+        dynamo.get_table()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "dummy")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "dummy")
+
+    dynamo.reset()
+    first = measure(per_turn_with_registry, 1)
+    report("registry first turn (cold)", first)
+
+    before = measure(per_turn_without_registry, args.turns)
+    after = measure(per_turn_with_registry, args.turns)
+    report("boto3.resource per call", before)
+    report("registry (warm)", after)
+    saved = sum(before) / len(before) - sum(after) / len(after)
+    print("saved per turn: {:.3f}ms".format(saved))
+
+
+if __name__ == "__main__":
+    main()
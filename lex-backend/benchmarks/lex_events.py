@@ -0,0 +1,78 @@
+"""Lex V2 のコードフックイベントを組み立てる"""
+
+import json
+
+
+def slot(value):
+    return {"value": {"originalValue": value, "interpretedValue": value}}
+
+
+def lex_event(
+    intent_name,
+    slots=None,
+    session_attributes=None,
+    source="DialogCodeHook",
+    session_id="bench-session",
+):
+    return {
+        "sessionId": session_id,
+        "inputTranscript": "",
+        "invocationSource": source,
+        "bot": {"name": "QuizBot", "aliasName": "Prod", "localeId": "ja_JP"},
+        "sessionState": {
+            "intent": {
+                "name": intent_name,
+                "slots": {name: slot(value) for name, value in (slots or {}).items()},
+                "state": "InProgress",
+            },
+            "sessionAttributes": dict(session_attributes or {}),
+        },
+    }
+
+
+def first_turn_events(chapter_code="A", question_num="3"):
+    """インテントごとの最初のターン（コールドスタート計測用）"""
+    return {
+        "Welcome": lex_event("Welcome", {"UserName": "bench"}),
+        "CheckChapter": lex_event(
+            "CheckChapter",
+            {"ChapterCode": chapter_code, "QuestionNum": question_num},
+            {"userInfo": "bench"},
+        ),
+        "StartQuiz": lex_event(
+            "StartQuiz",
+            session_attributes={
+                "userInfo": "bench",
+                "chapterInfo": "~1{}:{}".format(chapter_code, question_num),
+            },
+        ),
+    }
+
+
+class LexSession:
+    """Lexと同じように、前のターンのセッション属性を次のイベントに引き継ぐ"""
+
+    def __init__(self, handler, session_id="bench-session"):
+        self.handler = handler
+        self.session_id = session_id
+        self.attributes = {}
+
+    def send(self, intent_name, slots=None, source="DialogCodeHook"):
+        event = lex_event(intent_name, slots, self.attributes, source, self.session_id)
+        response = self.handler(event, None)
+        session_state = response.get("sessionState") or {}
+        self.attributes = dict(session_state.get("sessionAttributes") or {})
+        return response
+
+
+def load_sequence(path):
+    """
+    events/lex/*.json の会話シーケンスを読む
+        {"name": ..., "turns": [{"intent": ..., "slots": {...}, "source": ...}, ...]}
+    """
+    with open(path) as f:
+        sequence = json.load(f)
+    for turn in sequence["turns"]:
+        turn.setdefault("slots", {})
+        turn.setdefault("source", "DialogCodeHook")
+    return sequence
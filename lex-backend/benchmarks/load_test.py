@@ -0,0 +1,257 @@
+"""
+多数の受講者が同時にクイズを解く状況の負荷生成
+
+    python -m benchmarks.load_test [--sessions 2000] [--workers 4] [--concurrency 50]
+        [--chapters A=1,B=1,C=1] [--question-num 3,5,7] [--prefetch] [--no-cache]
+        [--stats]
+
+ワーカープロセスを1つのウォームコンテナとみなし、各プロセスで --concurrency 個の
+セッションを1ターンずつ交互に進める。セッション属性はLexと同じようにターン間で
+引き継ぎ、Welcome から結果表示まで dispatch を通して最後まで解かせる。
+DynamoDBはプロセスごとのインメモリ代替で、呼び出し回数と消費キャパシティの概算を数える。
+書き込みはクイズを解き終えたときの結果の保存(results_store.py)だけ。
+--stats では問題ごとの統計(question_stats.py)も集計し、最後に残りの増分を書き込む。
+
+出力のターン/秒はネットワーク遅延を含まないハンドラ単体の値なので、
+template.yaml のRCU/WCU・メモリ・タイムアウトの見積もりには
+セッションあたりの読み書き量・最大RSS・最大レイテンシを使う。
+"""
+
+import argparse
+import os
+import random
+import resource
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks._common import percentile
+
+# template.yaml の設定値
+PROVISIONED_RCU = 1
+PROVISIONED_WCU = 1
+MEMORY_MB = 128
+TIMEOUT_MS = 3000
+RESULTS_TABLE = "QuizResults"
+STATS_TABLE = "QuizStats"
+
+
+class QuizSession:
+    """1人の受講者。前のターンの応答を見て次の発話を決める"""
+
+    def __init__(self, dispatch, session_id, chapter_code, question_num, rng):
+        from benchmarks.lex_events import LexSession
+
+        self.session = LexSession(lambda event, context: dispatch(event), session_id)
+        self.rng = rng
+        self.turns = deque(
+            [
+                ("Welcome", {"UserName": "受講者"}, "FulfillmentCodeHook"),
+                (
+                    "CheckChapter",
+                    {"ChapterCode": chapter_code, "QuestionNum": question_num},
+                    "DialogCodeHook",
+                ),
+                (
+                    "CheckChapter",
+                    {"ChapterCode": chapter_code, "QuestionNum": question_num},
+                    "FulfillmentCodeHook",
+                ),
+                ("StartQuiz", {}, "DialogCodeHook"),
+            ]
+        )
+        self.finished = False
+
+    def step(self):
+        """1ターン進めて (intent, ms) を返す"""
+        intent_name, slots, source = self.turns.popleft()
+        started = time.perf_counter()
+        response = self.session.send(intent_name, slots, source)
+        elapsed = (time.perf_counter() - started) * 1000
+        self._plan_next(response)
+        return intent_name, elapsed
+
+    def _plan_next(self, response):
+        if self.turns:
+            return
+        dialog_action = response["sessionState"]["dialogAction"]
+        slot_to_elicit = dialog_action.get("slotToElicit")
+        if dialog_action["type"] == "Close" or slot_to_elicit is None:
+            self.finished = True
+        elif slot_to_elicit == "Answer":
+            answer = self.rng.choice(["はい", "いいえ"])
+            self.turns.append(("StartQuiz", {"Answer": answer}, "DialogCodeHook"))
+        else:
+            shown = self.rng.choice(["True", "False"])
+            self.turns.append(("StartQuiz", {slot_to_elicit: shown}, "DialogCodeHook"))
+
+
+def run_worker(worker_id, sessions, options):
+    os.environ["LOG_LEVEL"] = "WARNING"
+    os.environ["QUIZ_PREFETCH"] = "true" if options["prefetch"] else "false"
+    os.environ["QUIZ_CACHE_ENABLED"] = "true" if options["cache"] else "false"
+    os.environ["RESULTS_TABLE"] = RESULTS_TABLE
+    os.environ["STATS_TABLE"] = STATS_TABLE if options["stats"] else ""
+
+    import app
+    from benchmarks.local_dynamodb import LocalDynamoDB
+
+    app.structured_log.configure()
+    local = LocalDynamoDB().install()
+    local.seed_quizset()
+    local.create_table(RESULTS_TABLE, "session_id", "quiz_key")
+    local.create_table(STATS_TABLE, "chapter_code", "id")
+    rng = random.Random(options["seed"] * 1000 + worker_id)
+    chapters, weights = zip(*options["chapters"].items())
+
+    def new_session(number):
+        return QuizSession(
+            app.dispatch,
+            "load-{}-{}".format(worker_id, number),
+            rng.choices(chapters, weights)[0],
+            rng.choice(options["question_num"]),
+            rng,
+        )
+
+    latencies = defaultdict(list)
+    started = time.perf_counter()
+    created = 0
+    active = deque()
+    while created < sessions or active:
+        while created < sessions and len(active) < options["concurrency"]:
+            active.append(new_session(created))
+            created += 1
+        session = active.popleft()
+        intent_name, elapsed = session.step()
+        latencies[intent_name].append(elapsed)
+        if not session.finished:
+            active.append(session)
+    return {
+        "latencies": dict(latencies),
+        "busy_s": time.perf_counter() - started,
+        "calls": local.calls,
+        "reads": local.reads(),
+        "writes": local.writes(),
+        "consumed": local.consumed,
+        "stats": sum(item["attempts"] for item in local.items(STATS_TABLE)),
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def parse_weights(text):
+    weights = {}
+    for pair in text.split(","):
+        chapter_code, _, weight = pair.partition("=")
+        weights[chapter_code.strip()] = float(weight or 1)
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--chapters", default="A=1,B=1,C=1")
+    parser.add_argument("--question-num", default="3,5,7")
+    parser.add_argument("--prefetch", action="store_true")
+    parser.add_argument("--no-cache", dest="cache", action="store_false")
+    parser.add_argument("--stats", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    options = {
+        "chapters": parse_weights(args.chapters),
+        "question_num": args.question_num.split(","),
+        "concurrency": args.concurrency,
+        "prefetch": args.prefetch,
+        "cache": args.cache,
+        "stats": args.stats,
+        "seed": args.seed,
+    }
+    shares = [
+        args.sessions // args.workers + (1 if i < args.sessions % args.workers else 0)
+        for i in range(args.workers)
+    ]
+    started = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as pool:
+        results = list(
+            pool.map(run_worker, range(args.workers), shares, [options] * args.workers)
+        )
+    wall = time.perf_counter() - started
+
+    latencies = defaultdict(list)
+    calls, consumed = Counter(), Counter()
+    for result in results:
+        for intent_name, samples in result["latencies"].items():
+            latencies[intent_name].extend(samples)
+        calls.update(result["calls"])
+        consumed.update(result["consumed"])
+    all_samples = [ms for samples in latencies.values() for ms in samples]
+    reads = sum(result["reads"] for result in results)
+    writes = sum(result["writes"] for result in results)
+    busy = max(result["busy_s"] for result in results)
+
+    print(
+        "{} sessions, {} turns, {} workers x {} concurrent sessions".format(
+            args.sessions, len(all_samples), args.workers, args.concurrency
+        )
+    )
+    print(
+        "throughput: {:.0f} turns/s sustained "
+        "({:.0f} turns/s incl. process start)".format(
+            len(all_samples) / busy, len(all_samples) / wall
+        )
+    )
+    print(
+        "{:<14} {:>7} {:>9} {:>9} {:>9} {:>9}".format(
+            "intent", "turns", "p50(ms)", "p95(ms)", "p99(ms)", "max(ms)"
+        )
+    )
+    for intent_name in sorted(latencies) + ["(all)"]:
+        samples = latencies.get(intent_name, all_samples)
+        print(
+            "{:<14} {:>7} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f}".format(
+                intent_name,
+                len(samples),
+                percentile(samples, 50),
+                percentile(samples, 95),
+                percentile(samples, 99),
+                max(samples),
+            )
+        )
+    print()
+    print("DynamoDB: {} reads, {} writes {}".format(reads, writes, dict(calls)))
+    rcu = consumed["read"] / args.sessions
+    wcu = consumed["write"] / args.sessions
+    print(
+        "per session: {:.3f} reads, {:.3f} writes, {:.3f} RCU, {:.3f} WCU".format(
+            reads / args.sessions, writes / args.sessions, rcu, wcu
+        )
+    )
+    if args.stats:
+        print(
+            "question stats: {} answers counted with {} UpdateItem".format(
+                sum(result["stats"] for result in results), calls["UpdateItem"]
+            )
+        )
+    print(
+        "RCU={} / WCU={} sustain about {} / {} new sessions per second".format(
+            PROVISIONED_RCU,
+            PROVISIONED_WCU,
+            "{:.1f}".format(PROVISIONED_RCU / rcu) if rcu else "unlimited",
+            "{:.1f}".format(PROVISIONED_WCU / wcu) if wcu else "unlimited",
+        )
+    )
+    print(
+        "max RSS per worker: {:.1f} MB (MemorySize {} MB), "
+        "slowest turn {:.1f} ms (Timeout {} ms)".format(
+            max(result["max_rss_mb"] for result in results),
+            MEMORY_MB,
+            max(all_samples),
+            TIMEOUT_MS,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
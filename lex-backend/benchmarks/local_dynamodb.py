@@ -0,0 +1,642 @@
+"""
+ネットワークなしで動くインメモリのDynamoDB代替
+
+botocoreの before-send イベントでHTTP送信の直前にリクエストを横取りして応答を返す。
+シリアライズ・署名・レスポンスのパースはすべて本物のboto3が行うので、
+ハンドラから見ると実際のDynamoDBと同じ経路を通る。
+
+    local = LocalDynamoDB()
+    local.seed_quizset()
+    local.install()      # dynamo.get_resource / get_client が返すクライアントに接続
+    ...
+    local.calls          # Counter({"Query": 1, "GetItem": 3, ...})
+    local.consumed       # Counter({"read": 2.5, "write": 3}) 消費キャパシティユニットの概算
+
+write_capacity を指定すると1秒あたりのWCUを超えた書き込みをスロットリングする
+（BatchWriteItemは UnprocessedItems、単体の書き込みは
+ProvisionedThroughputExceededException）。serve() でHTTPのエンドポイントとしても
+起動でき、インポートCLIの --overwrite-endpoint に渡せる。
+"""
+
+import glob
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks._common import QUIZSET_DIR
+
+import dynamo  # noqa: E402
+
+META_ID = 0
+TARGET_PREFIX = "DynamoDB_20120810."
+# 実際のDynamoDBは1MBでページを区切る。ここでは件数で代用する
+DEFAULT_PAGE_ITEMS = 1000
+READ_OPERATIONS = frozenset(["GetItem", "Query", "Scan", "BatchGetItem"])
+WRITE_OPERATIONS = frozenset(["PutItem", "UpdateItem", "DeleteItem", "BatchWriteItem"])
+# 読み込みは4KB、書き込みは1KBごとに1ユニット
+READ_UNIT_BYTES = 4096
+WRITE_UNIT_BYTES = 1024
+
+
+class DynamoDBError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class LocalDynamoDB:
+    def __init__(
+        self, page_items=DEFAULT_PAGE_ITEMS, write_capacity=None, clock=time.monotonic
+    ):
+        self.page_items = page_items
+        self.write_capacity = write_capacity
+        self.clock = clock
+        self.tables = {}  # name -> {"keys": (hash, range), "items": {key: item}}
+        self.calls = Counter()
+        self.consumed = Counter()
+        self.throttled = Counter()
+        self.applied = Counter()  # 書き込めたアイテム数（オペレーションごと）
+        self._attached = set()
+        self._originals = None
+        self._lock = threading.Lock()
+        self._write_window = [None, 0.0]  # [秒, その秒に消費したWCU]
+        self.create_table(dynamo.table_settings()[0], "chapter_code", "id")
+
+    # ---- テーブルの準備 ----
+
+    def create_table(self, name, hash_key, range_key=None):
+        self.tables[name] = {"keys": (hash_key, range_key), "items": {}}
+
+    def put(self, table_name, item):
+        """素のPythonのdictをそのまま書き込む"""
+        table = self.tables[table_name]
+        low_level = serialize_item(item)
+        table["items"][self._key(table, low_level)] = low_level
+
+    def items(self, table_name):
+        """テーブルの中身を素のPythonのdictで返す（テスト・集計用）"""
+        return [
+            dynamo.deserialize_item(item)
+            for _, item in sorted(self.tables[table_name]["items"].items())
+        ]
+
+    def reads(self):
+        return sum(self.calls[op] for op in READ_OPERATIONS)
+
+    def writes(self):
+        return sum(self.calls[op] for op in WRITE_OPERATIONS)
+
+    def seed_quizset(self, paths=None, table_name=None):
+        """dynamodb/quizset/*.json と各章のメタ情報アイテム(version, ids)を書き込む"""
+        table_name = table_name or dynamo.table_settings()[0]
+        paths = paths or sorted(glob.glob(os.path.join(QUIZSET_DIR, "*.json")))
+        chapter_ids = {}
+        for path in paths:
+            with open(path) as f:
+                for item in json.load(f):
+                    self.put(table_name, item)
+                    chapter_ids.setdefault(item["chapter_code"], set()).add(item["id"])
+        for chapter_code, ids in chapter_ids.items():
+            self.put(
+                table_name,
+                {
+                    "chapter_code": chapter_code,
+                    "id": META_ID,
+                    "version": 1,
+                    "ids": ids,
+                    "ids_complete": True,
+                },
+            )
+        return chapter_ids
+
+    # ---- boto3への接続 ----
+
+    def attach(self, client):
+        if id(client) in self._attached:
+            return client
+        client.meta.events.register("before-send.dynamodb", self._handle)
+        self._attached.add(id(client))
+        return client
+
+    def install(self):
+        """dynamo.py が作るリソース・クライアントにフックを付ける"""
+        if self._originals is not None:
+            return self
+        get_resource, get_client = dynamo.get_resource, dynamo.get_client
+
+        def local_resource(region=None):
+            resource = get_resource(region)
+            self.attach(resource.meta.client)
+            return resource
+
+        def local_client(region=None, fast_fail=False):
+            return self.attach(get_client(region, fast_fail))
+
+        self._originals = (get_resource, get_client)
+        dynamo.get_resource, dynamo.get_client = local_resource, local_client
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "local")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "local")
+        dynamo.reset()
+        return self
+
+    def uninstall(self):
+        if self._originals is not None:
+            dynamo.get_resource, dynamo.get_client = self._originals
+            self._originals = None
+        dynamo.reset()
+
+    def serve(self, host="127.0.0.1", port=0, latency=0.0):
+        """
+        別スレッドでHTTPサーバーを起動する。server.server_address で接続先が分かる。
+        latency(秒)を指定するとリクエストごとにネットワーク越しの遅延を模して待つ
+        """
+        local = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if latency:
+                    time.sleep(latency)
+                status, payload = local.execute(self.headers["X-Amz-Target"], body)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/x-amz-json-1.0")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    # ---- リクエスト処理 ----
+
+    def execute(self, target, body):
+        """X-Amz-Target とJSONの本文から (HTTPステータス, 応答の本文) を返す"""
+        if isinstance(target, bytes):
+            target = target.decode("ascii")
+        operation = target[len(TARGET_PREFIX) :]
+        params = json.loads(body or b"{}")
+        with self._lock:
+            self.calls[operation] += 1
+            try:
+                status, response = 200, getattr(self, "_op_" + operation)(params)
+            except DynamoDBError as e:
+                status, response = 400, {
+                    "__type": "com.amazonaws.dynamodb.v20120810#" + e.code,
+                    "message": str(e),
+                }
+        return status, json.dumps(response).encode("utf-8")
+
+    def _handle(self, request, **kwargs):
+        from botocore.awsrequest import AWSResponse
+
+        status, payload = self.execute(request.headers["X-Amz-Target"], request.body)
+        headers = {
+            "Content-Type": "application/x-amz-json-1.0",
+            "Content-Length": str(len(payload)),
+        }
+        return AWSResponse(request.url, status, headers, _RawBody(payload))
+
+    def _table(self, table_name):
+        table = self.tables.get(table_name)
+        if table is None:
+            raise DynamoDBError(
+                "ResourceNotFoundException",
+                "Requested resource not found: {}".format(table_name),
+            )
+        return table
+
+    def _key(self, table, item):
+        hash_key, range_key = table["keys"]
+        key = (_scalar(item[hash_key]),)
+        if range_key is not None:
+            key += (_scalar(item[range_key]),)
+        return key
+
+    def _consume_read(self, size, params):
+        units = max(1, math.ceil(size / READ_UNIT_BYTES))
+        self.consumed["read"] += units if params.get("ConsistentRead") else units / 2
+
+    def _consume_write(self, operation, *items):
+        """書き込み前に呼ぶ。キャパシティを超えるならスロットリングする"""
+        size = max(_item_size(item) if item else 0 for item in items)
+        units = max(1, math.ceil(size / WRITE_UNIT_BYTES))
+        if self.write_capacity is not None:
+            second = int(self.clock())
+            if self._write_window[0] != second:
+                self._write_window = [second, 0.0]
+            if self._write_window[1] + units > self.write_capacity:
+                self.throttled[operation] += 1
+                raise DynamoDBError(
+                    "ProvisionedThroughputExceededException",
+                    "The level of configured provisioned throughput for the table "
+                    "was exceeded.",
+                )
+            self._write_window[1] += units
+        self.consumed["write"] += units
+        self.applied[operation] += 1
+        return units
+
+    def _op_GetItem(self, params):
+        table = self._table(params["TableName"])
+        item = table["items"].get(self._key(table, params["Key"]))
+        self._consume_read(_item_size(item) if item else 0, params)
+        if item is None:
+            return {}
+        return {"Item": _project(item, params)}
+
+    def _op_Query(self, params):
+        table = self._table(params["TableName"])
+        conditions = _parse_conditions(
+            params["KeyConditionExpression"],
+            params.get("ExpressionAttributeNames", {}),
+            params.get("ExpressionAttributeValues", {}),
+        )
+        matched = sorted(
+            (key, item)
+            for key, item in table["items"].items()
+            if all(
+                _compare(item.get(name), op, operands)
+                for name, op, operands in conditions
+            )
+        )
+        if "ExclusiveStartKey" in params:
+            start = self._key(table, params["ExclusiveStartKey"])
+            matched = [(key, item) for key, item in matched if key > start]
+        limit = min(params.get("Limit", self.page_items), self.page_items)
+        page = matched[:limit]
+        self._consume_read(sum(_item_size(item) for _, item in page), params)
+        response = {
+            "Items": [_project(item, params) for _, item in page],
+            "Count": len(page),
+            "ScannedCount": len(page),
+        }
+        if len(matched) > limit:
+            last = page[-1][1]
+            hash_key, range_key = table["keys"]
+            response["LastEvaluatedKey"] = {
+                name: last[name] for name in (hash_key, range_key) if name
+            }
+        return response
+
+    def _op_BatchGetItem(self, params):
+        responses = {}
+        for table_name, request in params["RequestItems"].items():
+            table = self._table(table_name)
+            found = []
+            for key in request["Keys"]:
+                item = table["items"].get(self._key(table, key))
+                self._consume_read(_item_size(item) if item else 0, request)
+                if item is not None:
+                    found.append(_project(item, request))
+            responses[table_name] = found
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def _op_PutItem(self, params):
+        table = self._table(params["TableName"])
+        key = self._key(table, params["Item"])
+        old = table["items"].get(key)
+        _check_condition(old, params)
+        self._consume_write("PutItem", old, params["Item"])
+        table["items"][key] = params["Item"]
+        if params.get("ReturnValues") == "ALL_OLD" and old:
+            return {"Attributes": old}
+        return {}
+
+    def _op_DeleteItem(self, params):
+        table = self._table(params["TableName"])
+        key = self._key(table, params["Key"])
+        old = table["items"].get(key)
+        _check_condition(old, params)
+        self._consume_write("DeleteItem", old)
+        table["items"].pop(key, None)
+        if params.get("ReturnValues") == "ALL_OLD" and old:
+            return {"Attributes": old}
+        return {}
+
+    def _op_UpdateItem(self, params):
+        table = self._table(params["TableName"])
+        key = self._key(table, params["Key"])
+        old = table["items"].get(key)
+        _check_condition(old, params)
+        new = dict(old or params["Key"])
+        updated = _apply_update(
+            new,
+            params.get("UpdateExpression", ""),
+            params.get("ExpressionAttributeNames", {}),
+            params.get("ExpressionAttributeValues", {}),
+        )
+        self._consume_write("UpdateItem", old, new)
+        table["items"][key] = new
+        return_values = params.get("ReturnValues", "NONE")
+        if return_values == "ALL_NEW":
+            return {"Attributes": new}
+        if return_values == "UPDATED_NEW":
+            return {"Attributes": {name: new[name] for name in updated if name in new}}
+        if return_values == "ALL_OLD" and old:
+            return {"Attributes": old}
+        if return_values == "UPDATED_OLD" and old:
+            return {"Attributes": {name: old[name] for name in updated if name in old}}
+        return {}
+
+    def _op_BatchWriteItem(self, params):
+        unprocessed = {}
+        consumed = {}
+        for table_name, requests in params["RequestItems"].items():
+            table = self._table(table_name)
+            consumed[table_name] = 0
+            for request in requests:
+                try:
+                    if "PutRequest" in request:
+                        item = request["PutRequest"]["Item"]
+                        key = self._key(table, item)
+                        units = self._consume_write(
+                            "BatchWriteItem", table["items"].get(key), item
+                        )
+                        table["items"][key] = item
+                    else:
+                        key = self._key(table, request["DeleteRequest"]["Key"])
+                        units = self._consume_write(
+                            "BatchWriteItem", table["items"].get(key)
+                        )
+                        table["items"].pop(key, None)
+                except DynamoDBError:
+                    unprocessed.setdefault(table_name, []).append(request)
+                    continue
+                consumed[table_name] += units
+        if unprocessed and not any(consumed.values()):
+            # 1件も書けなかったときは実際のDynamoDBと同じく例外にする
+            raise DynamoDBError(
+                "ProvisionedThroughputExceededException",
+                "The level of configured provisioned throughput for the table "
+                "was exceeded.",
+            )
+        response = {"UnprocessedItems": unprocessed}
+        if params.get("ReturnConsumedCapacity", "NONE") != "NONE":
+            response["ConsumedCapacity"] = [
+                {"TableName": name, "CapacityUnits": units}
+                for name, units in consumed.items()
+            ]
+        return response
+
+
+class _RawBody:
+    def __init__(self, body):
+        self._body = body
+
+    def stream(self, **kwargs):
+        yield self._body
+
+    def read(self, *args, **kwargs):
+        body, self._body = self._body, b""
+        return body
+
+
+def serialize(value):
+    """素のPythonの値を低レベルの属性値にする(dynamo.deserialize の逆)"""
+    if isinstance(value, bool):
+        return {"BOOL": value}
+    if value is None:
+        return {"NULL": True}
+    if isinstance(value, str):
+        return {"S": value}
+    if isinstance(value, (int, float, Decimal)):
+        return {"N": str(value)}
+    if isinstance(value, (set, frozenset)):
+        if all(isinstance(v, str) for v in value):
+            return {"SS": sorted(value)}
+        return {"NS": [str(v) for v in sorted(value)]}
+    if isinstance(value, (list, tuple)):
+        return {"L": [serialize(v) for v in value]}
+    if isinstance(value, dict):
+        return {"M": {k: serialize(v) for k, v in value.items()}}
+    raise TypeError("unsupported type: {}".format(type(value)))
+
+
+def serialize_item(item):
+    return {key: serialize(value) for key, value in item.items()}
+
+
+def _scalar(value):
+    ((kind, data),) = value.items()
+    return Decimal(data) if kind == "N" else data
+
+
+_CONDITION = re.compile(
+    r"^\s*(?:begins_with\(\s*(?P<bw_name>[#\w]+)\s*,\s*(?P<bw_value>:\w+)\s*\)"
+    r"|(?P<name>[#\w]+)\s*(?P<op>=|<=|>=|<|>)\s*(?P<value>:\w+))\s*$"
+)
+
+
+def _parse_conditions(expression, names, values):
+    conditions = []
+    for clause in re.split(r"\s+AND\s+", expression, flags=re.IGNORECASE):
+        match = _CONDITION.match(clause)
+        if match is None:
+            raise ValueError("unsupported key condition: {}".format(clause))
+        if match.group("bw_name"):
+            name = names.get(match.group("bw_name"), match.group("bw_name"))
+            conditions.append((name, "begins_with", values[match.group("bw_value")]))
+        else:
+            name = names.get(match.group("name"), match.group("name"))
+            conditions.append((name, match.group("op"), values[match.group("value")]))
+    return conditions
+
+
+def _compare(attribute, op, operand):
+    if attribute is None:
+        return False
+    left, right = _scalar(attribute), _scalar(operand)
+    if op == "=":
+        return left == right
+    if op == "<":
+        return left < right
+    if op == "<=":
+        return left <= right
+    if op == ">":
+        return left > right
+    if op == ">=":
+        return left >= right
+    return str(left).startswith(str(right))
+
+
+def _value_size(value):
+    ((kind, data),) = value.items()
+    if kind in ("S", "B"):
+        return len(data.encode("utf-8"))
+    if kind == "N":
+        return (len(data.lstrip("-").replace(".", "").strip("0")) + 1) // 2 + 1
+    if kind in ("BOOL", "NULL"):
+        return 1
+    if kind in ("SS", "BS", "NS"):
+        return sum(_value_size({kind[0]: v}) for v in data)
+    if kind == "L":
+        return 3 + sum(1 + _value_size(v) for v in data)
+    return 3 + sum(1 + len(k.encode("utf-8")) + _value_size(v) for k, v in data.items())
+
+
+def _item_size(item):
+    """DynamoDBの項目サイズの概算（属性名 + 値のバイト数）"""
+    return sum(len(name.encode("utf-8")) + _value_size(v) for name, v in item.items())
+
+
+_CONDITION_FUNCTION = re.compile(
+    r"^\s*(?P<func>attribute_exists|attribute_not_exists)\(\s*(?P<name>[#\w]+)\s*\)\s*$"
+)
+
+
+def _check_condition(item, params):
+    """ConditionExpression は attribute_(not_)exists と比較のANDだけ対応"""
+    expression = params.get("ConditionExpression")
+    if not expression:
+        return
+    names = params.get("ExpressionAttributeNames", {})
+    values = params.get("ExpressionAttributeValues", {})
+    item = item or {}
+    for clause in re.split(r"\s+AND\s+", expression, flags=re.IGNORECASE):
+        match = _CONDITION_FUNCTION.match(clause)
+        if match is not None:
+            name = names.get(match.group("name"), match.group("name"))
+            ok = (name in item) == (match.group("func") == "attribute_exists")
+        else:
+            ((name, op, operand),) = _parse_conditions(clause, names, values)
+            ok = _compare(item.get(name), op, operand)
+        if not ok:
+            raise DynamoDBError(
+                "ConditionalCheckFailedException", "The conditional request failed"
+            )
+
+
+_UPDATE_SECTION = re.compile(r"\b(SET|REMOVE|ADD|DELETE)\b", re.IGNORECASE)
+_SET_ACTION = re.compile(
+    r"^\s*(?P<name>[#\w]+)\s*=\s*(?P<left>[^+-]+?)\s*"
+    r"(?:(?P<op>[+-])\s*(?P<right>.+?))?\s*$"
+)
+
+
+def _apply_update(item, expression, names, values):
+    """
+    UpdateExpression をitemに適用し、更新した属性名を返す。
+    最上位の属性だけを対象に SET(値, +, -, if_not_exists, list_append)・
+    REMOVE・ADD・DELETE に対応する
+    """
+    updated = []
+    parts = _UPDATE_SECTION.split(expression)
+    for section, body in zip(parts[1::2], parts[2::2]):
+        section = section.upper()
+        for action in _split_actions(body):
+            if section == "REMOVE":
+                name = names.get(action, action)
+                item.pop(name, None)
+                updated.append(name)
+                continue
+            if section == "SET":
+                match = _SET_ACTION.match(action)
+                if match is None:
+                    raise ValueError("unsupported update action: {}".format(action))
+                name = names.get(match.group("name"), match.group("name"))
+                value = _operand(item, match.group("left"), names, values)
+                if match.group("op"):
+                    right = _operand(item, match.group("right"), names, values)
+                    value = _arithmetic(value, right, match.group("op"))
+                item[name] = value
+            else:
+                path, placeholder = action.split()
+                name = names.get(path, path)
+                value = values[placeholder]
+                if section == "ADD":
+                    item[name] = _add(item.get(name), value)
+                else:
+                    remaining = _delete(item.get(name), value)
+                    if remaining is None:
+                        item.pop(name, None)
+                    else:
+                        item[name] = remaining
+            updated.append(name)
+    return updated
+
+
+def _split_actions(body):
+    actions, depth, current = [], 0, ""
+    for char in body:
+        if char == "," and depth == 0:
+            actions.append(current.strip())
+            current = ""
+            continue
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        current += char
+    if current.strip():
+        actions.append(current.strip())
+    return actions
+
+
+def _operand(item, text, names, values):
+    text = text.strip()
+    if text.startswith(":"):
+        return values[text]
+    function = re.match(r"^(if_not_exists|list_append)\((.*)\)$", text)
+    if function is None:
+        return item[names.get(text, text)]
+    first, second = _split_actions(function.group(2))
+    if function.group(1) == "if_not_exists":
+        existing = item.get(names.get(first, first))
+        return (
+            existing if existing is not None else _operand(item, second, names, values)
+        )
+    left = _operand(item, first, names, values)
+    right = _operand(item, second, names, values)
+    return {"L": left["L"] + right["L"]}
+
+
+def _arithmetic(left, right, op):
+    result = Decimal(left["N"]) + Decimal(right["N"]) * (1 if op == "+" else -1)
+    return {"N": str(result)}
+
+
+def _add(existing, value):
+    if existing is None:
+        return value
+    if "N" in value:
+        return _arithmetic(existing, value, "+")
+    ((kind, members),) = value.items()
+    return {kind: _set_union(kind, existing[kind], members)}
+
+
+def _delete(existing, value):
+    if existing is None:
+        return None
+    ((kind, members),) = value.items()
+    if kind == "NS":
+        removed = {Decimal(v) for v in members}
+        remaining = [v for v in existing[kind] if Decimal(v) not in removed]
+    else:
+        remaining = [v for v in existing[kind] if v not in members]
+    return {kind: remaining} if remaining else None
+
+
+def _set_union(kind, left, right):
+    if kind == "NS":
+        merged = {Decimal(v): v for v in right}
+        merged.update((Decimal(v), v) for v in left)
+        return [merged[key] for key in sorted(merged)]
+    return sorted(set(left) | set(right))
+
+
+def _project(item, params):
+    expression = params.get("ProjectionExpression")
+    if not expression:
+        return item
+    names = params.get("ExpressionAttributeNames", {})
+    wanted = [names.get(name.strip(), name.strip()) for name in expression.split(",")]
+    return {name: item[name] for name in wanted if name in item}
@@ -0,0 +1,125 @@
+"""
+記録したLex V2の会話シーケンスを lambda_handler で再生するベンチマーク
+
+    python -m benchmarks.replay [events/lex/*.json ...] [--iterations 200] [--cold]
+
+DynamoDBは dynamodb/quizset/*.json を読み込んだインメモリ代替を使う。
+ターンごとのレイテンシ(p50/p95/p99)と、インテント別・ターン別の
+DynamoDB呼び出し回数、問題リポジトリの層ごとのヒット率を表示する。
+--cold を付けると毎回章キャッシュを捨てる。
+"""
+
+import argparse
+import glob
+import os
+import random
+import time
+from collections import Counter, defaultdict
+
+from benchmarks._common import ROOT_DIR, percentile
+from benchmarks.lex_events import LexSession, load_sequence
+from benchmarks.local_dynamodb import LocalDynamoDB
+
+import app  # noqa: E402
+import quiz_repository  # noqa: E402
+
+DEFAULT_SEQUENCES = os.path.join(ROOT_DIR, "events", "lex", "*.json")
+
+
+class ReplayStats:
+    def __init__(self):
+        self.latencies = defaultdict(list)  # intent -> [ms]
+        self.calls = defaultdict(Counter)  # intent -> Counter(operation)
+        self.turn_calls = defaultdict(Counter)  # (sequence, turn) -> Counter
+        self.turns = Counter()  # intent -> 回数
+
+    def record(self, sequence_name, index, intent_name, elapsed_ms, calls):
+        self.latencies[intent_name].append(elapsed_ms)
+        self.calls[intent_name].update(calls)
+        self.turn_calls[(sequence_name, index, intent_name)].update(calls)
+        self.turns[intent_name] += 1
+
+    def report(self, iterations):
+        print(
+            "{:<14} {:>6} {:>9} {:>9} {:>9}  DynamoDB calls/turn".format(
+                "intent", "turns", "p50(ms)", "p95(ms)", "p99(ms)"
+            )
+        )
+        for intent_name in sorted(self.latencies):
+            samples = self.latencies[intent_name]
+            per_turn = {
+                op: round(count / self.turns[intent_name], 2)
+                for op, count in sorted(self.calls[intent_name].items())
+            }
+            print(
+                "{:<14} {:>6} {:>9.3f} {:>9.3f} {:>9.3f}  {}".format(
+                    intent_name,
+                    len(samples),
+                    percentile(samples, 50),
+                    percentile(samples, 95),
+                    percentile(samples, 99),
+                    per_turn or "-",
+                )
+            )
+        print()
+        print("DynamoDB calls per turn (average over {} iterations)".format(iterations))
+        for (name, index, intent_name), calls in sorted(self.turn_calls.items()):
+            per_turn = {op: round(n / iterations, 2) for op, n in sorted(calls.items())}
+            print(
+                "  {} #{:<2} {:<13} {}".format(
+                    name, index, intent_name, per_turn or "-"
+                )
+            )
+
+
+def replay(sequences, iterations, cold=False, seed=0, local=None):
+    if local is None:
+        local = LocalDynamoDB().install()
+        local.seed_quizset()
+    random.seed(seed)
+    stats = ReplayStats()
+    for iteration in range(iterations):
+        for sequence in sequences:
+            if cold:
+                app.chapter_cache.invalidate()
+            session = LexSession(app.lambda_handler, "replay-{}".format(iteration))
+            for index, turn in enumerate(sequence["turns"]):
+                before = Counter(local.calls)
+                started = time.perf_counter()
+                session.send(turn["intent"], turn["slots"], turn["source"])
+                elapsed = (time.perf_counter() - started) * 1000
+                stats.record(
+                    sequence["name"],
+                    index,
+                    turn["intent"],
+                    elapsed,
+                    local.calls - before,
+                )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sequences", nargs="*")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--cold", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    app.structured_log.configure()
+    paths = args.sequences or sorted(glob.glob(DEFAULT_SEQUENCES))
+    sequences = [load_sequence(path) for path in paths]
+
+    local = LocalDynamoDB().install()
+    local.seed_quizset()
+    replay(sequences, 1, args.cold, args.seed, local)  # boto3の読み込みなどを済ませる
+    stats = replay(sequences, args.iterations, args.cold, args.seed, local)
+    stats.report(args.iterations)
+    print()
+    print("repository hits/lookups per layer (QUIZ_BACKEND / QUIZ_LRU_SIZE)")
+    print("  " + quiz_repository.describe(quiz_repository.get_repository()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+苦手な問題を多めに出題する（適応的な出題）
+
+ユーザーと章ごとに、問題idごとの「苦手度」だけを持つ小さなプロファイルを
+結果テーブルに置く（キー: (user_id, "profile:" + chapter_code)）。
+user_id は Welcome で聞いた名前（"user:" + 名前）。名前がなければLexのsessionIdで、
+その場合はセッションが変わると別のプロファイルになる。
+名前は自由入力なので本人の確認にはならない。同じ名前で遊ぶ人は1つのプロファイルを共有する。
+    不正解で +2、正解で -1（0から MAX_LEVEL まで）。0の問題は持たない
+出題は重み 1 + 苦手度 に比例した重複なしの抽出（sampling.weighted_sample）。
+プロファイルはクイズ開始時に読み（ウォームコンテナではキャッシュ）、終了時にもう一度読み直して
+結果を反映し、結果といっしょのBatchWriteItemで書き込む。別のコンテナで同じユーザーが
+進めた更新を古いコピーで上書きしないため。読めなかったときは書き込まない。
+
+    ADAPTIVE_CHAPTERS   適応的に出題する章（カンマ区切り、"*" ですべて。空なら使わない）
+"""
+
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import dynamo
+import results_store
+import structured_log
+from sampling import weighted_sample
+
+MAX_LEVEL = 6
+MISS_STEP = 2
+HIT_STEP = 1
+PROFILE_PREFIX = "profile:"
+USER_PREFIX = "user:"
+# 名前を聞いていないときの userInfo（全員に共通なのでキーにしない）
+ANONYMOUS = "匿名"
+DEFAULT_CACHE_SIZE = 256
+
+logger = structured_log.logger
+
+
+def adaptive_chapters():
+    chapters = os.environ.get("ADAPTIVE_CHAPTERS", "")
+    return {code.strip() for code in chapters.split(",") if code.strip()}
+
+
+def enabled(chapter_code):
+    chapters = adaptive_chapters()
+    return "*" in chapters or chapter_code in chapters
+
+
+class WeaknessProfile:
+    def __init__(self, levels=None):
+        self.levels = {int(q_id): int(level) for q_id, level in (levels or {}).items()}
+
+    def weight(self, q_id):
+        return 1 + self.levels.get(int(q_id), 0)
+
+    def update(self, results):
+        """examState の results ([{"id", "result"}, ...]) を反映する"""
+        for result in results:
+            q_id = int(result["id"])
+            level = self.levels.get(q_id, 0)
+            if result["result"] == "correct":
+                level = max(0, level - HIT_STEP)
+            else:
+                level = min(MAX_LEVEL, level + MISS_STEP)
+            if level:
+                self.levels[q_id] = level
+            else:
+                self.levels.pop(q_id, None)
+        return self
+
+    def to_item(self, user_id, chapter_code, now=None):
+        return {
+            "session_id": user_id,
+            "quiz_key": PROFILE_PREFIX + chapter_code,
+            "levels": {str(q_id): level for q_id, level in sorted(self.levels.items())},
+            "updated_at": int((time.time() if now is None else now) * 1000),
+        }
+
+    @classmethod
+    def from_item(cls, item):
+        return cls(None if item is None else item.get("levels"))
+
+
+class ProfileStore:
+    """
+    出題の重み付けに使うプロファイルをウォームコンテナ内で保持する。
+    読めなかったプロファイルは保持しない（次の機会に読み直す）
+    """
+
+    def __init__(self, load, max_items=DEFAULT_CACHE_SIZE):
+        # load(user_id, chapter_code) -> 結果テーブルのアイテム | None
+        self._load = load
+        self.max_items = max_items
+        self._profiles = OrderedDict()  # (user_id, chapter_code) -> WeaknessProfile
+        self._lock = threading.Lock()
+
+    def get(self, user_id, chapter_code):
+        key = (user_id, chapter_code)
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is not None:
+                self._profiles.move_to_end(key)
+                return profile
+        profile = self.load(user_id, chapter_code)
+        # 読めなければ一様な出題と同じになる
+        return WeaknessProfile() if profile is None else profile
+
+    def load(self, user_id, chapter_code):
+        """テーブルから読み直してキャッシュを置き換える。読めなければ None"""
+        try:
+            profile = WeaknessProfile.from_item(self._load(user_id, chapter_code))
+        except Exception:
+            logger.warning("苦手プロファイルを読めない", exc_info=True)
+            return None
+        self.put(user_id, chapter_code, profile)
+        return profile
+
+    def put(self, user_id, chapter_code, profile):
+        with self._lock:
+            self._profiles[(user_id, chapter_code)] = profile
+            self._profiles.move_to_end((user_id, chapter_code))
+            while len(self._profiles) > self.max_items:
+                self._profiles.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+def load_profile(user_id, chapter_code):
+    table_name = results_store.results_table()
+    if not table_name:
+        return None
+    response = dynamo.get_client(fast_fail=True).get_item(
+        TableName=table_name,
+        Key={
+            "session_id": {"S": user_id},
+            "quiz_key": {"S": PROFILE_PREFIX + chapter_code},
+        },
+    )
+    item = response.get("Item")
+    return None if item is None else dynamo.deserialize_item(item)
+
+
+profiles = ProfileStore(load_profile)
+
+
+def user_id(user_name, session_id):
+    """プロファイルのキー。名前があれば "user:" + 名前、なければsessionId"""
+    if user_name and user_name != ANONYMOUS:
+        return USER_PREFIX + user_name
+    return session_id
+
+
+def select(repository, user_id, chapter_code, k, rng=random):
+    """苦手度で重み付けしてk問のidを選ぶ"""
+    profile = profiles.get(user_id, chapter_code)
+    ids = repository.ids(chapter_code)
+    return weighted_sample(ids, [profile.weight(q_id) for q_id in ids], int(k), rng)
+
+
+def record(user_id, chapter_code, exam_state):
+    """
+    終わったクイズの結果をプロファイルに反映し、書き込むアイテムを返す。
+    書き込む直前に読み直し、読めなければ保存済みの履歴を消さないように None を返す
+    """
+    profile = profiles.load(user_id, chapter_code)
+    if profile is None:
+        return None
+    return profile.update(exam_state["results"]).to_item(user_id, chapter_code)
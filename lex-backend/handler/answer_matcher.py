@@ -0,0 +1,121 @@
+"""
+回答の判定
+
+解答(a)と惜しい解答(secondary_a)を問題ごとに一度だけ正規化してsetにしておき、
+回答は正規化してset参照するだけで判定する。
+
+    正規化: NFKC(全角/半角の統一) → casefold → カタカナをひらがなに → 空白除去
+
+記述問題(Desc)は ANSWER_MAX_EDIT_DISTANCE を1以上にすると、
+その編集距離以内の回答も正解にする（既定は0で無効）。
+"""
+
+import os
+import unicodedata
+
+CORRECT = "correct"
+NEAR_MISS = "near_miss"
+INCORRECT = "incorrect"
+
+# コンパイル結果を持たせる問題dictのキー（quiz_prefetch.FIELDS にないのでセッションには出ない）
+COMPILED_KEY = "_compiled_answers"
+
+# ァ(U+30A1)〜ヶ(U+30F6) をひらがなに寄せる
+_KANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+
+def normalize(text):
+    text = str(text)
+    if text.isascii():
+        # ASCIIはNFKCで変わらずcasefoldもlowerと同じ
+        return "".join(text.lower().split())
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return "".join(text.translate(_KANA_TO_HIRAGANA).split())
+
+
+def max_edit_distance():
+    return int(os.environ.get("ANSWER_MAX_EDIT_DISTANCE", "0"))
+
+
+class CompiledAnswers:
+    __slots__ = ("accepted", "near_miss", "by_length")
+
+    def __init__(self, answers, near_miss_answers):
+        self.accepted = frozenset(normalize(a) for a in answers)
+        self.near_miss = (
+            frozenset(normalize(a) for a in near_miss_answers) - self.accepted
+        )
+        # 編集距離の候補を長さで絞り込むための索引
+        by_length = {}
+        for answer in self.accepted:
+            by_length.setdefault(len(answer), []).append(answer)
+        self.by_length = by_length
+
+    def judge(self, answer, distance=0):
+        normalized = normalize(answer)
+        if normalized in self.accepted:
+            return CORRECT
+        if normalized in self.near_miss:
+            return NEAR_MISS
+        if distance > 0 and self._within(normalized, distance):
+            return CORRECT
+        return INCORRECT
+
+    def _within(self, answer, distance):
+        length = len(answer)
+        for candidate_length in range(length - distance, length + distance + 1):
+            for candidate in self.by_length.get(candidate_length, ()):
+                if bounded_edit_distance(answer, candidate, distance) <= distance:
+                    return True
+        return False
+
+
+def compile_answers(quiz):
+    """
+    コンパイル結果は問題のdictに (a, secondary_a, CompiledAnswers) として持たせる。
+    章キャッシュ・LRUの問題は同じdictが渡ってくるので、2回目からはリストの is 比較だけで使える。
+    dict(quiz, a=...) のように解答を差し替えたコピーは作り直す
+    """
+    answers = quiz["a"]
+    near_miss_answers = quiz.get("secondary_a")
+    entry = quiz.get(COMPILED_KEY)
+    if entry is not None and entry[0] is answers and entry[1] is near_miss_answers:
+        return entry[2]
+    compiled = CompiledAnswers(answers, near_miss_answers or [])
+    quiz[COMPILED_KEY] = (answers, near_miss_answers, compiled)
+    return compiled
+
+
+def judge(quiz, answer):
+    compiled = compile_answers(quiz)
+    distance = max_edit_distance() if quiz.get("kind") == "Desc" else 0
+    return compiled.judge(answer, distance)
+
+
+def bounded_edit_distance(a, b, limit):
+    """レーベンシュタイン距離。limitを超えることが分かった時点でlimit+1を返す"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) > len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        # 対角線から±limitの帯だけを計算する
+        low = max(1, i - limit)
+        high = min(len(b), i + limit)
+        if low > 1:
+            current[low - 1] = limit + 1
+        for j in range(low, high + 1):
+            cost = 0 if char_a == b[j - 1] else 1
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + cost,
+            )
+        if high < len(b):
+            current[high + 1 :] = [limit + 1] * (len(b) - high)
+        if min(current[low - 1 : high + 1]) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[len(b)], limit + 1)
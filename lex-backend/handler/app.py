@@ -1,15 +1,43 @@
 import json
-import logging
 import os
-import random
 import time
 from decimal import Decimal
 
-import boto3
-from boto3.dynamodb.conditions import Key
+import adaptive
+import answer_matcher
+import dynamo
+import metrics
+import question_cards
+import question_stats
+import quiz_prefetch
+import quiz_repository
+import results_store
+import session_codec
+import structured_log
+from router import Router
+from session_codec import new_exam_state
+
+logger = structured_log.logger
+router = Router()
+
+# セッション属性の変換は "session" として計る（session_codec 自体は計測に依存しない）
+decode_chapter_info = metrics.timed("session")(session_codec.decode_chapter_info)
+decode_exam_state = metrics.timed("session")(session_codec.decode_exam_state)
+encode_chapter_info = metrics.timed("session")(session_codec.encode_chapter_info)
+encode_exam_state = metrics.timed("session")(session_codec.encode_exam_state)
+
+
+def init_process():
+    # コンテナ起動時に一度だけ行う初期化。
+    # boto3はDynamoDBを使うインテントで初めて読み込む(dynamo.py)
+    os.environ["TZ"] = "Asia/Tokyo"
+    time.tzset()
+    structured_log.configure()
+    if os.environ.get("PRELOAD_AWS_SDK", "false").lower() in ("1", "true"):
+        dynamo.preload()
+
 
-logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
+init_process()
 
 
 def decimal_default_proc(obj):
@@ -68,6 +96,7 @@ def elicit_intent(intent_request, session_attributes, message, response_card):
     }
 
 
+@metrics.timed("elicit_slot")
 def elicit_slot(
     intent_request,
     session_attributes,
@@ -137,12 +166,6 @@ def delegate(session_attributes, intent_name, slots, message=None):
 
 
 def build_response_card(title, subtitle, imageUrl, options):
-    buttons = None
-    if options is not None:
-        buttons = []
-        for i in range(min(5, len(options))):
-            buttons.append(options[i])
-
     return {
         "contentType": "ImageResponseCard",
         "content": "一つ選択してください",
@@ -150,39 +173,14 @@ def build_response_card(title, subtitle, imageUrl, options):
             "title": title,
             "subtitle": subtitle,
             "imageUrl": imageUrl,
-            "buttons": buttons,
+            "buttons": question_cards.limit_buttons(options),
         },
     }
 
 
 def build_options(slot):
-    if slot == "ChapterCode":
-        return [
-            {"text": "A章 消化器", "value": "A"},
-            {"text": "B章 肝胆膵", "value": "B"},
-            {"text": "C章 循環器", "value": "C"},
-        ]
-    elif slot == "QuestionNum":
-        return [
-            {"text": "3問", "value": 3},
-            {"text": "5問", "value": 5},
-            {"text": "7問", "value": 7},
-        ]
-    elif slot == "Confirmation":
-        return [
-            {"text": "もちろん!", "value": "Start QuizBot"},
-            {"text": "忙しくて。。。", "value": "いいえ"},
-        ]
-    elif slot == "ResultConfirmation":
-        return [
-            {
-                "text": "ううん...",
-                "value": "True",
-            },
-            {"text": "ちょ、やめ", "value": "False"},
-        ]
-    else:
-        return [{"text": "うん!!", "value": "はい"}, {"text": "ちがう！！", "value": "いいえ"}]
+    # スロットごとの選択肢は question_cards.OPTIONS の共有タプル（書き換えない）
+    return question_cards.options(slot)
 
 
 def build_validation_result(is_valid, violated_slot, message_content):
@@ -196,7 +194,7 @@ def build_validation_result(is_valid, violated_slot, message_content):
 def validate_chapter_value(chapter_code, question_num):
     valid_chapters = ["A", "B", "C"]
     valid_question_num = ["3", "5", "7"]
-    print(f"chapter: {chapter_code}, max_question: {question_num}")
+    logger.debug("chapter: %s, max_question: %s", chapter_code, question_num)
     if not chapter_code:
         return build_validation_result(False, "ChapterCode", "Chapterを選んでください")
 
@@ -220,7 +218,7 @@ def validate_chapter_value(chapter_code, question_num):
 
 
 def validate_answer_value(answer, kind):
-    print(f"asnwer: {answer}, kind: {kind}")
+    logger.debug("answer: %s, kind: %s", answer, kind)
     valid_answers_bool = ["はい", "いいえ"]
 
     if not answer:
@@ -238,9 +236,10 @@ def validate_answer_value(answer, kind):
 
 
 # chapter_code, question_num
+@router.route("CheckChapter")
 def check_chapter(intent_request):
     slots = get_slots(intent_request)
-    print(slots)
+    logger.debug("slots: %s", slots)
     chapter_code = get_slot(intent_request, "ChapterCode")
     question_num = get_slot(intent_request, "QuestionNum")
     source = intent_request["invocationSource"]
@@ -251,17 +250,16 @@ def check_chapter(intent_request):
     else:
         output_session_attributes["userInfo"] = user_name
 
-    chapter_info = json.loads(
-        try_ex(lambda: output_session_attributes["chapterInfo"]) or "{}"
+    chapter_info = decode_chapter_info(
+        try_ex(lambda: output_session_attributes["chapterInfo"])
     )
-    print(chapter_info)
-    print(source)
+    logger.debug("chapter_info: %s, source: %s", chapter_info, source)
     if source == "DialogCodeHook":
-        print("case 0(check_chapter)")
+        logger.debug("case 0(check_chapter)")
         validation_result = validate_chapter_value(chapter_code, question_num)
-        print("validation_result: {}".format(validation_result))
+        logger.debug("validation_result: %s", validation_result)
         if not validation_result["isValid"]:
-            print("case 1(check_chapter)")
+            logger.debug("case 1(check_chapter)")
             slots[validation_result["violatedSlot"]] = None
             response = elicit_slot(
                 intent_request,
@@ -277,7 +275,7 @@ def check_chapter(intent_request):
                     build_options(validation_result["violatedSlot"]),
                 ),
             )
-            print(response)
+            structured_log.dump("response", response)
             return response
         response = confirm_intent(
             intent_request,
@@ -299,12 +297,12 @@ def check_chapter(intent_request):
                 build_options(validation_result["violatedSlot"]),
             ),
         )
-        print(response)
+        structured_log.dump("response", response)
         return response
     elif source == "FulfillmentCodeHook":
         chapter_info = {"chapter_code": chapter_code, "question_num": question_num}
-        output_session_attributes["chapterInfo"] = json.dumps(chapter_info)
-        print(output_session_attributes["chapterInfo"])
+        output_session_attributes["chapterInfo"] = encode_chapter_info(chapter_info)
+        logger.debug("chapterInfo: %s", output_session_attributes["chapterInfo"])
         response = confirm_intent(
             intent_request,
             output_session_attributes,
@@ -324,17 +322,11 @@ def check_chapter(intent_request):
                 build_options("Confirmation"),
             ),
         )
-        print(response)
+        structured_log.dump("response", response)
         return response
 
 
 def format_question(content, title, subtitle, imageUrl, options):
-    buttons = None
-    if options is not None:
-        buttons = []
-        for i in range(min(5, len(options))):
-            buttons.append(options[i])
-
     return {
         "contentType": "ImageResponseCard",
         "content": content,
@@ -342,77 +334,64 @@ def format_question(content, title, subtitle, imageUrl, options):
             "title": title,
             "subtitle": subtitle,
             "imageUrl": imageUrl,
-            "buttons": buttons,
+            "buttons": question_cards.limit_buttons(options),
         },
     }
 
 
+@metrics.timed("build_question_card")
 def build_question_card(quiz, subtitle, current_num):
-    quiz_type = quiz["kind"]
-    quiz_text = quiz["q"]
-    question_card = ""
-    print(quiz_type, quiz_text)
-    if quiz_type == "ChoiceBool":
-        return format_question(
-            f"第{current_num + 1}問：{quiz_text}",
-            f"第{current_num + 1}問：{quiz_text}",
-            subtitle,
-            None,
-            build_options("ChoiceBool"),
-        )
-    elif quiz_type == "Image":
-        return format_question(
-            f"第{current_num + 1}問：{quiz_text}",
-            f"第{current_num + 1}問：{quiz_text}",
-            subtitle,
-            quiz["image"],
-            None,
-        )
-    elif quiz_type == "Desc":
-        return format_question(
-            f"第{current_num + 1}問：{quiz_text}",
-            f"第{current_num + 1}問：{quiz_text}",
-            subtitle,
-            None,
-            None,
-        )
-    return question_card
+    # 問題ごとのテンプレートに問題番号とsubtitleを入れるだけ
+    return question_cards.question_card(quiz, subtitle, current_num)
 
 
-def fetch_quiz_set(chapter_code, question_num):
-    table_name = os.environ.get("DYNAMODB_TABLE", "QuizTable")
-    region = os.environ.get("REGION_NAME", "us-east-1")
+# 章キャッシュ（replay --cold などで無効化する）
+chapter_cache = quiz_repository.dynamodb_repository.chapter_cache
 
-    quiz_table = boto3.resource("dynamodb", region_name=region)
-    table = quiz_table.Table(table_name)
 
-    response = table.query(KeyConditionExpression=Key("chapter_code").eq(chapter_code))
+@metrics.timed("fetch_quiz_set")
+def fetch_quiz_set(chapter_code, question_num, user_id=None):
+    logger.debug("%s章から%s問取得する", chapter_code, question_num)
+    repository = quiz_repository.get_repository()
+    if user_id is not None and adaptive.enabled(chapter_code):
+        q_id_list = adaptive.select(repository, user_id, chapter_code, question_num)
+    else:
+        q_id_list = repository.sample_ids(chapter_code, question_num)
+    return [str(q_id) for q_id in q_id_list]
 
-    print(":::::==>>>", response)
 
-    print("{}章から{}問取得する".format(chapter_code, question_num))
-    quiz_sets = response["Items"]
-    random.shuffle(quiz_sets)
-    quiz_list = json.loads(json.dumps(quiz_sets, default=decimal_default_proc))[
-        : int(question_num)
-    ]
-    quiz_id_list = [str(d.get("id")) for d in quiz_list]
-    return quiz_id_list
+@metrics.timed("set_quiz")
+def set_quiz(chapter_code, q_id_list, current_num):
+    repository = quiz_repository.get_repository()
+    return repository.get_item(chapter_code, int(q_id_list[current_num]))
+
+
+@metrics.timed("prefetch_quiz_set")
+def prefetch_quiz_set(session_attributes, chapter_code, q_id_list):
+    # 出題する問題をまとめてセッションに載せ、以降のターンでDynamoDBを読まない
+    items = quiz_repository.get_repository().batch_get(chapter_code, q_id_list)
+    payload = quiz_prefetch.encode_items(items)
+    if not quiz_prefetch.fits(session_attributes, payload):
+        logger.warning(
+            "セッション属性の上限を超えるためidのみ保持: %dbytes", len(payload)
+        )
+        session_attributes.pop(quiz_prefetch.SESSION_KEY, None)
+        return {}
+    session_attributes[quiz_prefetch.SESSION_KEY] = payload
+    return {item["id"]: item for item in items}
 
 
-def set_quiz(chapter_code, q_id_list, current_num):
-    table_name = os.environ.get("DYNAMODB_TABLE", "QuizTable")
-    region = os.environ.get("REGION_NAME", "us-east-1")
+class QuizItemNotFound(Exception):
+    """出題リストの問題がテーブルにない（出題を決めた後に削除されたなど）"""
 
-    quiz_table = boto3.resource("dynamodb", region_name=region)
-    table = quiz_table.Table(table_name)
 
-    response = table.query(
-        KeyConditionExpression=Key("chapter_code").eq(chapter_code)
-        & Key("id").eq(int(q_id_list[current_num]))
-    )
-    print(":::::==>>>", response["Items"])
-    return json.loads(json.dumps(response["Items"], default=decimal_default_proc))[0]
+def next_quiz(chapter_code, q_id_list, current_num, prefetched_items):
+    q_item = prefetched_items.get(int(q_id_list[current_num]))
+    if q_item is None:
+        q_item = set_quiz(chapter_code, q_id_list, current_num)
+    if q_item is None:
+        raise QuizItemNotFound(chapter_code, q_id_list[current_num])
+    return q_item
 
 
 def update_exam_state_info(exam_state_info, quiz, current_num, result_value):
@@ -425,20 +404,21 @@ def update_exam_state_info(exam_state_info, quiz, current_num, result_value):
     return exam_state_info
 
 
-def judge_answer(quiz, answer, exam_state_info, current_num):
+@metrics.timed("judge_answer")
+def judge_answer(quiz, answer, exam_state_info, current_num, chapter_code):
     # 判定結果ごとにexam_state_infoのupdate, messageの雛形とさいしんのexam_stateを返す
     # あっていたら「正解」間違ってたら「残念」と返答 exam_state_infoを更新
-    print("解答", quiz["a"])
-    print("回答", answer)
-    print(exam_state_info)
-    if answer in quiz["a"]:
+    logger.debug("解答: %s, 回答: %s, state: %s", quiz["a"], answer, exam_state_info)
+    result = answer_matcher.judge(quiz, answer)
+    question_stats.record(chapter_code, quiz["id"], result)
+    if result == answer_matcher.CORRECT:
         new_state = update_exam_state_info(
             exam_state_info, quiz, current_num, "correct"
         )
         output_message = f"""正解！！！  
         コメント： {quiz['comment']}"""
         return [new_state, output_message]
-    elif answer in quiz["secondary_a"]:
+    elif result == answer_matcher.NEAR_MISS:
         new_state = update_exam_state_info(
             exam_state_info, quiz, current_num, "incorrect"
         )
@@ -456,6 +436,7 @@ def judge_answer(quiz, answer, exam_state_info, current_num):
 
 
 # is_canceled, is_displayed_results
+@router.route("StartQuiz")
 def start_quiz(intent_request):
     is_canceled = True if get_slot(intent_request, "IsCanceled") == "True" else False
     is_displayed_results = (
@@ -465,8 +446,8 @@ def start_quiz(intent_request):
 
     slots = get_slots(intent_request)
     output_session_attributes = get_session_attributes(intent_request)
-    chapter_info = json.loads(
-        try_ex(lambda: output_session_attributes["chapterInfo"]) or "{}"
+    chapter_info = decode_chapter_info(
+        try_ex(lambda: output_session_attributes["chapterInfo"])
     )
 
     if chapter_info == {}:
@@ -487,29 +468,24 @@ def start_quiz(intent_request):
 
     user_name = try_ex(lambda: output_session_attributes["userInfo"]) or "匿名"
     # {"is_finished": boolean, current_num: number , max_num: number ,"results": [{"id": 1, "result": "correct"}, {"id": 2, "result": "incorrect"}]}
-    exam_state_info = json.loads(
+    exam_state_info = decode_exam_state(
         try_ex(lambda: output_session_attributes["examState"])
-        or json.dumps(
-            {
-                "is_finished": False,
-                "max_num": question_num,
-                "current_num": 0,
-                "results": [],
-                "q_list": [],
-            }
-        )
-    )
+    ) or new_exam_state(question_num)
     is_finished = exam_state_info["is_finished"]
     current_num = exam_state_info["current_num"]
     results_history_list = exam_state_info["results"]
     q_id_list = exam_state_info["q_list"]
+    prefetched_items = quiz_prefetch.decode_items(
+        try_ex(lambda: output_session_attributes[quiz_prefetch.SESSION_KEY]),
+        chapter_code,
+    )
 
     # キャンセル時の対応
-    print("is_finished:", is_finished)
+    logger.debug("is_finished: %s", is_finished)
 
     # 結果発表時の対応
     if is_finished is True and is_displayed_results is False:
-        print("結果を非表示で終了")
+        logger.debug("結果を非表示で終了")
         clear_session_attributes(intent_request)
         return close(
             intent_request,
@@ -555,14 +531,16 @@ def start_quiz(intent_request):
     source = intent_request["invocationSource"]
     if source == "DialogCodeHook":
         if is_canceled is True:
-            print("終了")
+            logger.debug("終了")
         if is_finished is not True:
             if answer is not None:
                 # answerのバリデーション処理
-                q_item = set_quiz(chapter_code, q_id_list, current_num)
+                q_item = next_quiz(
+                    chapter_code, q_id_list, current_num, prefetched_items
+                )
                 validation_result = validate_answer_value(answer, q_item["kind"])
                 if not validation_result["isValid"]:
-                    print("answerのバリデーション処理", validation_result)
+                    logger.debug("answerのバリデーション処理: %s", validation_result)
                     slots[validation_result["violatedSlot"]] = None
                     response = elicit_slot(
                         intent_request,
@@ -586,17 +564,21 @@ def start_quiz(intent_request):
 
                 # 判定処理（結果メッセージ+解説メッセージを受け取り、stateを更新している）
                 [exam_state_info, message] = judge_answer(
-                    q_item, answer, exam_state_info, current_num
+                    q_item, answer, exam_state_info, current_num, chapter_code
                 )
-                print(exam_state_info, message)
+                logger.debug("state: %s, message: %s", exam_state_info, message)
                 # slot(Answer)を空に、current_num更新してelicit_slot
-                output_session_attributes["examState"] = json.dumps(exam_state_info)
+                output_session_attributes["examState"] = encode_exam_state(
+                    exam_state_info
+                )
 
                 if (current_num + 1) < int(question_num):
                     # 次の問題があれば問題を作成する
                     slots["Answer"] = None
                     current_num += 1
-                    q_item = set_quiz(chapter_code, q_id_list, current_num)
+                    q_item = next_quiz(
+                        chapter_code, q_id_list, current_num, prefetched_items
+                    )
                     response = elicit_slot(
                         intent_request,
                         output_session_attributes,
@@ -607,7 +589,9 @@ def start_quiz(intent_request):
                             {"contentType": "CustomPayload", "content": f"{message}"},
                             {
                                 "contentType": "CustomPayload",
-                                "content": f"第{current_num + 1}問：{q_item['q']}",
+                                "content": question_cards.question_label(
+                                    q_item, current_num
+                                ),
                             },
                         ],
                         build_question_card(
@@ -621,7 +605,28 @@ def start_quiz(intent_request):
                     new_state = update_exam_state_info(
                         exam_state_info, None, None, None
                     )
-                    output_session_attributes["examState"] = json.dumps(exam_state_info)
+                    output_session_attributes["examState"] = encode_exam_state(
+                        exam_state_info
+                    )
+                    # 結果の保存はクイズ1回につき1度だけ
+                    session_id = intent_request["sessionId"]
+                    profile_items = []
+                    if adaptive.enabled(chapter_code):
+                        profile_item = adaptive.record(
+                            adaptive.user_id(user_name, session_id),
+                            chapter_code,
+                            exam_state_info,
+                        )
+                        if profile_item is not None:
+                            profile_items.append(profile_item)
+                    results_store.save_result(
+                        session_id,
+                        user_name,
+                        chapter_code,
+                        exam_state_info,
+                        profile_items,
+                    )
+                    question_stats.flush()
                     response = elicit_slot(
                         intent_request,
                         output_session_attributes,
@@ -645,20 +650,21 @@ def start_quiz(intent_request):
                     )
                 return response
             if len(q_id_list) == 0:
-                q_id_list = fetch_quiz_set(chapter_code, question_num)
-                exam_state_info = json.dumps(
-                    {
-                        "is_finished": False,
-                        "max_num": question_num,
-                        "current_num": 0,
-                        "results": [],
-                        "q_list": q_id_list,
-                    }
+                q_id_list = fetch_quiz_set(
+                    chapter_code,
+                    question_num,
+                    adaptive.user_id(user_name, intent_request["sessionId"]),
+                )
+                exam_state_info = encode_exam_state(
+                    new_exam_state(question_num, q_id_list)
                 )
-
                 output_session_attributes["examState"] = exam_state_info
-            q_item = set_quiz(chapter_code, q_id_list, current_num)
-            print("出題", q_item)
+                if quiz_prefetch.prefetch_enabled():
+                    prefetched_items = prefetch_quiz_set(
+                        output_session_attributes, chapter_code, q_id_list
+                    )
+            q_item = next_quiz(chapter_code, q_id_list, current_num, prefetched_items)
+            logger.debug("出題: %s", q_item)
             # 出題カード作成
             response = elicit_slot(
                 intent_request,
@@ -670,7 +676,7 @@ def start_quiz(intent_request):
                     {"contentType": "PlainText", "content": f"{chapter_code}章からの出題"},
                     {
                         "contentType": "CustomPayload",
-                        "content": f"第{current_num + 1}問：{q_item['q']}",
+                        "content": question_cards.question_label(q_item, current_num),
                     },
                 ],
                 build_question_card(
@@ -688,13 +694,14 @@ def start_quiz(intent_request):
         )
 
 
+@router.route("Welcome")
 def welcome(intent_request):
     slots = get_slots(intent_request)
     user_name = get_slot(intent_request, "UserName")
     output_session_attributes = get_session_attributes(intent_request)
 
     if user_name is not None:
-        print("elicit intent(Welcome)", user_name)
+        logger.debug("elicit intent(Welcome): %s", user_name)
         output_session_attributes["userInfo"] = user_name
 
         return close(
@@ -710,7 +717,7 @@ def welcome(intent_request):
         )
 
     else:
-        print("Delegate!!(welcome)")
+        logger.debug("Delegate!!(welcome)")
         return delegate(
             output_session_attributes,
             intent_request["sessionState"]["intent"]["name"],
@@ -718,33 +725,106 @@ def welcome(intent_request):
         )
 
 
-def dispatch(intent_request):
-    logger.debug(
-        "dispatch sessionId={}, intentName={}".format(
-            intent_request["sessionId"],
-            intent_request["sessionState"]["intent"]["name"],
-        )
+@router.fallback
+def delegate_to_lex(intent_request):
+    # Help / FeedBack などLex側の設定だけで応答するインテント
+    return delegate(
+        get_session_attributes(intent_request),
+        intent_request["sessionState"]["intent"]["name"],
+        get_slots(intent_request),
     )
 
+
+def metrics_middleware(intent_request, call_next):
+    # METRICS_ENABLED=true のときだけ段階ごとの時間をEMFで1行出す
+    started = metrics.begin()
+    try:
+        return call_next(intent_request)
+    finally:
+        metrics.end(started, intent_request["sessionState"]["intent"]["name"])
+
+
+def turn_log_middleware(intent_request, call_next):
     intent_name = intent_request["sessionState"]["intent"]["name"]
+    started = structured_log.begin_turn(intent_name)
+    response = call_next(intent_request)
+    structured_log.end_turn(started, intent_request, response)
+    return response
 
-    # Dispatch to your bot's intent handlers
-    if intent_name == "CheckChapter":
-        return check_chapter(intent_request)
-    elif intent_name == "StartQuiz":
-        return start_quiz(intent_request)
-    elif intent_name == "Welcome":
-        return welcome(intent_request)
-    # elif intent_name == "DisplayRusult":
-    #     return display_result(intent_request)
-    raise Exception("Intent with name " + intent_name + " not supported")
+
+def error_middleware(intent_request, call_next):
+    try:
+        return call_next(intent_request)
+    except QuizItemNotFound as e:
+        logger.warning("出題する問題が見つからない: %s章 %s", *e.args)
+        # 同じ出題リストのままだと何度でも失敗するので、次のStartQuizで選び直させる
+        session_attributes = get_session_attributes(intent_request)
+        session_attributes.pop("examState", None)
+        session_attributes.pop(quiz_prefetch.SESSION_KEY, None)
+        return close(
+            intent_request,
+            session_attributes,
+            "Failed",
+            [
+                {
+                    "contentType": "PlainText",
+                    "content": "問題が見つかりませんでした。もう一度クイズを始めてください",
+                }
+            ],
+        )
+    except Exception:
+        logger.exception(
+            "intent failed: %s", intent_request["sessionState"]["intent"]["name"]
+        )
+        return close(
+            intent_request,
+            get_session_attributes(intent_request),
+            "Failed",
+            [
+                {
+                    "contentType": "PlainText",
+                    "content": "エラーが発生しました。もう一度試してください",
+                }
+            ],
+        )
+
+
+def session_attributes_middleware(intent_request, call_next):
+    # ハンドラが共有するセッション属性のdictを用意し、返す前にLexが受け付ける
+    # 文字列のマップに整える
+    session_state = intent_request["sessionState"]
+    if session_state.get("sessionAttributes") is None:
+        session_state["sessionAttributes"] = {}
+    response = call_next(intent_request)
+    attributes = response.get("sessionState", {}).get("sessionAttributes")
+    if attributes:
+        with metrics.timer("session"):
+            response["sessionState"]["sessionAttributes"] = {
+                key: value if isinstance(value, str) else json.dumps(value)
+                for key, value in attributes.items()
+                if value is not None
+            }
+    return response
+
+
+router.use(metrics_middleware)
+router.use(turn_log_middleware)
+router.use(error_middleware)
+router.use(session_attributes_middleware)
+
+
+def dispatch(intent_request):
+    logger.debug(
+        "dispatch sessionId=%s, intentName=%s",
+        intent_request["sessionId"],
+        intent_request["sessionState"]["intent"]["name"],
+    )
+    return router.dispatch(intent_request)
 
 
 def lambda_handler(event, context):
-    os.environ["TZ"] = "Asia/Tokyo"
-    time.tzset()
-    logger.debug("event.bot.name={}".format(event["bot"]["name"]))
-    logger.debug("event: {}".format(event))
+    logger.debug("event.bot.name=%s", event["bot"]["name"])
+    structured_log.dump("event", event)
 
     return dispatch(event)
 
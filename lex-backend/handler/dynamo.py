@@ -0,0 +1,181 @@
+import os
+import threading
+from decimal import Decimal
+
+DEFAULT_TABLE_NAME = "QuizTable"
+DEFAULT_REGION = "us-east-1"
+
+_lock = threading.Lock()
+_config = None
+_fast_fail_config = None
+_resources = {}  # region -> ServiceResource
+_clients = {}  # (region, fast_fail) -> 低レベルclient
+_tables = {}  # (table_name, region) -> Table
+
+
+def table_settings():
+    """環境変数(DYNAMODB_TABLE / REGION_NAME)からテーブル名とリージョンを返す"""
+    return (
+        os.environ.get("DYNAMODB_TABLE", DEFAULT_TABLE_NAME),
+        os.environ.get("REGION_NAME", DEFAULT_REGION),
+    )
+
+
+def client_config():
+    """
+    Lambdaは1コンテナで1リクエストずつ処理するので接続数は少なくてよい。
+    keep-aliveでTLSハンドシェイクをウォームコンテナ間で使い回す
+    """
+    global _config
+    if _config is None:
+        from botocore.config import Config
+
+        _config = Config(
+            max_pool_connections=int(
+                os.environ.get("DYNAMODB_MAX_POOL_CONNECTIONS", "4")
+            ),
+            connect_timeout=float(os.environ.get("DYNAMODB_CONNECT_TIMEOUT", "1")),
+            read_timeout=float(os.environ.get("DYNAMODB_READ_TIMEOUT", "2")),
+            retries={"max_attempts": 3, "mode": "standard"},
+            tcp_keepalive=True,
+        )
+    return _config
+
+
+def fast_fail_config():
+    """
+    応答を待たせたくない書き込み用。失敗したら呼び出し側で貯めて後で送り直す
+    (results_store.py)ので、SDKでは再試行しない
+    """
+    global _fast_fail_config
+    if _fast_fail_config is None:
+        from botocore.config import Config
+
+        _fast_fail_config = Config(
+            max_pool_connections=1,
+            connect_timeout=float(os.environ.get("RESULTS_CONNECT_TIMEOUT", "0.3")),
+            read_timeout=float(os.environ.get("RESULTS_READ_TIMEOUT", "0.5")),
+            retries={"max_attempts": 1, "mode": "standard"},
+            tcp_keepalive=True,
+        )
+    return _fast_fail_config
+
+
+def get_resource(region=None):
+    """リージョンごとに1つだけDynamoDBリソースを作って使い回す"""
+    if region is None:
+        region = table_settings()[1]
+    resource = _resources.get(region)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(region)
+            if resource is None:
+                # boto3の読み込みは重いので、初めて必要になったときに行う
+                import boto3
+
+                resource = boto3.resource(
+                    "dynamodb", region_name=region, config=client_config()
+                )
+                _resources[region] = resource
+    return resource
+
+
+def get_client(region=None, fast_fail=False):
+    """
+    リージョンごとに1つだけ低レベルクライアントを作って使い回す。
+    resource.meta.client は型変換フックが登録されているので使わない
+    fast_fail: 再試行せず短いタイムアウトで失敗するクライアント(fast_fail_config)
+    """
+    if region is None:
+        region = table_settings()[1]
+    key = (region, fast_fail)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                import boto3
+
+                config = fast_fail_config() if fast_fail else client_config()
+                client = boto3.client("dynamodb", region_name=region, config=config)
+                _clients[key] = client
+    return client
+
+
+def get_table(table_name=None, region=None):
+    """(テーブル名, リージョン)ごとにTableハンドルをキャッシュして返す"""
+    default_name, default_region = table_settings()
+    key = (table_name or default_name, region or default_region)
+    table = _tables.get(key)
+    if table is None:
+        table = get_resource(key[1]).Table(key[0])
+        with _lock:
+            table = _tables.setdefault(key, table)
+    return table
+
+
+def preload():
+    """初期化フェーズでboto3とTableハンドルを作っておく(PRELOAD_AWS_SDK=true)"""
+    get_table()
+    get_client()
+
+
+def reset():
+    """キャッシュを破棄する（テスト・ベンチマーク用）"""
+    with _lock:
+        _resources.clear()
+        _clients.clear()
+        _tables.clear()
+
+
+def to_plain(value):
+    """
+    リソースAPIのアイテムをJSON化できる素のPythonオブジェクトに1パスで変換する。
+    Decimalはこれまでの decimal_default_proc と同じく int にする
+    """
+    value_type = type(value)
+    if value_type is str:
+        return value
+    if value_type is dict:
+        return {key: to_plain(val) for key, val in value.items()}
+    if value_type is list:
+        return [to_plain(val) for val in value]
+    if value_type is Decimal:
+        return int(value)
+    if value_type is set or value_type is frozenset:
+        return [to_plain(val) for val in value]
+    return value
+
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return int(Decimal(text))
+
+
+def deserialize(value):
+    """低レベルクライアントの属性値({"S": ...}など)を素のPythonオブジェクトにする"""
+    ((kind, data),) = value.items()
+    if kind == "S":
+        return data
+    if kind == "N":
+        return _number(data)
+    if kind == "L":
+        return [deserialize(val) for val in data]
+    if kind == "M":
+        return {key: deserialize(val) for key, val in data.items()}
+    if kind == "BOOL":
+        return data
+    if kind == "NULL":
+        return None
+    if kind == "SS":
+        return list(data)
+    if kind == "NS":
+        return [_number(val) for val in data]
+    # B / BS はそのまま返す
+    return data
+
+
+def deserialize_item(item):
+    return {key: deserialize(val) for key, val in item.items()}
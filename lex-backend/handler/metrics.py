@@ -0,0 +1,130 @@
+"""
+ターン内の処理時間の計測（CloudWatch Embedded Metric Format）
+
+    with metrics.timer("session"):
+        ...
+
+    @metrics.timed("set_quiz")
+    def set_quiz(...): ...
+
+begin/end の間に計った時間を段階(stage)ごとに集め、1ターンにつきEMFのJSONを1行だけ
+標準出力に出す。段階ごとのメトリクス（Milliseconds、値はターン内で計った回数分の配列）を
+Intent ディメンションで出すので、CloudWatchでインテント×段階の分布(p50/p99)を見られる。
+段階は入れ子になってよい（set_quiz の中の convert など）。"total" はターン全体。
+
+    METRICS_ENABLED     "true" で計測する (default: false)。無効なら timer は何もしない
+    METRICS_NAMESPACE   CloudWatchの名前空間 (default: QuizBot)
+"""
+
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+
+DEFAULT_NAMESPACE = "QuizBot"
+TOTAL = "total"
+# EMFで1つのメトリクスに載せられる値の数
+MAX_VALUES = 100
+
+_NOOP = contextlib.nullcontext()
+_current = None  # 計測中のターンの {stage: [ms, ...]}
+
+
+def enabled():
+    return os.environ.get("METRICS_ENABLED", "false").lower() in ("1", "true")
+
+
+def namespace():
+    return os.environ.get("METRICS_NAMESPACE", DEFAULT_NAMESPACE)
+
+
+class _Timer:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.stage, (time.perf_counter() - self.started) * 1000)
+        return False
+
+
+def timer(stage):
+    """計測中のターンがなければ何もしないコンテキストマネージャを返す"""
+    if _current is None:
+        return _NOOP
+    return _Timer(stage)
+
+
+def timed(stage):
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current is None:
+                return func(*args, **kwargs)
+            with _Timer(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def record(stage, ms):
+    if _current is not None:
+        _current.setdefault(stage, []).append(ms)
+
+
+def begin():
+    """ターンの計測を始める。無効ならNone"""
+    global _current
+    _current = {} if enabled() else None
+    return None if _current is None else time.perf_counter()
+
+
+def end(started, intent_name, write=None):
+    """計測を終えてEMFの1行を出し、その行を返す（無効ならNone）"""
+    global _current
+    stages, _current = _current, None
+    if stages is None or started is None:
+        return None
+    stages[TOTAL] = [(time.perf_counter() - started) * 1000]
+    line = json.dumps(
+        build_document(intent_name, stages), ensure_ascii=False, separators=(",", ":")
+    )
+    (write or _write)(line)
+    return line
+
+
+def build_document(intent_name, stages, now=None):
+    document = {
+        "_aws": {
+            "Timestamp": int((time.time() if now is None else now) * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": namespace(),
+                    "Dimensions": [["Intent"]],
+                    "Metrics": [
+                        {"Name": stage, "Unit": "Milliseconds"}
+                        for stage in sorted(stages)
+                    ],
+                }
+            ],
+        },
+        "Intent": intent_name,
+    }
+    for stage, values in stages.items():
+        document[stage] = [round(ms, 3) for ms in values[:MAX_VALUES]]
+    return document
+
+
+def _write(line):
+    # ロガーのJSONに包むとEMFとして読まれないので、標準出力にそのまま出す
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
@@ -0,0 +1,119 @@
+"""
+問題カードと選択肢ボタン
+
+選択肢はスロットごとに一度だけ作ったタプルを使い回す。問題カードは問題ごとに
+テンプレート(CardTemplate)を1度だけ作ってキャッシュし、ターンごとには問題番号と
+subtitle を入れた小さなdictを作るだけにする。
+返すボタン・dictは複数の応答で共有するので書き換えないこと。
+"""
+
+from collections import OrderedDict
+
+MAX_BUTTONS = 5
+CACHE_SIZE = 2048
+CARD_TYPE = "ImageResponseCard"
+
+
+def _buttons(*pairs):
+    return tuple({"text": text, "value": value} for text, value in pairs)
+
+
+OPTIONS = {
+    "ChapterCode": _buttons(
+        ("A章 消化器", "A"), ("B章 肝胆膵", "B"), ("C章 循環器", "C")
+    ),
+    "QuestionNum": _buttons(("3問", 3), ("5問", 5), ("7問", 7)),
+    "Confirmation": _buttons(
+        ("もちろん!", "Start QuizBot"), ("忙しくて。。。", "いいえ")
+    ),
+    "ResultConfirmation": _buttons(("ううん...", "True"), ("ちょ、やめ", "False")),
+}
+DEFAULT_OPTIONS = _buttons(("うん!!", "はい"), ("ちがう！！", "いいえ"))
+
+_templates = OrderedDict()  # (chapter_code, id) -> CardTemplate
+
+
+def options(slot):
+    return OPTIONS.get(slot, DEFAULT_OPTIONS)
+
+
+def limit_buttons(options):
+    """ボタンは5つまで。5つ以下のタプルはそのまま返す"""
+    if options is None:
+        return None
+    if type(options) is tuple and len(options) <= MAX_BUTTONS:
+        return options
+    return tuple(options[:MAX_BUTTONS])
+
+
+class CardTemplate:
+    __slots__ = ("item", "source", "q", "image_url", "buttons", "supported", "_labels")
+
+    def __init__(self, quiz):
+        kind = quiz["kind"]
+        self.item = quiz
+        self.source = _signature(quiz)
+        self.q = quiz["q"]
+        self.image_url = quiz["image"] if kind == "Image" else None
+        self.buttons = DEFAULT_OPTIONS if kind == "ChoiceBool" else None
+        self.supported = kind in ("ChoiceBool", "Image", "Desc")
+        self._labels = {}  # current_num -> "第n問：..."
+
+    def label(self, current_num):
+        label = self._labels.get(current_num)
+        if label is None:
+            label = self._labels[current_num] = "第{}問：{}".format(
+                current_num + 1, self.q
+            )
+        return label
+
+    def render(self, subtitle, current_num):
+        if not self.supported:
+            return ""
+        label = self.label(current_num)
+        return {
+            "contentType": CARD_TYPE,
+            "content": label,
+            "imageResponseCard": {
+                "title": label,
+                "subtitle": subtitle,
+                "imageUrl": self.image_url,
+                "buttons": self.buttons,
+            },
+        }
+
+
+def _signature(quiz):
+    return (quiz["kind"], quiz["q"], quiz.get("image"))
+
+
+def template(quiz):
+    """
+    (chapter_code, id)ごとにテンプレートを保持する。問題の内容が変わったら作り直す。
+    章キャッシュの問題は同じdictが渡ってくるので is 比較だけで再利用できる。
+    chapter_code か id のない問題は別の章の問題と衝突するのでキャッシュしない
+    """
+    key = (quiz.get("chapter_code"), quiz.get("id"))
+    if key[0] is None or key[1] is None:
+        return CardTemplate(quiz)
+    entry = _templates.get(key)
+    if entry is not None and (entry.item is quiz or entry.source == _signature(quiz)):
+        _templates.move_to_end(key)
+        return entry
+    entry = CardTemplate(quiz)
+    _templates[key] = entry
+    if len(_templates) > CACHE_SIZE:
+        _templates.popitem(last=False)
+    return entry
+
+
+def question_label(quiz, current_num):
+    return template(quiz).label(current_num)
+
+
+def question_card(quiz, subtitle, current_num):
+    return template(quiz).render(subtitle, current_num)
+
+
+def clear():
+    _templates.clear()
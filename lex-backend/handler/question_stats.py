@@ -0,0 +1,308 @@
+"""
+問題ごとの正答率の集計（出題者向け）
+
+judge_answer のたびに書き込まず、ウォームコンテナで (chapter_code, id) ごとの増分を
+まとめておき、件数か経過時間のどちらかを超えたらまとめて書き込む。
+コンテナがそのまま止まっても数え漏れないように、クイズが終わったとき(flush)にも書き込む。
+書き込みは UpdateItem の ADD なので、複数のコンテナが同時に書いても数え漏れない。
+書き込みに失敗した増分は戻して次に送る。タイムアウトで実は書けていた場合だけ
+その1回分を二重に数えることがある（再試行しない fast_fail クライアントで送る）。
+キーが不正な増分（chapter_code がないなど）は何度送っても書けないので、戻さずに捨てる。
+
+    統計テーブル  キー (chapter_code, id)、属性 attempts / correct / near_miss
+
+読み込み(chapter_stats)は章のパーティションを1回Queryした集計をTTLの間キャッシュし、
+まだ書き込んでいない自分の増分を足して返す（Scanはしない）。
+
+    STATS_TABLE           統計テーブル名（空なら集計しない）
+    STATS_FLUSH_ITEMS     この問題数の増分がたまったら書き込む (default: 25)
+    STATS_FLUSH_INTERVAL  最初の増分からこの秒数がたったら書き込む (default: 60)
+    STATS_CACHE_TTL       chapter_stats のキャッシュ秒数 (default: 300)
+
+    handler$ STATS_TABLE=QuizStats python question_stats.py A
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+
+import answer_matcher
+import dynamo
+import structured_log
+
+FIELDS = ("attempts", "correct", "near_miss")
+DEFAULT_FLUSH_ITEMS = 25
+DEFAULT_FLUSH_INTERVAL = 60
+DEFAULT_CACHE_TTL = 300
+
+logger = structured_log.logger
+
+
+def stats_table():
+    return os.environ.get("STATS_TABLE", "")
+
+
+def flush_items():
+    return int(os.environ.get("STATS_FLUSH_ITEMS", DEFAULT_FLUSH_ITEMS))
+
+
+def flush_interval():
+    return float(os.environ.get("STATS_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL))
+
+
+def cache_ttl():
+    return float(os.environ.get("STATS_CACHE_TTL", DEFAULT_CACHE_TTL))
+
+
+def increments(result):
+    """answer_matcher の判定結果を増分にする"""
+    return {
+        "attempts": 1,
+        "correct": int(result == answer_matcher.CORRECT),
+        "near_miss": int(result == answer_matcher.NEAR_MISS),
+    }
+
+
+class StatsCounter:
+    """
+    書き込んでいない増分をためておく。
+    flush は増分を取り出してから書き込み、失敗した問題の増分は戻して次の flush で送る
+    """
+
+    def __init__(self, send, max_items=None, interval=None, clock=time.monotonic):
+        # send(chapter_code, q_id, {field: n}) -> None（失敗なら例外）
+        self._send = send
+        self._max_items = max_items
+        self._interval = interval
+        self._clock = clock
+        self._pending = {}  # (chapter_code, id) -> Counter
+        self._started_at = None
+        self._lock = threading.Lock()
+        self.flushes = 0
+        self.updates = 0
+        self.failures = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    @property
+    def max_items(self):
+        return flush_items() if self._max_items is None else self._max_items
+
+    @property
+    def interval(self):
+        return flush_interval() if self._interval is None else self._interval
+
+    def add(self, chapter_code, q_id, counts):
+        if not valid_key(chapter_code, q_id):
+            logger.warning(
+                "キーが不正なため問題の統計を数えない: %s %s", chapter_code, q_id
+            )
+            return
+        with self._lock:
+            self._pending.setdefault((chapter_code, int(q_id)), Counter()).update(
+                counts
+            )
+            if self._started_at is None:
+                self._started_at = self._clock()
+
+    def pending(self, chapter_code):
+        """{id: Counter} まだ書き込んでいない章の増分"""
+        with self._lock:
+            return {
+                q_id: Counter(counts)
+                for (code, q_id), counts in self._pending.items()
+                if code == chapter_code
+            }
+
+    def due(self):
+        if not self._pending:
+            return False
+        return (
+            len(self._pending) >= self.max_items
+            or self._clock() - self._started_at >= self.interval
+        )
+
+    def flush(self):
+        """増分をすべて書き込み、書き込めた問題数を返す。例外は外に出さない"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._started_at = None
+        if not pending:
+            return 0
+        self.flushes += 1
+        keys = list(pending)
+        written = 0
+        for index, key in enumerate(keys):
+            try:
+                self._send(key[0], key[1], pending[key])
+            except Exception as e:
+                # botocoreのClientErrorをimportしない（コールドスタートで読み込まない）
+                if error_code(e) != "ValidationException":
+                    self._fail(pending, keys[index:])
+                    break
+                # 送り直しても書けないので捨てる
+                self.failures += 1
+                logger.warning(
+                    "問題の統計を書き込めないため捨てる: %s", key, exc_info=True
+                )
+                continue
+            written += 1
+        self.updates += written
+        return written
+
+    def maybe_flush(self):
+        return self.flush() if self.due() else 0
+
+    def _fail(self, pending, keys):
+        self.failures += 1
+        logger.warning("問題の統計を書き込めないため次の機会に送る", exc_info=True)
+        self._restore({key: pending[key] for key in keys})
+
+    def _restore(self, pending):
+        with self._lock:
+            for key, counts in pending.items():
+                self._pending.setdefault(key, Counter()).update(counts)
+            if self._pending and self._started_at is None:
+                self._started_at = self._clock()
+
+
+def error_code(e):
+    response = getattr(e, "response", None)
+    if not isinstance(response, dict):
+        return None
+    return response.get("Error", {}).get("Code")
+
+
+def valid_key(chapter_code, q_id):
+    if not isinstance(chapter_code, str) or not chapter_code:
+        return False
+    try:
+        int(q_id)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def send_update(chapter_code, q_id, counts):
+    """1問分の増分を ADD で加算する（同時に書いても加算はアトミック）"""
+    fields = [field for field in FIELDS if counts.get(field)]
+    if not fields:
+        return
+    dynamo.get_client(fast_fail=True).update_item(
+        TableName=stats_table(),
+        Key={"chapter_code": {"S": chapter_code}, "id": {"N": str(q_id)}},
+        UpdateExpression="ADD "
+        + ", ".join("#{0} :{0}".format(field) for field in fields),
+        ExpressionAttributeNames={"#" + field: field for field in fields},
+        ExpressionAttributeValues={
+            ":" + field: {"N": str(counts[field])} for field in fields
+        },
+    )
+
+
+def load_chapter(chapter_code):
+    """{id: Counter} 章の統計をQueryで読む"""
+    client = dynamo.get_client()
+    params = {
+        "TableName": stats_table(),
+        "KeyConditionExpression": "chapter_code = :c",
+        "ExpressionAttributeValues": {":c": {"S": chapter_code}},
+    }
+    stats = {}
+    while True:
+        page = client.query(**params)
+        for item in page["Items"]:
+            stats[int(item["id"]["N"])] = Counter(
+                {field: int(item[field]["N"]) for field in FIELDS if field in item}
+            )
+        if "LastEvaluatedKey" not in page:
+            return stats
+        params["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+
+
+class StatsCache:
+    """章ごとの集計をTTLの間保持する"""
+
+    def __init__(self, load, ttl=None, clock=time.monotonic):
+        self._load = load
+        self._ttl = ttl
+        self._clock = clock
+        self._chapters = {}  # chapter_code -> ({id: Counter}, loaded_at)
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return cache_ttl() if self._ttl is None else self._ttl
+
+    def get(self, chapter_code):
+        now = self._clock()
+        entry = self._chapters.get(chapter_code)
+        if entry is not None and now - entry[1] < self.ttl:
+            return entry[0]
+        stats = self._load(chapter_code)
+        with self._lock:
+            self._chapters[chapter_code] = (stats, now)
+        return stats
+
+    def invalidate(self):
+        with self._lock:
+            self._chapters.clear()
+
+
+counter = StatsCounter(send_update)
+cache = StatsCache(load_chapter)
+
+
+def record(chapter_code, q_id, result):
+    """判定結果を1件数え、たまっていれば書き込む"""
+    if not stats_table():
+        return 0
+    counter.add(chapter_code, q_id, increments(result))
+    return counter.maybe_flush()
+
+
+def flush():
+    """クイズが終わったときに呼ぶ。たまっている増分をすべて書き込む"""
+    if not stats_table():
+        return 0
+    return counter.flush()
+
+
+def chapter_stats(chapter_code):
+    """{id: Counter(attempts, correct, near_miss)} キャッシュした集計 + 未書き込みの増分"""
+    stats = {q_id: Counter(counts) for q_id, counts in cache.get(chapter_code).items()}
+    for q_id, counts in counter.pending(chapter_code).items():
+        stats.setdefault(q_id, Counter()).update(counts)
+    return stats
+
+
+def correct_rate(counts):
+    return counts["correct"] / counts["attempts"] if counts["attempts"] else None
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="章の問題を正答率の低い順に表示する")
+    parser.add_argument("chapter_code")
+    args = parser.parse_args(argv)
+
+    stats = chapter_stats(args.chapter_code)
+    rows = sorted(stats.items(), key=lambda row: (correct_rate(row[1]) or 0, row[0]))
+    for q_id, counts in rows:
+        rate = correct_rate(counts)
+        print(
+            "{:>6} 回答{:>6} 正解{:>6} 惜しい{:>6} 正答率 {}".format(
+                q_id,
+                counts["attempts"],
+                counts["correct"],
+                counts["near_miss"],
+                "-" if rate is None else "{:.0%}".format(rate),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
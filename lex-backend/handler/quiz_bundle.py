@@ -0,0 +1,204 @@
+"""
+Lambdaに同梱する問題バンドル（読み込み専用）
+
+    ヘッダー      magic "QZB" + format(1byte), ディレクトリ長(uint32)
+    ディレクトリ  JSON {"version": 内容のハッシュ, "chapters": {chapter_code: [索引の位置, 件数]}}
+    索引          章ごとにidの昇順で (id, 問題の位置, 長さ) を uint32 x 3 で並べる
+    問題          1問ずつ区切りなしのJSON(UTF-8)
+位置はディレクトリの直後からのバイト数。
+
+mmapで開き、索引の二分探索で1問だけを読んでJSONにする。ファイル全体は読み込まない。
+
+    handler$ python quiz_bundle.py ../../dynamodb/quizset/*.json -o quiz_bundle.bin
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+
+MAGIC = b"QZB"
+FORMAT = 1
+HEADER = struct.Struct("<3sBI")
+ENTRY = struct.Struct("<III")
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "quiz_bundle.bin"
+)
+
+_lock = threading.Lock()
+_bundles = {}  # path -> QuizBundle | None
+
+
+def backends():
+    """
+    QUIZ_BACKEND: 問題を読む順番（カンマ区切り）
+        dynamodb         DynamoDBだけ（デフォルト）
+        bundle,dynamodb  バンドルにない章・問題だけDynamoDBから読む
+        dynamodb,bundle  DynamoDBが失敗したらバンドルから読む
+        file             QUIZ_FILE_PATHS のJSON（quiz_repository.MemoryRepository）
+    """
+    names = os.environ.get("QUIZ_BACKEND", "dynamodb").lower().split(",")
+    return [name.strip() for name in names if name.strip()] or ["dynamodb"]
+
+
+def bundle_path():
+    return os.environ.get("QUIZ_BUNDLE_PATH", DEFAULT_PATH)
+
+
+def get_bundle(path=None):
+    """バンドルを1度だけ開いて使い回す。ファイルがなければNone"""
+    path = path or bundle_path()
+    if path not in _bundles:
+        with _lock:
+            if path not in _bundles:
+                _bundles[path] = QuizBundle(path) if os.path.exists(path) else None
+    return _bundles[path]
+
+
+def reset():
+    """開いたバンドルを閉じる（テスト・ベンチマーク用）"""
+    with _lock:
+        for bundle in _bundles.values():
+            if bundle is not None:
+                bundle.close()
+        _bundles.clear()
+
+
+class QuizBundle:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or fmt != FORMAT:
+            raise ValueError("問題バンドルではありません: {}".format(path))
+        self._base = HEADER.size + length
+        directory = json.loads(self._map[HEADER.size : self._base])
+        self.version = directory["version"]
+        self._chapters = {
+            chapter_code: (self._base + entry[0], entry[1])
+            for chapter_code, entry in directory["chapters"].items()
+        }
+
+    def __contains__(self, chapter_code):
+        return chapter_code in self._chapters
+
+    def chapters(self):
+        return sorted(self._chapters)
+
+    def ids(self, chapter_code):
+        """章内の問題idの昇順リスト。章がなければ空"""
+        offset, count = self._chapters.get(chapter_code, (0, 0))
+        return [
+            ENTRY.unpack_from(self._map, offset + i * ENTRY.size)[0]
+            for i in range(count)
+        ]
+
+    def get(self, chapter_code, q_id):
+        """問題のdict。なければNone"""
+        offset, count = self._chapters.get(chapter_code, (0, 0))
+        q_id = int(q_id)
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            entry_id, start, length = ENTRY.unpack_from(
+                self._map, offset + middle * ENTRY.size
+            )
+            if entry_id == q_id:
+                start += self._base
+                return json.loads(self._map[start : start + length])
+            if entry_id < q_id:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def get_chapter(self, chapter_code):
+        """{id: item}"""
+        return {q_id: self.get(chapter_code, q_id) for q_id in self.ids(chapter_code)}
+
+    def close(self):
+        self._map.close()
+
+
+def build(items, path):
+    """
+    問題のイテラブルからバンドルを書き出し、versionを返す。
+    同じ (chapter_code, id) は後のものが勝つ。id=0 (章のメタ情報) は含めない
+    """
+    chapters = {}
+    for item in items:
+        q_id = int(item["id"])
+        if q_id > 0:
+            chapters.setdefault(item["chapter_code"], {})[q_id] = item
+
+    records = []
+    digest = hashlib.sha256()
+    for chapter_code in sorted(chapters):
+        for q_id, item in sorted(chapters[chapter_code].items()):
+            record = json.dumps(
+                item, ensure_ascii=False, sort_keys=True, separators=(",", ":")
+            ).encode("utf-8")
+            digest.update(record)
+            records.append((chapter_code, q_id, record))
+    version = digest.hexdigest()[:16]
+
+    # 位置はディレクトリの直後からの相対位置
+    entries = {}
+    position = 0
+    for chapter_code in sorted(chapters):
+        entries[chapter_code] = [position, len(chapters[chapter_code])]
+        position += len(chapters[chapter_code]) * ENTRY.size
+    directory = json.dumps(
+        {"version": version, "chapters": entries}, separators=(",", ":")
+    ).encode("utf-8")
+    index = bytearray()
+    body = bytearray()
+    for chapter_code, q_id, record in records:
+        index += ENTRY.pack(q_id, position + len(body), len(record))
+        body += record
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT, len(directory)))
+        f.write(directory)
+        f.write(index)
+        f.write(body)
+    os.replace(temporary, path)
+    return version
+
+
+def load_quizset(path):
+    """JSON配列またはJSON Linesの問題ファイルを読む"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="問題ファイルからバンドルを作る")
+    parser.add_argument("quizsets", nargs="+", help="JSON配列またはJSON Lines")
+    parser.add_argument("-o", "--output", default=DEFAULT_PATH)
+    args = parser.parse_args(argv)
+
+    items = [item for path in args.quizsets for item in load_quizset(path)]
+    version = build(items, args.output)
+    bundle = QuizBundle(args.output)
+    for chapter_code in bundle.chapters():
+        print("{}章 {}問".format(chapter_code, len(bundle.ids(chapter_code))))
+    print(
+        "{} version={} {}bytes".format(
+            args.output, version, os.path.getsize(args.output)
+        )
+    )
+    bundle.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import inspect
+import os
+import threading
+import time
+import weakref
+
+# 各章のパーティションに置くメタ情報アイテムのid。問題idは1から始まる。
+# インポートCLIが書き込みのたびに version 属性を加算する
+META_ID = 0
+
+DEFAULT_TTL = 60
+
+
+def cache_ttl():
+    return float(os.environ.get("QUIZ_CACHE_TTL", DEFAULT_TTL))
+
+
+def cache_enabled():
+    return os.environ.get("QUIZ_CACHE_ENABLED", "true").lower() not in ("0", "false")
+
+
+class ChapterCache:
+    """
+    章(chapter_code)単位で問題アイテムを保持するウォームコンテナ用キャッシュ
+
+    TTLが切れたらメタ情報アイテムのversionだけを読み、変わっていなければ
+    そのまま延長、変わっていれば章全体を読み直す。
+    章の内容が変わったら（読み直し・invalidate）subscribe した関数に知らせる。
+    """
+
+    def __init__(self, load_chapter, load_version, ttl=None, clock=time.monotonic):
+        # load_chapter(chapter_code) -> [item, ...]
+        # load_version(chapter_code) -> int | None
+        self._load_chapter = load_chapter
+        self._load_version = load_version
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._chapters = {}  # chapter_code -> (items_by_id, version, checked_at)
+        self._missing = {}  # chapter_code -> {今のversionにないid}
+        self._listeners = []  # 弱参照（呼ぶと関数かNoneを返す）
+
+    @property
+    def ttl(self):
+        return cache_ttl() if self._ttl is None else self._ttl
+
+    def get_chapter(self, chapter_code):
+        """{id: item} を返す"""
+        now = self._clock()
+        entry = self._chapters.get(chapter_code)
+        if entry is not None and now - entry[2] < self.ttl:
+            return entry[0]
+
+        version = self._load_version(chapter_code)
+        if entry is not None and version is not None and version == entry[1]:
+            with self._lock:
+                self._chapters[chapter_code] = (entry[0], version, now)
+            return entry[0]
+
+        return self._reload(chapter_code, version, now)
+
+    def get_item(self, chapter_code, q_id):
+        """
+        章にない問題は、versionが変わっていれば（キャッシュ後に追加されたかもしれない）
+        章を読み直す。それでもない問題は次にversionが変わるまで「ない」と覚えておく
+        """
+        items = self.get_chapter(chapter_code)
+        item = items.get(q_id)
+        if item is not None or q_id in self._missing.get(chapter_code, ()):
+            return item
+        version = self._load_version(chapter_code)
+        entry = self._chapters.get(chapter_code)
+        if entry is None or version is None or version != entry[1]:
+            items = self._reload(chapter_code, version)
+            item = items.get(q_id)
+        if item is None:
+            with self._lock:
+                self._missing.setdefault(chapter_code, set()).add(q_id)
+        return item
+
+    def invalidate(self, chapter_code=None):
+        with self._lock:
+            if chapter_code is None:
+                self._chapters.clear()
+                self._missing.clear()
+            else:
+                self._chapters.pop(chapter_code, None)
+                self._missing.pop(chapter_code, None)
+        self._notify(chapter_code)
+
+    def subscribe(self, callback):
+        """
+        章の内容が変わったら callback(chapter_code) を呼ぶ（None はすべての章）。
+        メソッドは弱参照で持つので、捨てたオブジェクトは呼ばれない
+        """
+        if inspect.ismethod(callback):
+            self._listeners.append(weakref.WeakMethod(callback))
+        else:
+            self._listeners.append(lambda: callback)
+
+    def _notify(self, chapter_code):
+        alive = []
+        for ref in self._listeners:
+            callback = ref()
+            if callback is not None:
+                callback(chapter_code)
+                alive.append(ref)
+        self._listeners = alive
+
+    def _reload(self, chapter_code, version, now=None):
+        items = {
+            item["id"]: item
+            for item in self._load_chapter(chapter_code)
+            if item["id"] != META_ID
+        }
+        with self._lock:
+            previous = self._chapters.get(chapter_code)
+            self._missing.pop(chapter_code, None)
+            self._chapters[chapter_code] = (
+                items,
+                version,
+                self._clock() if now is None else now,
+            )
+        if previous is not None and (version is None or version != previous[1]):
+            self._notify(chapter_code)
+        return items
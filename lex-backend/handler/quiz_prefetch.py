@@ -0,0 +1,72 @@
+import base64
+import json
+import os
+import zlib
+
+SESSION_KEY = "quizItems"
+
+# Lexのセッション属性は合計で約12KBまでしか持てない
+DEFAULT_SESSION_LIMIT = 12 * 1024
+# 回答が進むにつれて大きくなる examState 用に残しておく余白
+DEFAULT_HEADROOM = 1024
+
+# build_question_card / judge_answer / start_quiz が参照する項目だけを位置で保持する
+# （項目は末尾にだけ足す。古いセッションの値も先頭から位置で読める）
+FIELDS = (
+    "id",
+    "kind",
+    "q",
+    "image",
+    "a",
+    "secondary_a",
+    "comment",
+    "hint",
+    "chapter_code",
+)
+
+
+def prefetch_enabled():
+    return os.environ.get("QUIZ_PREFETCH", "false").lower() in ("1", "true")
+
+
+def session_limit():
+    return int(os.environ.get("SESSION_ATTRIBUTES_MAX_BYTES", DEFAULT_SESSION_LIMIT))
+
+
+def encode_items(items):
+    rows = [[item.get(field) for field in FIELDS] for item in items]
+    raw = json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.b64encode(zlib.compress(raw, 9)).decode("ascii")
+
+
+def decode_items(payload, chapter_code=None):
+    """
+    {id: item} を返す。壊れた値や空の場合は空のdict。
+    chapter_code を持たない古い値には指定の chapter_code を入れる
+    """
+    if not payload:
+        return {}
+    try:
+        rows = json.loads(zlib.decompress(base64.b64decode(payload)))
+    except (ValueError, zlib.error):
+        return {}
+    items = {}
+    for row in rows:
+        item = {field: value for field, value in zip(FIELDS, row) if value is not None}
+        if chapter_code is not None:
+            item.setdefault("chapter_code", chapter_code)
+        items[item["id"]] = item
+    return items
+
+
+def session_size(session_attributes):
+    return sum(
+        len(key.encode("utf-8")) + len(str(value).encode("utf-8"))
+        for key, value in session_attributes.items()
+    )
+
+
+def fits(session_attributes, payload, headroom=DEFAULT_HEADROOM):
+    others = {k: v for k, v in session_attributes.items() if k != SESSION_KEY}
+    size = session_size(others) + len(SESSION_KEY) + len(payload)
+    return size + headroom <= session_limit()
@@ -0,0 +1,496 @@
+"""
+問題の読み込み先（リポジトリ）
+
+    ids(chapter_code)                章内の問題idすべて（昇順）
+    sample_ids(chapter_code, k)      出題する問題idをk件
+    get_item(chapter_code, q_id)     問題1件（なければNone）
+    batch_get(chapter_code, q_ids)   問題を q_ids の順に（ない問題は除く）
+
+バックエンド
+    DynamoDBRepository   QUIZ_CACHE_ENABLED なら章キャッシュ経由
+    BundleRepository     handler/quiz_bundle.bin（quiz_bundle.py）
+    MemoryRepository     問題のリスト、または quizset のJSONファイル(QUIZ_FILE_PATHS)
+重ねて使うもの
+    LRURepository        件数で上限を決めた問題単位のキャッシュ (QUIZ_LRU_SIZE)
+                         章キャッシュが新しいversionを見たら、その章の問題を捨てる
+    FallbackRepository   QUIZ_BACKEND の順に試す
+
+各層は hits / misses を数え、stats() で層ごとのヒット率を返す。
+"""
+
+import abc
+import os
+import random
+import time
+from collections import OrderedDict
+
+import dynamo
+import metrics
+import quiz_bundle
+import structured_log
+from quiz_cache import META_ID, ChapterCache, cache_enabled, cache_ttl
+from sampling import reservoir_sample
+
+# BatchGetItemで一度に取得できるキーの上限
+BATCH_GET_LIMIT = 100
+# UnprocessedKeys を送り直す回数の上限（超えたら読めた分だけ返す）
+BATCH_GET_MAX_ATTEMPTS = 5
+# メタ情報アイテムの ids が章のすべての問題idであることを示す属性
+# （dynamodb/content_version.py の CATALOG_COMPLETE と合わせること）
+CATALOG_COMPLETE = "ids_complete"
+
+logger = structured_log.logger
+
+_repositories = {}  # 設定 -> QuizRepository
+
+
+class QuizRepository(abc.ABC):
+    name = "repository"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @abc.abstractmethod
+    def ids(self, chapter_code):
+        pass
+
+    @abc.abstractmethod
+    def sample_ids(self, chapter_code, k):
+        pass
+
+    @abc.abstractmethod
+    def get_item(self, chapter_code, q_id):
+        pass
+
+    def batch_get(self, chapter_code, q_ids):
+        items = (self.get_item(chapter_code, q_id) for q_id in q_ids)
+        return [item for item in items if item is not None]
+
+    def _count(self, item):
+        if item is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return item
+
+    def stats(self):
+        """[{"name", "hits", "misses", "hit_rate"}, ...] 外側の層から順に"""
+        total = self.hits + self.misses
+        return [
+            {
+                "name": self.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+        ]
+
+
+class DynamoDBRepository(QuizRepository):
+    name = "dynamodb"
+
+    def __init__(self):
+        super().__init__()
+        self.chapter_cache = ChapterCache(self.load_chapter, self.load_chapter_version)
+
+    def load_chapter(self, chapter_code):
+        table = dynamo.get_table()
+        query = {
+            "KeyConditionExpression": "chapter_code = :chapter_code AND id > :meta_id",
+            "ExpressionAttributeValues": {
+                ":chapter_code": chapter_code,
+                ":meta_id": META_ID,
+            },
+        }
+        items = []
+        while True:
+            response = table.query(**query)
+            items.extend(response["Items"])
+            if "LastEvaluatedKey" not in response:
+                break
+            query["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        logger.info("%s章を読み込み: %d件", chapter_code, len(items))
+        with metrics.timer("convert"):
+            return dynamo.to_plain(items)
+
+    def load_chapter_version(self, chapter_code):
+        table = dynamo.get_table()
+        response = table.get_item(
+            Key={"chapter_code": chapter_code, "id": META_ID},
+            ProjectionExpression="version",
+        )
+        version = response.get("Item", {}).get("version")
+        return None if version is None else int(version)
+
+    def load_chapter_catalog(self, chapter_code):
+        # インポートCLIがメタ情報アイテムに保持している章内の問題id一覧。
+        # 章のキーから作り直したしるしがないもの（書き込んだidを足しただけの古いカタログ）は
+        # 欠けていることがあるので使わない
+        table = dynamo.get_table()
+        response = table.get_item(
+            Key={"chapter_code": chapter_code, "id": META_ID},
+            ProjectionExpression="ids, #complete",
+            ExpressionAttributeNames={"#complete": CATALOG_COMPLETE},
+        )
+        item = response.get("Item", {})
+        if not item.get(CATALOG_COMPLETE) or item.get("ids") is None:
+            return None
+        return sorted(int(q_id) for q_id in item["ids"])
+
+    def iter_chapter_ids(self, chapter_code):
+        # カタログがない章はキーだけをページ単位で読み流す（comment/hintなどは読まない）
+        table_name = dynamo.table_settings()[0]
+        paginator = dynamo.get_client().get_paginator("query")
+        pages = paginator.paginate(
+            TableName=table_name,
+            KeyConditionExpression="chapter_code = :chapter_code AND id > :meta_id",
+            ExpressionAttributeValues={
+                ":chapter_code": {"S": chapter_code},
+                ":meta_id": {"N": str(META_ID)},
+            },
+            ProjectionExpression="id",
+        )
+        for page in pages:
+            for item in page["Items"]:
+                yield int(item["id"]["N"])
+
+    def ids(self, chapter_code):
+        if cache_enabled():
+            return sorted(self.chapter_cache.get_chapter(chapter_code))
+        ids = self.load_chapter_catalog(chapter_code)
+        if ids is None:
+            return sorted(self.iter_chapter_ids(chapter_code))
+        return ids
+
+    def sample_ids(self, chapter_code, k):
+        if cache_enabled():
+            ids = list(self.chapter_cache.get_chapter(chapter_code))
+            random.shuffle(ids)
+            return ids[: int(k)]
+
+        # 出題数kに比例した読み込みで済ませる（章全体は読まない）
+        ids = self.load_chapter_catalog(chapter_code)
+        if ids is None:
+            return reservoir_sample(self.iter_chapter_ids(chapter_code), int(k))
+        return random.sample(ids, min(int(k), len(ids)))
+
+    def get_item(self, chapter_code, q_id):
+        if cache_enabled():
+            return self._count(self.chapter_cache.get_item(chapter_code, int(q_id)))
+
+        response = dynamo.get_table().query(
+            KeyConditionExpression="chapter_code = :chapter_code AND id = :id",
+            ExpressionAttributeValues={
+                ":chapter_code": chapter_code,
+                ":id": int(q_id),
+            },
+        )
+        structured_log.dump("query", response["Items"])
+        with metrics.timer("convert"):
+            items = dynamo.to_plain(response["Items"])
+        return self._count(items[0] if items else None)
+
+    def batch_get(self, chapter_code, q_ids):
+        if cache_enabled():
+            return super().batch_get(chapter_code, q_ids)
+
+        # 低レベルクライアントで取得し、Decimalを経由せずに素のdictへ変換する
+        table_name = dynamo.table_settings()[0]
+        client = dynamo.get_client()
+        keys = [
+            {"chapter_code": {"S": chapter_code}, "id": {"N": str(int(q_id))}}
+            for q_id in q_ids
+        ]
+        items = {}
+        for start in range(0, len(keys), BATCH_GET_LIMIT):
+            request = {table_name: {"Keys": keys[start : start + BATCH_GET_LIMIT]}}
+            for attempt in range(BATCH_GET_MAX_ATTEMPTS):
+                if attempt > 0:
+                    time.sleep(min(1.0, 0.05 * 2**attempt))
+                response = client.batch_get_item(RequestItems=request)
+                with metrics.timer("convert"):
+                    for item in response["Responses"].get(table_name, []):
+                        item = dynamo.deserialize_item(item)
+                        items[item["id"]] = item
+                request = response.get("UnprocessedKeys")
+                if not request:
+                    break
+            else:
+                logger.warning(
+                    "%s章の%d件が読めないまま打ち切った",
+                    chapter_code,
+                    len(request[table_name]["Keys"]),
+                )
+        found = [items[int(q_id)] for q_id in q_ids if int(q_id) in items]
+        self.hits += len(found)
+        self.misses += len(q_ids) - len(found)
+        return found
+
+
+class BundleRepository(QuizRepository):
+    """バンドルがなければ空（FallbackRepositoryで次の層へ進む）"""
+
+    name = "bundle"
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path
+
+    def ids(self, chapter_code):
+        bundle = quiz_bundle.get_bundle(self.path)
+        return [] if bundle is None else bundle.ids(chapter_code)
+
+    def sample_ids(self, chapter_code, k):
+        ids = self.ids(chapter_code)
+        return random.sample(ids, min(int(k), len(ids)))
+
+    def get_item(self, chapter_code, q_id):
+        bundle = quiz_bundle.get_bundle(self.path)
+        if bundle is None:
+            return self._count(None)
+        return self._count(bundle.get(chapter_code, q_id))
+
+
+class MemoryRepository(QuizRepository):
+    name = "memory"
+
+    def __init__(self, items=()):
+        super().__init__()
+        self.chapters = {}  # chapter_code -> {id: item}
+        for item in items:
+            if int(item["id"]) != META_ID:
+                self.chapters.setdefault(item["chapter_code"], {})[
+                    int(item["id"])
+                ] = item
+
+    @classmethod
+    def from_files(cls, paths):
+        """quizset のJSON配列・JSON Lines"""
+        return cls(item for path in paths for item in quiz_bundle.load_quizset(path))
+
+    def ids(self, chapter_code):
+        return sorted(self.chapters.get(chapter_code, ()))
+
+    def sample_ids(self, chapter_code, k):
+        ids = self.ids(chapter_code)
+        return random.sample(ids, min(int(k), len(ids)))
+
+    def get_item(self, chapter_code, q_id):
+        return self._count(self.chapters.get(chapter_code, {}).get(int(q_id)))
+
+
+class LRURepository(QuizRepository):
+    """
+    問題単位のキャッシュ。max_items件を超えたら最も長く使っていない問題を捨てる。
+    問題はTTL（QUIZ_CACHE_TTL）の間だけ使い、過ぎたら内側から読み直す
+    （内側の章キャッシュがversionを確かめる）。invalidate で章ごとに捨てられる
+    """
+
+    name = "lru"
+
+    def __init__(self, inner, max_items, ttl=None, clock=time.monotonic):
+        super().__init__()
+        self.inner = inner
+        self.max_items = max_items
+        self._ttl = ttl
+        self._clock = clock
+        self._items = OrderedDict()  # (chapter_code, id) -> (item, stored_at)
+
+    @property
+    def ttl(self):
+        return cache_ttl() if self._ttl is None else self._ttl
+
+    def __len__(self):
+        return len(self._items)
+
+    def ids(self, chapter_code):
+        return self.inner.ids(chapter_code)
+
+    def sample_ids(self, chapter_code, k):
+        return self.inner.sample_ids(chapter_code, k)
+
+    def get_item(self, chapter_code, q_id):
+        key = (chapter_code, int(q_id))
+        item = self._lookup(key)
+        if item is None:
+            item = self.inner.get_item(chapter_code, q_id)
+            self._store(key, item)
+        return item
+
+    def batch_get(self, chapter_code, q_ids):
+        cached = {}
+        missing = []
+        for q_id in q_ids:
+            item = self._lookup((chapter_code, int(q_id)))
+            if item is None:
+                missing.append(q_id)
+            else:
+                cached[int(q_id)] = item
+        if missing:
+            for item in self.inner.batch_get(chapter_code, missing):
+                self._store((chapter_code, int(item["id"])), item)
+                cached[int(item["id"])] = item
+        return [cached[int(q_id)] for q_id in q_ids if int(q_id) in cached]
+
+    def _lookup(self, key):
+        entry = self._items.get(key)
+        if entry is None or self._clock() - entry[1] >= self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._items.move_to_end(key)
+        return entry[0]
+
+    def _store(self, key, item):
+        if item is None or self.max_items <= 0:
+            return
+        self._items[key] = (item, self._clock())
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def invalidate(self, chapter_code=None):
+        """chapter_code の問題を捨てる（None ならすべて）"""
+        if chapter_code is None:
+            self._items.clear()
+            return
+        for key in [key for key in self._items if key[0] == chapter_code]:
+            del self._items[key]
+
+    def stats(self):
+        return super().stats() + self.inner.stats()
+
+
+class FallbackRepository(QuizRepository):
+    """
+    順に試し、結果が空（章・問題がない）か例外なら次へ進む。
+    最後のリポジトリの結果はそのまま返す。batch_get は足りない問題だけを次へ回す
+    """
+
+    name = "fallback"
+
+    def __init__(self, repositories):
+        super().__init__()
+        self.repositories = repositories
+
+    def ids(self, chapter_code):
+        return self._first("ids", chapter_code)
+
+    def sample_ids(self, chapter_code, k):
+        return self._first("sample_ids", chapter_code, k)
+
+    def get_item(self, chapter_code, q_id):
+        return self._first("get_item", chapter_code, q_id)
+
+    def batch_get(self, chapter_code, q_ids):
+        """足りない問題だけを次のリポジトリから読み、q_ids の順にまとめる"""
+        found = {}
+        missing = list(q_ids)
+        for index, repository in enumerate(self.repositories):
+            try:
+                items = repository.batch_get(chapter_code, missing)
+            except Exception:
+                if index == len(self.repositories) - 1:
+                    raise
+                logger.warning(
+                    "%sから読めないため次のバックエンドを使う",
+                    repository.name,
+                    exc_info=True,
+                )
+                continue
+            for item in items:
+                found[int(item["id"])] = item
+            missing = [q_id for q_id in missing if int(q_id) not in found]
+            if not missing:
+                break
+        return [found[int(q_id)] for q_id in q_ids if int(q_id) in found]
+
+    def _first(self, method, *args):
+        for repository in self.repositories[:-1]:
+            try:
+                result = getattr(repository, method)(*args)
+            except Exception:
+                logger.warning(
+                    "%sから読めないため次のバックエンドを使う",
+                    repository.name,
+                    exc_info=True,
+                )
+                continue
+            if result:
+                return result
+        return getattr(self.repositories[-1], method)(*args)
+
+    def stats(self):
+        return [s for repository in self.repositories for s in repository.stats()]
+
+
+dynamodb_repository = DynamoDBRepository()
+
+
+def lru_size():
+    return int(os.environ.get("QUIZ_LRU_SIZE", "0"))
+
+
+def file_paths():
+    paths = os.environ.get("QUIZ_FILE_PATHS", "")
+    return tuple(path for path in paths.split(os.pathsep) if path)
+
+
+def get_repository():
+    """
+    環境変数から組み立てたリポジトリ。同じ設定なら同じインスタンスを使い回す
+        QUIZ_BACKEND      dynamodb / bundle / file をカンマ区切りで（quiz_bundle.backends）
+        QUIZ_FILE_PATHS   file で読む quizset のJSON（os.pathsep区切り）
+        QUIZ_LRU_SIZE     0より大きければ全体の前にLRUキャッシュを置く
+    """
+    settings = (
+        tuple(quiz_bundle.backends()),
+        quiz_bundle.bundle_path(),
+        file_paths(),
+        lru_size(),
+    )
+    repository = _repositories.get(settings)
+    if repository is None:
+        repository = build_repository(*settings)
+        _repositories[settings] = repository
+    return repository
+
+
+def build_repository(backends, bundle_path=None, paths=(), max_items=0):
+    repositories = []
+    for backend in backends:
+        if backend == "dynamodb":
+            repositories.append(dynamodb_repository)
+        elif backend == "bundle":
+            repositories.append(BundleRepository(bundle_path))
+        elif backend == "file":
+            repositories.append(MemoryRepository.from_files(paths))
+        else:
+            raise ValueError("不明なQUIZ_BACKEND: {}".format(backend))
+    repository = (
+        repositories[0] if len(repositories) == 1 else FallbackRepository(repositories)
+    )
+    if max_items > 0:
+        repository = LRURepository(repository, max_items)
+        if dynamodb_repository in repositories:
+            dynamodb_repository.chapter_cache.subscribe(repository.invalidate)
+    return repository
+
+
+def reset():
+    """組み立てたリポジトリを捨てる（テスト・ベンチマーク用）"""
+    _repositories.clear()
+    dynamodb_repository.chapter_cache.invalidate()
+
+
+def describe(repository):
+    return " ".join(
+        "{name}={hits}/{total}({rate:.0%})".format(
+            name=s["name"],
+            hits=s["hits"],
+            total=s["hits"] + s["misses"],
+            rate=s["hit_rate"],
+        )
+        for s in repository.stats()
+    )
@@ -0,0 +1,170 @@
+"""
+クイズ結果の保存
+
+回答はこれまでどおり examState セッション属性に貯め、クイズが終わったときに1回だけ
+結果テーブルへ書き込む（ターンごとには書かない）。
+
+書き込みは応答を返す前に行う（Lambdaは応答を返すと止まるので、裏で送ることはできない）。
+そのかわり再試行しない短いタイムアウトのクライアント(dynamo.fast_fail_config)で
+BatchWriteItemを1回だけ送り、待たせるのは最大で接続0.3秒 + 読み込み0.5秒
+（RESULTS_CONNECT_TIMEOUT / RESULTS_READ_TIMEOUT）にとどめる。
+失敗・スロットリングで書けなかった結果はウォームコンテナのバッファに残し、
+次に終わったクイズの結果と同じBatchWriteItemで送り直す。
+結果の保存に失敗しても応答は失敗させない。
+
+    RESULTS_TABLE        結果テーブル名（空なら保存しない）
+    RESULTS_BUFFER_MAX   送れずに貯めておく結果の上限。超えたら古いものから捨てる (default: 100)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import dynamo
+import structured_log
+
+# BatchWriteItemで一度に書き込めるアイテムの上限
+BATCH_WRITE_LIMIT = 25
+DEFAULT_BUFFER_MAX = 100
+
+logger = structured_log.logger
+
+
+def results_table():
+    return os.environ.get("RESULTS_TABLE", "")
+
+
+def buffer_max():
+    return int(os.environ.get("RESULTS_BUFFER_MAX", DEFAULT_BUFFER_MAX))
+
+
+def build_result(session_id, user_name, chapter_code, exam_state, now=None):
+    """
+    結果テーブルのアイテム。キーは (session_id, quiz_key)。
+    quiz_key は章と出題順から決まるので、Lexが同じターンを再送しても同じアイテムに上書きされる
+    """
+    q_list = [int(q_id) for q_id in exam_state["q_list"]]
+    correct = [
+        int(result["id"])
+        for result in exam_state["results"]
+        if result["result"] == "correct"
+    ]
+    return {
+        "session_id": session_id,
+        "quiz_key": "{}:{}".format(chapter_code, ",".join(map(str, q_list))),
+        "user_name": user_name,
+        "chapter_code": chapter_code,
+        "question_num": len(q_list),
+        "correct_num": len(correct),
+        "q_list": q_list,
+        "correct": correct,
+        "finished_at": int((time.time() if now is None else now) * 1000),
+    }
+
+
+def result_key(item):
+    return (item["session_id"], item["quiz_key"])
+
+
+class ResultsBuffer:
+    """
+    送れていない結果をためておき、flushでまとめて書き込む。
+    同じキーの結果は1件にまとめる（1回のBatchWriteItemに同じキーがあるとValidationException）
+    """
+
+    def __init__(self, send, max_items=None):
+        # send([item, ...]) -> 書き込めなかったアイテムのリスト
+        self._send = send
+        self._max_items = max_items
+        self._items = OrderedDict()  # result_key -> item
+        self._lock = threading.Lock()
+        self.written = 0
+        self.failures = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def max_items(self):
+        return buffer_max() if self._max_items is None else self._max_items
+
+    def add(self, item):
+        with self._lock:
+            self._items.pop(result_key(item), None)
+            self._items[result_key(item)] = item
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+                self.dropped += 1
+                logger.warning("結果のバッファがいっぱいのため古い結果を捨てる")
+
+    def flush(self):
+        """BatchWriteItemを1回だけ送り、書き込めた件数を返す。例外は外に出さない"""
+        with self._lock:
+            keys = list(self._items)[:BATCH_WRITE_LIMIT]
+            batch = [self._items.pop(key) for key in keys]
+        if not batch:
+            return 0
+        try:
+            unprocessed = self._send(batch)
+        except Exception:
+            self.failures += 1
+            logger.warning("結果を書き込めないため次の機会に送り直す", exc_info=True)
+            unprocessed = batch
+        with self._lock:
+            # 古い結果から送るように先頭へ戻す（送っている間に新しく入った同じキーを優先）
+            for item in reversed(unprocessed):
+                key = result_key(item)
+                if key not in self._items:
+                    self._items[key] = item
+                    self._items.move_to_end(key, last=False)
+        written = len(batch) - len(unprocessed)
+        self.written += written
+        return written
+
+
+def send_batch(items):
+    from boto3.dynamodb.types import TypeSerializer
+
+    serializer = TypeSerializer()
+    table_name = results_table()
+    requests = [
+        {
+            "PutRequest": {
+                "Item": {
+                    key: serializer.serialize(value) for key, value in item.items()
+                }
+            }
+        }
+        for item in items
+    ]
+    response = dynamo.get_client(fast_fail=True).batch_write_item(
+        RequestItems={table_name: requests}
+    )
+    unprocessed = response.get("UnprocessedItems", {}).get(table_name, [])
+    unprocessed_keys = {
+        (
+            r["PutRequest"]["Item"]["session_id"]["S"],
+            r["PutRequest"]["Item"]["quiz_key"]["S"],
+        )
+        for r in unprocessed
+    }
+    return [item for item in items if result_key(item) in unprocessed_keys]
+
+
+results_buffer = ResultsBuffer(send_batch)
+
+
+def save_result(session_id, user_name, chapter_code, exam_state, extra_items=()):
+    """
+    クイズ1回分の結果を保存する（前に送れなかった結果もいっしょに送る）。
+    応答の前にBatchWriteItemを1回だけ送る（時間の上限はモジュールの説明のとおり）
+    extra_items: 同じBatchWriteItemで書き込むアイテム（苦手プロファイルなど）
+    """
+    if not results_table():
+        return 0
+    results_buffer.add(build_result(session_id, user_name, chapter_code, exam_state))
+    for item in extra_items:
+        results_buffer.add(item)
+    return results_buffer.flush()
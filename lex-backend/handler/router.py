@@ -0,0 +1,100 @@
+"""
+インテント名からハンドラを引くルーター
+
+    router = Router()
+
+    @router.route("StartQuiz")
+    def start_quiz(intent_request): ...
+
+    router.use(middleware)  # middleware(intent_request, call_next) -> response
+
+ミドルウェアは登録順に外側から実行される。インテントごとの呼び出しチェーンは
+初回に組み立ててキャッシュする。
+"""
+
+import time
+
+
+class UnsupportedIntentError(Exception):
+    def __init__(self, intent_name):
+        super().__init__("Intent with name {} not supported".format(intent_name))
+        self.intent_name = intent_name
+
+
+class Router:
+    def __init__(self):
+        self._handlers = {}
+        self._middlewares = []
+        self._fallback = None
+        self._chains = {}
+        # 登録したインテント名 -> [呼び出し回数, 合計ms, 最大ms]
+        self.timings = {}
+
+    def route(self, intent_name):
+        def register(handler):
+            self.add(intent_name, handler)
+            return handler
+
+        return register
+
+    def add(self, intent_name, handler):
+        self._handlers[intent_name] = handler
+        self._chains.clear()
+
+    def fallback(self, handler):
+        """登録されていないインテント用のハンドラ"""
+        self._fallback = handler
+        self._chains.clear()
+        return handler
+
+    def use(self, middleware):
+        self._middlewares.append(middleware)
+        self._chains.clear()
+        return middleware
+
+    def intents(self):
+        return sorted(self._handlers)
+
+    def dispatch(self, intent_request):
+        intent_name = intent_request["sessionState"]["intent"]["name"]
+        chain = self._chains.get(intent_name)
+        if chain is None:
+            chain = self._build(intent_name)
+        return chain(intent_request)
+
+    def _build(self, intent_name):
+        handler = self._handlers.get(intent_name, self._fallback)
+        if handler is None:
+
+            def handler(intent_request):
+                raise UnsupportedIntentError(intent_name)
+
+        registered = intent_name in self._handlers
+        # 未登録のインテント名で timings・キャッシュが膨らまないようにする
+        chain = self._timed(intent_name, handler) if registered else handler
+        for middleware in reversed(self._middlewares):
+            chain = _bind(middleware, chain)
+        if registered:
+            self._chains[intent_name] = chain
+        return chain
+
+    def _timed(self, intent_name, handler):
+        def timed(intent_request):
+            started = time.perf_counter()
+            try:
+                return handler(intent_request)
+            finally:
+                elapsed = (time.perf_counter() - started) * 1000
+                stats = self.timings.setdefault(intent_name, [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = max(stats[2], elapsed)
+
+        return timed
+
+
+def _bind(middleware, call_next):
+    def call(intent_request):
+        return middleware(intent_request, call_next)
+
+    return call
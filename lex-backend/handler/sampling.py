@@ -0,0 +1,118 @@
+import itertools
+import math
+import random
+
+_END = object()
+
+
+def reservoir_sample(iterable, k, rng=random):
+    """
+    iterableから一様にk件を選ぶ（Algorithm L）。
+    メモリはO(k)で、件数が分からないストリームでも1パスで済む
+    """
+    if k <= 0:
+        return []
+    iterator = iter(iterable)
+    reservoir = []
+    for value in iterator:
+        reservoir.append(value)
+        if len(reservoir) == k:
+            break
+    else:
+        rng.shuffle(reservoir)
+        return reservoir
+
+    w = math.exp(math.log(_open_uniform(rng)) / k)
+    while True:
+        # 次に置き換える位置までの読み飛ばし数
+        skip = math.floor(math.log(_open_uniform(rng)) / math.log(1 - w))
+        value = next(itertools.islice(iterator, skip, None), _END)
+        if value is _END:
+            rng.shuffle(reservoir)
+            return reservoir
+        reservoir[rng.randrange(k)] = value
+        w *= math.exp(math.log(_open_uniform(rng)) / k)
+
+
+def _open_uniform(rng):
+    # log(0)を避けるため(0, 1)の一様乱数を返す
+    value = rng.random()
+    while value == 0.0:
+        value = rng.random()
+    return value
+
+
+class FenwickTree:
+    """
+    重みの累積和（Binary Indexed Tree）。
+    1件の重みの更新と、累積和から位置を探すのがどちらもO(log n)
+    """
+
+    def __init__(self, weights):
+        self._weights = list(weights)
+        size = len(self._weights)
+        tree = [0] + self._weights
+        # O(n)で組み立てる
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._top = 1 << (size.bit_length() - 1) if size else 0
+
+    def __len__(self):
+        return len(self._weights)
+
+    @property
+    def total(self):
+        return self.prefix_sum(len(self._weights))
+
+    def weight(self, index):
+        return self._weights[index]
+
+    def add(self, index, delta):
+        self._weights[index] += delta
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, count):
+        """先頭からcount件の重みの合計"""
+        total = 0
+        while count > 0:
+            total += self._tree[count]
+            count -= count & -count
+        return total
+
+    def find(self, value):
+        """累積和がvalueを超える最初の位置 (0 <= value < total)"""
+        position = 0
+        step = self._top
+        while step:
+            following = position + step
+            if following < len(self._tree) and self._tree[following] <= value:
+                position = following
+                value -= self._tree[following]
+            step >>= 1
+        return min(position, len(self._weights) - 1)
+
+
+def weighted_sample(items, weights, k, rng=random):
+    """
+    重みに比例してk件を重複なく選ぶ。
+    FenwickTreeで1件ずつ引き、引いたものの重みを0にする: O(n + k log n)
+    """
+    tree = FenwickTree(weights)
+    picked = []
+    while len(picked) < k:
+        total = tree.total
+        if total <= 0:
+            break
+        index = tree.find(rng.random() * total)
+        if tree.weight(index) <= 0:
+            # 小数の重みの誤差で合計だけが残った
+            break
+        picked.append(items[index])
+        tree.add(index, -tree.weight(index))
+    return picked
@@ -0,0 +1,130 @@
+"""
+examState / chapterInfo セッション属性のエンコード・デコード
+
+    examState   "~1" + base64url(バイナリ)
+        flags(1byte: bit0=is_finished)
+        varint max_num, varint current_num
+        varint len(q_list), varint id ...
+        varint len(results), 正解ビットセット(結果iは q_list[i] の問題)
+    chapterInfo "~1" + chapter_code + ":" + question_num
+
+"{" で始まる値は旧来のJSON形式として読む。
+"""
+
+import base64
+import json
+
+PREFIX = "~"
+VERSION = 1
+FINISHED = 0x01
+CORRECT = "correct"
+INCORRECT = "incorrect"
+
+
+def new_exam_state(question_num, q_list=None):
+    return {
+        "is_finished": False,
+        "max_num": question_num,
+        "current_num": 0,
+        "results": [],
+        "q_list": q_list or [],
+    }
+
+
+def encode_exam_state(state):
+    q_list = [int(q_id) for q_id in state["q_list"]]
+    results = state["results"]
+    if len(results) > len(q_list) or any(
+        int(result["id"]) != q_list[i] for i, result in enumerate(results)
+    ):
+        # 結果の並びが出題順と一致しない場合はビットセットにできない
+        return json.dumps(state)
+
+    buf = bytearray([FINISHED if state["is_finished"] else 0])
+    _write_varint(buf, int(state["max_num"]))
+    _write_varint(buf, state["current_num"])
+    _write_varint(buf, len(q_list))
+    for q_id in q_list:
+        _write_varint(buf, q_id)
+    _write_varint(buf, len(results))
+    bits = bytearray((len(results) + 7) // 8)
+    for i, result in enumerate(results):
+        if result["result"] == CORRECT:
+            bits[i // 8] |= 1 << (i % 8)
+    buf.extend(bits)
+    return PREFIX + str(VERSION) + base64.urlsafe_b64encode(bytes(buf)).decode("ascii")
+
+
+def decode_exam_state(value):
+    """旧JSON形式・新形式のどちらも同じdictにして返す。値がなければNone"""
+    if not value:
+        return None
+    if not value.startswith(PREFIX):
+        return json.loads(value)
+    _check_version(value)
+    data = base64.urlsafe_b64decode(value[2:])
+    flags = data[0]
+    pos = 1
+    max_num, pos = _read_varint(data, pos)
+    current_num, pos = _read_varint(data, pos)
+    count, pos = _read_varint(data, pos)
+    q_list = []
+    for _ in range(count):
+        q_id, pos = _read_varint(data, pos)
+        q_list.append(q_id)
+    result_count, pos = _read_varint(data, pos)
+    results = [
+        {
+            "id": q_list[i],
+            "result": CORRECT if data[pos + i // 8] >> (i % 8) & 1 else INCORRECT,
+        }
+        for i in range(result_count)
+    ]
+    return {
+        "is_finished": bool(flags & FINISHED),
+        "max_num": str(max_num),
+        "current_num": current_num,
+        "results": results,
+        "q_list": [str(q_id) for q_id in q_list],
+    }
+
+
+def encode_chapter_info(chapter_info):
+    return "{}{}{}:{}".format(
+        PREFIX, VERSION, chapter_info["chapter_code"], chapter_info["question_num"]
+    )
+
+
+def decode_chapter_info(value):
+    """値がなければ空のdictを返す"""
+    if not value:
+        return {}
+    if not value.startswith(PREFIX):
+        return json.loads(value)
+    _check_version(value)
+    chapter_code, question_num = value[2:].rsplit(":", 1)
+    return {"chapter_code": chapter_code, "question_num": question_num}
+
+
+def _check_version(value):
+    if value[1:2] != str(VERSION):
+        raise ValueError("unsupported session state version: {}".format(value[:2]))
+
+
+def _write_varint(buf, value):
+    while value >= 0x80:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
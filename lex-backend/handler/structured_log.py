@@ -0,0 +1,88 @@
+"""
+1ターン1行のJSONログとレベル付きの遅延フォーマットログ
+
+    LOG_LEVEL                 既定のログレベル (default: INFO)
+    LOG_LEVELS                インテントごとのレベル 例) "StartQuiz=DEBUG,Welcome=WARNING"
+    LOG_PAYLOAD_SAMPLE_RATE   イベント・レスポンス全体をDEBUGで出す割合 0.0-1.0 (default: 0)
+"""
+
+import json
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger("quizbot")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {"level": record.levelname, "msg": record.getMessage()}
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def configure():
+    """プロセスごとに一度だけ呼ぶ"""
+    formatter = JsonFormatter()
+    root = logging.getLogger()
+    if not root.handlers:
+        root.addHandler(logging.StreamHandler())
+    for handler in root.handlers:
+        handler.setFormatter(formatter)
+    root.setLevel(_level(os.environ.get("LOG_LEVEL"), logging.INFO))
+    logger.setLevel(root.level)
+
+
+def intent_levels():
+    levels = {}
+    for pair in os.environ.get("LOG_LEVELS", "").split(","):
+        if "=" in pair:
+            intent_name, level = pair.split("=", 1)
+            levels[intent_name.strip()] = _level(level.strip(), None)
+    return levels
+
+
+def begin_turn(intent_name):
+    """インテントに応じてこのターンのログレベルを切り替える"""
+    default = _level(os.environ.get("LOG_LEVEL"), logging.INFO)
+    logger.setLevel(intent_levels().get(intent_name) or default)
+    return time.perf_counter()
+
+
+def dump(label, payload):
+    """イベントやレスポンス全体はサンプリングした分だけDEBUGで出す"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    rate = float(os.environ.get("LOG_PAYLOAD_SAMPLE_RATE", "0"))
+    if rate > 0 and random.random() < rate:
+        logger.debug(label, extra={"fields": {"payload": payload}})
+
+
+def end_turn(started, intent_request, response, **fields):
+    """1ターンの要約をINFOで1行出す"""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    session_state = (response or {}).get("sessionState", {})
+    dialog_action = session_state.get("dialogAction", {})
+    summary = {
+        "sessionId": intent_request.get("sessionId"),
+        "intent": intent_request["sessionState"]["intent"]["name"],
+        "source": intent_request.get("invocationSource"),
+        "action": dialog_action.get("type"),
+        "slotToElicit": dialog_action.get("slotToElicit"),
+        "ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+    summary.update(fields)
+    logger.info("turn", extra={"fields": summary})
+
+
+def _level(name, default):
+    if not name:
+        return default
+    level = logging.getLevelName(name.upper())
+    return level if isinstance(level, int) else default
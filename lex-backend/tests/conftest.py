@@ -0,0 +1,11 @@
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+# Lambdaと同じくhandler/直下のモジュールをトップレベルでimportできるようにする
+HANDLER_DIR = os.path.join(ROOT_DIR, "handler")
+# インポートCLI(dynamodb/)のモジュールもトップレベルでimportする
+DYNAMODB_DIR = os.path.join(os.path.dirname(os.path.abspath(ROOT_DIR)), "dynamodb")
+for path in (DYNAMODB_DIR, HANDLER_DIR, ROOT_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,69 @@
+import pytest
+
+import answer_matcher
+from answer_matcher import CORRECT, INCORRECT, NEAR_MISS
+
+
+@pytest.fixture()
+def image_quiz():
+    return {
+        "kind": "Image",
+        "a": ["結腸", "横行結腸"],
+        "secondary_a": ["大腸", "S状結腸"],
+    }
+
+
+@pytest.fixture()
+def desc_quiz():
+    return {"kind": "Desc", "a": ["excision"], "secondary_a": []}
+
+
+def test_normalize_unifies_width_case_kana_and_spaces():
+    assert answer_matcher.normalize("Ｅｘｃｉｓｉｏｎ") == "excision"
+    assert answer_matcher.normalize(" ﾆﾎﾞｰ ") == answer_matcher.normalize("にぼー")
+    assert answer_matcher.normalize("ドレ　ナージ") == "どれなーじ"
+
+
+def test_judge_exact_and_normalized_answers(image_quiz, desc_quiz):
+    assert answer_matcher.judge(image_quiz, "結腸") == CORRECT
+    assert answer_matcher.judge(image_quiz, "Ｓ状結腸") == NEAR_MISS
+    assert answer_matcher.judge(image_quiz, "小腸") == INCORRECT
+    assert answer_matcher.judge(desc_quiz, "EXCISION") == CORRECT
+
+
+def test_edit_distance_only_for_desc_when_enabled(monkeypatch, desc_quiz):
+    assert answer_matcher.judge(desc_quiz, "exision") == INCORRECT
+
+    monkeypatch.setenv("ANSWER_MAX_EDIT_DISTANCE", "1")
+    assert answer_matcher.judge(desc_quiz, "exision") == CORRECT
+    assert answer_matcher.judge(desc_quiz, "exisoin") == INCORRECT
+    image = {"kind": "Image", "a": ["excision"], "secondary_a": []}
+    assert answer_matcher.judge(image, "exision") == INCORRECT
+
+
+def test_compiled_answers_are_reused_per_item(image_quiz):
+    image_quiz.update(chapter_code="A", id=2)
+    compiled = answer_matcher.compile_answers(image_quiz)
+
+    assert answer_matcher.compile_answers(image_quiz) is compiled
+    assert answer_matcher.compile_answers(dict(image_quiz)) is compiled
+    changed = dict(image_quiz, a=["小腸"])
+    assert answer_matcher.compile_answers(changed) is not compiled
+    assert answer_matcher.judge(changed, "小腸") == CORRECT
+    # 同じidでも章が違えば別の問題
+    other = {"chapter_code": None, "id": 2, "kind": "Image", "a": ["胃"]}
+    assert answer_matcher.judge(other, "胃") == CORRECT
+    assert answer_matcher.judge(image_quiz, "胃") != CORRECT
+
+
+@pytest.mark.parametrize(
+    "a, b, limit, expected",
+    [
+        ("kitten", "sitting", 3, 3),
+        ("kitten", "sitting", 2, 3),
+        ("", "abc", 5, 3),
+        ("ligation", "ligation", 1, 0),
+    ],
+)
+def test_bounded_edit_distance(a, b, limit, expected):
+    assert answer_matcher.bounded_edit_distance(a, b, limit) == expected
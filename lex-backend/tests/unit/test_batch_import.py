@@ -0,0 +1,225 @@
+import io
+import json
+from decimal import Decimal
+
+import boto3
+import pytest
+from botocore.config import Config
+
+from benchmarks.local_dynamodb import LocalDynamoDB
+
+from batch_import import (
+    AdaptiveRateLimiter,
+    ThrottledBatchWriter,
+    iter_csv_items,
+    iter_json_items,
+    parse_header,
+)
+
+TABLE = "QuizTable"
+
+
+class Clock:
+    """sleep すると時間が進む時計"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture()
+def clock():
+    return Clock()
+
+
+@pytest.fixture()
+def local(monkeypatch, clock):
+    monkeypatch.setenv("DYNAMODB_TABLE", TABLE)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "local")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "local")
+    return LocalDynamoDB(clock=clock)
+
+
+def writer_for(local, clock, rate=100, **kwargs):
+    limiter = AdaptiveRateLimiter(rate, clock=clock, sleep=clock.sleep)
+    # スロットリングはSDKで再試行させず、ThrottledBatchWriterに任せる
+    resource = boto3.resource(
+        "dynamodb", region_name="us-east-1", config=Config(retries={"max_attempts": 0})
+    )
+    client = local.attach(resource.meta.client)
+    return ThrottledBatchWriter(client, TABLE, limiter, sleep=clock.sleep, **kwargs)
+
+
+def item(q_id, q="問題", chapter_code="A"):
+    return {"chapter_code": chapter_code, "id": q_id, "q": q}
+
+
+def test_limiter_waits_for_tokens_and_ramps_up(clock):
+    limiter = AdaptiveRateLimiter(10, max_rate=30, clock=clock, sleep=clock.sleep)
+
+    limiter.acquire(10)
+    assert clock.sleeps == []
+    limiter.acquire(5)
+    assert clock.sleeps == [pytest.approx(0.5)]
+    clock.now = 1.0
+    limiter.record(5, 5)
+    # 最初のスロットリングまでは毎秒2倍
+    assert limiter.rate == 20
+    limiter.acquire(40)
+    clock.now = 2.0
+    limiter.record(40, 40)
+    assert limiter.rate == 30
+
+
+def test_limiter_does_not_exceed_writerate_by_default(clock):
+    limiter = AdaptiveRateLimiter(5, clock=clock, sleep=clock.sleep)
+
+    for second in range(1, 11):
+        limiter.acquire(10)
+        clock.now = max(clock.now, float(second))
+        limiter.record(10, 10)
+        assert limiter.rate == 5
+    # --max-writerate より大きい --writerate は上限に合わせる
+    assert AdaptiveRateLimiter(50, max_rate=20).rate == 20
+
+
+def test_limiter_backs_off_then_grows_slowly(clock):
+    limiter = AdaptiveRateLimiter(20, clock=clock, sleep=clock.sleep)
+
+    limiter.throttled()
+    assert limiter.rate == 10
+    assert limiter.tokens <= 0
+    limiter.acquire(10)
+    clock.now = 1.0
+    limiter.record(10, 10)
+    assert limiter.rate == pytest.approx(11)
+    assert limiter.throttles == 1
+
+
+def test_limiter_does_not_grow_while_idle(clock):
+    limiter = AdaptiveRateLimiter(10, clock=clock, sleep=clock.sleep)
+
+    limiter.acquire(1)
+    clock.now = 1.0
+    limiter.record(1, 1)
+    assert limiter.rate == 10
+
+
+def test_writer_keeps_the_last_request_per_key(local, clock):
+    written = []
+    with writer_for(local, clock, on_written=written.extend) as writer:
+        writer.put(item(1, "古い"))
+        writer.put(item(2))
+        writer.put(item(1, "新しい"))
+        writer.delete({"chapter_code": "A", "id": 2})
+
+    assert writer.requests == 1
+    assert [i["q"] for i in local.items(TABLE) if i["chapter_code"] == "A"] == [
+        "新しい"
+    ]
+    assert [(i["id"], i.get("q")) for i in written] == [(1, "新しい"), (2, None)]
+
+
+def test_writer_resends_only_unprocessed_items(local, clock):
+    local.write_capacity = 10
+    written = []
+    with writer_for(local, clock, rate=100, on_written=written.extend) as writer:
+        for q_id in range(1, 26):
+            writer.put(item(q_id, chapter_code="Z"))
+
+    stored = [i["id"] for i in local.items(TABLE) if i["chapter_code"] == "Z"]
+    assert stored == list(range(1, 26))
+    assert sorted(i["id"] for i in written) == stored
+    assert local.applied["BatchWriteItem"] == 25
+    assert writer.requests > 1
+    assert writer.limiter.throttles >= 1
+
+
+def test_writer_gives_up_after_max_retries(local, clock):
+    local.write_capacity = 1
+    writer = writer_for(local, clock, max_retries=2)
+
+    with pytest.raises(RuntimeError):
+        with writer:
+            for q_id in range(1, 6):
+                writer.put(item(q_id, "x" * 2000))
+
+
+def test_parse_header():
+    assert parse_header(["chapter_code (S)", "id(N)", " q ", "a (L)"]) == [
+        ("chapter_code", "S"),
+        ("id", "N"),
+        ("q", None),
+        ("a", "L"),
+    ]
+
+
+def test_csv_rows_follow_typed_header():
+    f = io.StringIO(
+        "chapter_code (S),id (N),score (N),ok (BOOL),a (L),tags (SS),memo\n"
+        'A,3,1.5,true,"[{""S"": ""はい""}]","[{""S"": ""x""}]",\n'
+        "B,4,,FALSE,[],[],メモ\n"
+    )
+
+    first, second = iter_csv_items(f)
+
+    assert first == {
+        "chapter_code": "A",
+        "id": 3,
+        "score": pytest.approx(1.5),
+        "ok": True,
+        "a": ["はい"],
+        "tags": {"x"},
+        "memo": "",
+    }
+    # 型付きの空セルと空のセットは書き込まない
+    assert second == {
+        "chapter_code": "B",
+        "id": 4,
+        "ok": False,
+        "a": [],
+        "memo": "メモ",
+    }
+    assert list(iter_csv_items(io.StringIO(""))) == []
+
+
+JSON_ITEMS = [
+    {"chapter_code": "A", "id": 1, "q": "胃は臓器？", "a": ["はい"]},
+    {"chapter_code": "A", "id": 2, "q": "[x], {y}", "rate": 0.25, "ok": True},
+    {"chapter_code": "B", "id": 11, "q": '引用符 \\"と改行\\n', "n": None},
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 65536])
+@pytest.mark.parametrize(
+    "text",
+    [
+        json.dumps(JSON_ITEMS, ensure_ascii=False, indent=2),
+        json.dumps(JSON_ITEMS, ensure_ascii=False, separators=(",", ":")),
+        "\n".join(json.dumps(item, ensure_ascii=False) for item in JSON_ITEMS) + "\n",
+    ],
+    ids=["array", "compact", "lines"],
+)
+def test_json_items_across_chunk_boundaries(text, chunk_size):
+    items = list(iter_json_items(io.StringIO(text), chunk_size=chunk_size))
+
+    assert items == JSON_ITEMS
+    assert isinstance(items[1]["rate"], Decimal)
+
+
+def test_json_edge_cases():
+    assert list(iter_json_items(io.StringIO(""))) == []
+    assert list(iter_json_items(io.StringIO(" [ ] "))) == []
+    # 配列の外の数値は続きがあるかもしれないので最後まで読む
+    assert list(iter_json_items(io.StringIO("12345 6"), chunk_size=2)) == [12345, 6]
+    with pytest.raises(ValueError):
+        list(iter_json_items(io.StringIO('[{"id": 1},'), chunk_size=4))
+    with pytest.raises(ValueError):
+        list(iter_json_items(io.StringIO('{"id": 1'), chunk_size=4))
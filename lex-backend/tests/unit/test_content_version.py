@@ -0,0 +1,35 @@
+import boto3
+
+from benchmarks.local_dynamodb import LocalDynamoDB
+
+from content_version import CATALOG_COMPLETE, META_ID, update_catalog
+
+TABLE = "QuizTable"
+
+
+def test_catalog_is_rebuilt_from_the_chapter_keys(monkeypatch):
+    monkeypatch.setenv("DYNAMODB_TABLE", TABLE)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "local")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "local")
+    local = LocalDynamoDB(page_items=2)
+    # CLIより前に入れた問題と、古いカタログにだけ残っている問題
+    for q_id in (1, 2, 3):
+        local.put(TABLE, {"chapter_code": "A", "id": q_id})
+    local.put(TABLE, {"chapter_code": "A", "id": META_ID, "version": 4, "ids": {9}})
+    resource = boto3.resource("dynamodb", region_name="us-east-1")
+    local.attach(resource.meta.client)
+    table = resource.Table(TABLE)
+
+    local.put(TABLE, {"chapter_code": "A", "id": 4})
+    assert update_catalog(table, {"A": [4]}) == {"A": 5}
+
+    meta = {i["chapter_code"]: i for i in local.items(TABLE) if i["id"] == META_ID}
+    assert sorted(meta["A"]["ids"]) == [1, 2, 3, 4]
+    assert meta["A"][CATALOG_COMPLETE] is True
+
+    # 章の問題をすべて消したらidsを消す（空のセットは書き込めない）
+    for q_id in (1, 2, 3, 4):
+        del local.tables[TABLE]["items"][("A", q_id)]
+    assert update_catalog(table, {}, {"A": [1, 2, 3, 4]}) == {"A": 6}
+    meta = {i["chapter_code"]: i for i in local.items(TABLE) if i["id"] == META_ID}
+    assert "ids" not in meta["A"]
@@ -0,0 +1,123 @@
+import json
+import threading
+from collections import defaultdict
+
+import boto3
+import pytest
+from botocore.config import Config
+
+from benchmarks.local_dynamodb import LocalDynamoDB
+
+from batch_import import AdaptiveRateLimiter
+from dir_import import ParallelImporter, expand_paths
+
+TABLE = "QuizTable"
+
+
+class RecordingClient:
+    """どのスレッドがどのキーを書き込んだかを記録する"""
+
+    def __init__(self, client):
+        self.client = client
+        self.threads = defaultdict(set)  # (chapter_code, id) -> {thread id}
+
+    def batch_write_item(self, **kwargs):
+        for request in kwargs["RequestItems"][TABLE]:
+            target = request.get("PutRequest", {}).get("Item") or request.get(
+                "DeleteRequest", {}
+            ).get("Key")
+            key = (target["chapter_code"], int(target["id"]))
+            self.threads[key].add(threading.get_ident())
+        return self.client.batch_write_item(**kwargs)
+
+
+@pytest.fixture()
+def local(monkeypatch):
+    monkeypatch.setenv("DYNAMODB_TABLE", TABLE)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "local")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "local")
+    return LocalDynamoDB()
+
+
+@pytest.fixture()
+def client(local):
+    resource = boto3.resource(
+        "dynamodb", region_name="us-east-1", config=Config(retries={"max_attempts": 0})
+    )
+    return RecordingClient(local.attach(resource.meta.client))
+
+
+def write_json(path, items):
+    with open(path, "w") as f:
+        json.dump(items, f, ensure_ascii=False)
+    return str(path)
+
+
+def quiz(chapter_code, q_id, q):
+    return {"chapter_code": chapter_code, "id": q_id, "q": q}
+
+
+def test_expand_paths(tmp_path):
+    directory = tmp_path / "quizset"
+    directory.mkdir()
+    first = write_json(directory / "a.json", [])
+    second = write_json(directory / "b.jsonl", [])
+    (directory / "notes.txt").write_text("")
+    other = write_json(tmp_path / "c.json", [])
+
+    assert expand_paths([str(directory), str(tmp_path / "*.json"), first]) == sorted(
+        [first, second, other]
+    )
+
+
+def test_same_key_goes_to_one_worker_and_last_file_wins(local, client, tmp_path):
+    first = write_json(
+        tmp_path / "1.json",
+        [quiz(code, q_id, "古い") for code in "AB" for q_id in range(1, 21)],
+    )
+    second = write_json(
+        tmp_path / "2.json",
+        [quiz("A", q_id, "新しい") for q_id in range(1, 21, 2)],
+    )
+    importer = ParallelImporter(client, TABLE, AdaptiveRateLimiter(1000), workers=4)
+
+    chapter_ids, removed = importer.run([first, second])
+
+    assert {code: len(ids) for code, ids in chapter_ids.items()} == {"A": 20, "B": 20}
+    assert removed == {}
+    assert all(len(threads) == 1 for threads in client.threads.values())
+    assert len({t for threads in client.threads.values() for t in threads}) > 1
+    stored = {(i["chapter_code"], i["id"]): i["q"] for i in local.items(TABLE)}
+    assert stored[("A", 1)] == "新しい"
+    assert stored[("A", 2)] == "古い"
+    assert stored[("B", 1)] == "古い"
+    assert importer.stats[first].read == 40
+    assert importer.stats[second].written == 10
+    # 同じワーカーでまだ送っていない古い内容は新しい内容にまとめられる
+    assert 40 <= sum(writer.written for writer in importer.writers) <= 50
+
+
+def test_deletes_use_the_same_worker_as_puts(local, client, tmp_path):
+    path = write_json(tmp_path / "1.json", [quiz("A", q_id, "q") for q_id in (1, 2)])
+    importer = ParallelImporter(client, TABLE, AdaptiveRateLimiter(1000), workers=3)
+
+    class DeleteAfterReading:
+        removed_keys = []
+
+        def scan(self, items):
+            list(items)
+
+        def check(self, item):
+            return item
+
+        def delete_removed(self, writer, delete):
+            writer.delete({"chapter_code": "A", "id": 2})
+            return {"A": [2]}
+
+    chapter_ids, removed = importer.run([path], plan=DeleteAfterReading())
+
+    assert removed == {"A": [2]}
+    assert [i["id"] for i in local.items(TABLE) if i["chapter_code"] == "A"] == [1]
+    assert len(client.threads[("A", 2)]) == 1
+    # まだ送っていない書き込みは削除に置き換わり、削除はファイルの件数に数えない
+    assert importer.stats[path].written == 1
@@ -0,0 +1,99 @@
+import os
+import subprocess
+import sys
+from decimal import Decimal
+
+import pytest
+
+import dynamo
+
+
+@pytest.fixture(autouse=True)
+def clear_registry(monkeypatch):
+    monkeypatch.setenv("DYNAMODB_TABLE", "QuizTable")
+    monkeypatch.setenv("REGION_NAME", "us-east-1")
+    dynamo.reset()
+    yield
+    dynamo.reset()
+
+
+def test_get_table_is_reused():
+    table = dynamo.get_table()
+    assert table is dynamo.get_table()
+    assert table.name == "QuizTable"
+
+
+def test_get_table_keyed_by_name_and_region():
+    default = dynamo.get_table()
+    other_name = dynamo.get_table("OtherTable")
+    other_region = dynamo.get_table(region="ap-northeast-1")
+
+    assert other_name is not default
+    assert other_region is not default
+    assert other_name.name == "OtherTable"
+    assert other_region.meta.client.meta.region_name == "ap-northeast-1"
+
+
+def test_tables_share_resource_and_client_per_region():
+    table = dynamo.get_table()
+    other = dynamo.get_table("OtherTable")
+
+    assert table.meta.client is other.meta.client
+    assert table.meta.client.meta.config.max_pool_connections == (
+        dynamo.client_config().max_pool_connections
+    )
+
+
+def test_low_level_client_is_reused_and_untransformed():
+    client = dynamo.get_client()
+
+    assert client is dynamo.get_client()
+    assert client is not dynamo.get_table().meta.client
+    assert client.meta.config.max_pool_connections == (
+        dynamo.client_config().max_pool_connections
+    )
+
+
+def test_to_plain_matches_decimal_default_proc():
+    item = {
+        "id": Decimal("3"),
+        "a": ["excision", "Excision"],
+        "score": Decimal("1.9"),
+        "nested": {"ids": {Decimal("1")}},
+    }
+
+    assert dynamo.to_plain(item) == {
+        "id": 3,
+        "a": ["excision", "Excision"],
+        "score": 1,
+        "nested": {"ids": [1]},
+    }
+
+
+def test_deserialize_item_handles_low_level_types():
+    item = {
+        "chapter_code": {"S": "A"},
+        "id": {"N": "12"},
+        "a": {"L": [{"S": "はい"}]},
+        "meta": {"M": {"ratio": {"N": "0.5"}, "ok": {"BOOL": True}}},
+        "image": {"NULL": True},
+        "ids": {"NS": ["1", "2"]},
+    }
+
+    assert dynamo.deserialize_item(item) == {
+        "chapter_code": "A",
+        "id": 12,
+        "a": ["はい"],
+        "meta": {"ratio": 0, "ok": True},
+        "image": None,
+        "ids": [1, 2],
+    }
+
+
+def test_importing_handler_does_not_load_boto3():
+    code = "import sys, app; assert 'boto3' not in sys.modules, 'boto3 loaded'"
+    subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        cwd=os.path.dirname(dynamo.__file__),
+    )
@@ -1,72 +1,330 @@
 import json
+import os
 
 import pytest
 
-from hello_world import app
+from benchmarks._common import ROOT_DIR
+from benchmarks.lex_events import LexSession, lex_event, load_sequence
+from benchmarks.local_dynamodb import LocalDynamoDB
+
+import adaptive
+import app
+import question_stats
+import quiz_bundle
+import quiz_repository
+import results_store
+
+SEQUENCE_DIR = os.path.join(ROOT_DIR, "events", "lex")
 
 
 @pytest.fixture()
-def apigw_event():
-    """ Generates API GW Event"""
-
-    return {
-        "body": '{ "test": "body"}',
-        "resource": "/{proxy+}",
-        "requestContext": {
-            "resourceId": "123456",
-            "apiId": "1234567890",
-            "resourcePath": "/{proxy+}",
-            "httpMethod": "POST",
-            "requestId": "c6af9ac6-7b61-11e6-9a41-93e8deadbeef",
-            "accountId": "123456789012",
-            "identity": {
-                "apiKey": "",
-                "userArn": "",
-                "cognitoAuthenticationType": "",
-                "caller": "",
-                "userAgent": "Custom User Agent String",
-                "user": "",
-                "cognitoIdentityPoolId": "",
-                "cognitoIdentityId": "",
-                "cognitoAuthenticationProvider": "",
-                "sourceIp": "127.0.0.1",
-                "accountId": "",
-            },
-            "stage": "prod",
-        },
-        "queryStringParameters": {"foo": "bar"},
-        "headers": {
-            "Via": "1.1 08f323deadbeefa7af34d5feb414ce27.cloudfront.net (CloudFront)",
-            "Accept-Language": "en-US,en;q=0.8",
-            "CloudFront-Is-Desktop-Viewer": "true",
-            "CloudFront-Is-SmartTV-Viewer": "false",
-            "CloudFront-Is-Mobile-Viewer": "false",
-            "X-Forwarded-For": "127.0.0.1, 127.0.0.2",
-            "CloudFront-Viewer-Country": "US",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Upgrade-Insecure-Requests": "1",
-            "X-Forwarded-Port": "443",
-            "Host": "1234567890.execute-api.us-east-1.amazonaws.com",
-            "X-Forwarded-Proto": "https",
-            "X-Amz-Cf-Id": "aaaaaaaaaae3VYQb9jd-nvCd-de396Uhbp027Y2JvkCPNLmGJHqlaA==",
-            "CloudFront-Is-Tablet-Viewer": "false",
-            "Cache-Control": "max-age=0",
-            "User-Agent": "Custom User Agent String",
-            "CloudFront-Forwarded-Proto": "https",
-            "Accept-Encoding": "gzip, deflate, sdch",
-        },
-        "pathParameters": {"proxy": "/examplepath"},
-        "httpMethod": "POST",
-        "stageVariables": {"baz": "qux"},
-        "path": "/examplepath",
-    }
-
-
-def test_lambda_handler(apigw_event):
-
-    ret = app.lambda_handler(apigw_event, "")
-    data = json.loads(ret["body"])
-
-    assert ret["statusCode"] == 200
-    assert "message" in ret["body"]
-    assert data["message"] == "hello world"
+def local(monkeypatch):
+    monkeypatch.setenv("DYNAMODB_TABLE", "QuizTable")
+    monkeypatch.setenv("REGION_NAME", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "local")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "local")
+    monkeypatch.delenv("QUIZ_PREFETCH", raising=False)
+    monkeypatch.delenv("QUIZ_CACHE_ENABLED", raising=False)
+    monkeypatch.delenv("QUIZ_BACKEND", raising=False)
+    monkeypatch.delenv("RESULTS_TABLE", raising=False)
+    monkeypatch.delenv("ADAPTIVE_CHAPTERS", raising=False)
+    monkeypatch.delenv("STATS_TABLE", raising=False)
+    monkeypatch.delenv("METRICS_ENABLED", raising=False)
+    local = LocalDynamoDB().install()
+    local.seed_quizset()
+    app.chapter_cache.invalidate()
+    yield local
+    local.uninstall()
+    app.chapter_cache.invalidate()
+
+
+def play(name):
+    session = LexSession(app.lambda_handler, "test-session")
+    responses = [
+        session.send(turn["intent"], turn["slots"], turn["source"])
+        for turn in load_sequence(os.path.join(SEQUENCE_DIR, name))["turns"]
+    ]
+    return session, responses
+
+
+def dialog_action(response):
+    return response["sessionState"]["dialogAction"]
+
+
+def test_recorded_dialog_runs_to_the_end(local):
+    session, responses = play("quiz_b_5.json")
+
+    questions = [
+        r for r in responses if dialog_action(r).get("slotToElicit") == "Answer"
+    ]
+    assert len(questions) == 5
+    assert dialog_action(responses[-1])["type"] == "Close"
+    assert "5問" in responses[-1]["messages"][0]["content"]
+    # 章キャッシュがあれば1回の出題でバージョン確認と章の読み込みだけ
+    assert local.calls == {"GetItem": 1, "Query": 1}
+
+
+def test_metrics_are_one_emf_line_per_turn(local, monkeypatch, capsys):
+    monkeypatch.setenv("METRICS_ENABLED", "true")
+    session, responses = play("quiz_b_5.json")
+
+    documents = [
+        json.loads(line)
+        for line in capsys.readouterr().out.splitlines()
+        if line.startswith('{"_aws"')
+    ]
+    assert len(documents) == len(responses)
+    questions = [d for d in documents if d["Intent"] == "StartQuiz" and "set_quiz" in d]
+    assert questions
+    for document in questions:
+        assert {"session", "total"} <= set(document)
+        assert document["total"][0] >= sum(document["set_quiz"])
+    # 次の問題を出すターンは応答の組み立ても計る
+    assert any(
+        {"elicit_slot", "build_question_card"} <= set(document)
+        for document in questions
+    )
+
+
+def test_session_attributes_are_strings(local):
+    session, responses = play("quiz_a_3.json")
+
+    for response in responses:
+        attributes = response["sessionState"].get("sessionAttributes") or {}
+        assert all(isinstance(value, str) for value in attributes.values())
+
+
+def test_prefetch_reads_nothing_after_first_question(local, monkeypatch):
+    monkeypatch.setenv("QUIZ_PREFETCH", "true")
+    monkeypatch.setenv("QUIZ_CACHE_ENABLED", "false")
+    session = LexSession(app.lambda_handler)
+    session.send("CheckChapter", {"ChapterCode": "C", "QuestionNum": "7"})
+    session.send(
+        "CheckChapter", {"ChapterCode": "C", "QuestionNum": "7"}, "FulfillmentCodeHook"
+    )
+    session.send("StartQuiz")
+    assert "quizItems" in session.attributes
+    calls = sum(local.calls.values())
+
+    for _ in range(7):
+        response = session.send("StartQuiz", {"Answer": "はい"})
+    assert dialog_action(response)["slotToElicit"] == "IsDisplayedResults"
+    assert sum(local.calls.values()) == calls
+
+
+def test_sampling_without_cache_uses_catalog(local, monkeypatch):
+    monkeypatch.setenv("QUIZ_CACHE_ENABLED", "false")
+    chapter_ids = local.seed_quizset()
+
+    ids = quiz_repository.dynamodb_repository.sample_ids("A", 3)
+
+    assert len(set(ids)) == 3
+    assert set(ids) <= chapter_ids["A"]
+    assert local.calls == {"GetItem": 1}
+
+
+def test_sampling_ignores_catalog_not_rebuilt_by_the_cli(local, monkeypatch):
+    monkeypatch.setenv("QUIZ_CACHE_ENABLED", "false")
+    chapter_ids = local.seed_quizset()
+    # 既存のテーブルに数件だけ追加したときの古いカタログ
+    local.put("QuizTable", {"chapter_code": "A", "id": 0, "version": 2, "ids": {1}})
+
+    ids = quiz_repository.dynamodb_repository.sample_ids("A", 3)
+
+    assert len(set(ids)) == 3
+    assert set(ids) <= chapter_ids["A"]
+    assert local.calls["Query"] >= 1
+
+
+def test_missing_question_restarts_the_quiz(local, monkeypatch):
+    monkeypatch.setenv("QUIZ_CACHE_ENABLED", "false")
+    session = LexSession(app.lambda_handler)
+    session.send("CheckChapter", {"ChapterCode": "C", "QuestionNum": "3"})
+    session.send(
+        "CheckChapter", {"ChapterCode": "C", "QuestionNum": "3"}, "FulfillmentCodeHook"
+    )
+    session.send("StartQuiz")
+    # 出題を決めた後に、CLIを通さずに章の問題を消す
+    items = local.tables["QuizTable"]["items"]
+    for key, item in list(items.items()):
+        if item["chapter_code"]["S"] == "C" and item["id"]["N"] != "0":
+            del items[key]
+
+    response = session.send("StartQuiz", {"Answer": "はい"})
+
+    assert dialog_action(response)["type"] == "Close"
+    assert "問題が見つかりませんでした" in response["messages"][0]["content"]
+    assert "examState" not in session.attributes
+
+
+@pytest.fixture()
+def results(local, monkeypatch):
+    monkeypatch.setenv("RESULTS_TABLE", "QuizResults")
+    monkeypatch.setattr(
+        results_store,
+        "results_buffer",
+        results_store.ResultsBuffer(results_store.send_batch),
+    )
+    local.create_table("QuizResults", "session_id", "quiz_key")
+    return results_store.results_buffer
+
+
+def test_one_result_write_per_finished_quiz(local, results):
+    session, responses = play("quiz_b_5.json")
+
+    assert local.calls["BatchWriteItem"] == 1
+    (item,) = local.items("QuizResults")
+    assert item["session_id"] == "test-session"
+    assert item["chapter_code"] == "B"
+    assert item["question_num"] == 5
+    assert item["correct_num"] == len(item["correct"])
+    assert (
+        "{}問正解".format(item["correct_num"])
+        in responses[-1]["messages"][0]["content"]
+    )
+
+
+def test_adaptive_profile_is_written_with_the_result(local, results, monkeypatch):
+    monkeypatch.setenv("ADAPTIVE_CHAPTERS", "B")
+    monkeypatch.setattr(
+        adaptive, "profiles", adaptive.ProfileStore(adaptive.load_profile)
+    )
+    session, responses = play("quiz_b_5.json")
+
+    # GetItemは章のバージョン確認が1回、プロファイルは開始時と終了時の2回。
+    # 終了時は結果と同じ1回のBatchWriteItem
+    assert local.calls["BatchWriteItem"] == 1
+    assert local.calls["GetItem"] == 3
+    items = {item["quiz_key"]: item for item in local.items("QuizResults")}
+    profile = items.pop("profile:B")
+    (result,) = items.values()
+    missed = set(result["q_list"]) - set(result["correct"])
+    assert {int(q_id) for q_id in profile["levels"]} == missed
+    # プロファイルはセッションではなく名前に付く
+    assert profile["session_id"] == "user:太郎"
+    assert result["session_id"] == session.session_id
+
+
+def test_result_write_failure_does_not_block_the_dialog(local, results):
+    del local.tables["QuizResults"]
+
+    session, responses = play("quiz_a_3.json")
+
+    assert dialog_action(responses[-1])["type"] == "Close"
+    assert len(results) == 1
+
+    local.create_table("QuizResults", "session_id", "quiz_key")
+    play("quiz_b_5.json")
+    assert len(local.items("QuizResults")) == 2
+    assert len(results) == 0
+
+
+def test_question_stats_are_written_in_one_flush(local, monkeypatch):
+    monkeypatch.setenv("STATS_TABLE", "QuizStats")
+    monkeypatch.setenv("STATS_FLUSH_ITEMS", "10")
+    counter = question_stats.StatsCounter(question_stats.send_update)
+    monkeypatch.setattr(question_stats, "counter", counter)
+    local.create_table("QuizStats", "chapter_code", "id")
+    play("quiz_b_5.json")
+
+    # 回答のたびには書き込まず、クイズが終わったときにまとめて書き込む
+    assert counter.flushes == 1
+    assert counter.updates == 5
+    assert len(counter) == 0
+    assert local.calls["UpdateItem"] == 5
+    stats = local.items("QuizStats")
+    assert sum(item["attempts"] for item in stats) == 5
+    assert {item["chapter_code"] for item in stats} == {"B"}
+
+
+def test_question_stats_are_keyed_by_chapter_with_prefetch(local, monkeypatch):
+    monkeypatch.setenv("QUIZ_PREFETCH", "true")
+    monkeypatch.setenv("STATS_TABLE", "QuizStats")
+    monkeypatch.setenv("STATS_FLUSH_ITEMS", "10")
+    counter = question_stats.StatsCounter(question_stats.send_update)
+    monkeypatch.setattr(question_stats, "counter", counter)
+    local.create_table("QuizStats", "chapter_code", "id")
+    play("quiz_b_5.json")
+
+    assert counter.updates == 5
+    stats = local.items("QuizStats")
+    assert sum(item["attempts"] for item in stats) == 5
+    assert {item["chapter_code"] for item in stats} == {"B"}
+
+
+@pytest.fixture()
+def bundle(monkeypatch, tmp_path):
+    path = str(tmp_path / "quiz_bundle.bin")
+    quizset = os.path.join(ROOT_DIR, "..", "dynamodb", "quizset")
+    quiz_bundle.build(
+        [
+            item
+            for name in ("quiz1.json", "quiz2.json", "quiz3.json")
+            for item in quiz_bundle.load_quizset(os.path.join(quizset, name))
+        ],
+        path,
+    )
+    monkeypatch.setenv("QUIZ_BUNDLE_PATH", path)
+    yield path
+    quiz_bundle.reset()
+
+
+def test_bundle_backend_reads_nothing_from_dynamodb(local, bundle, monkeypatch):
+    monkeypatch.setenv("QUIZ_BACKEND", "bundle,dynamodb")
+
+    session, responses = play("quiz_b_5.json")
+
+    assert "5問" in responses[-1]["messages"][0]["content"]
+    assert not local.calls
+
+
+def test_bundle_is_fallback_when_dynamodb_fails(local, bundle, monkeypatch):
+    monkeypatch.setenv("QUIZ_BACKEND", "dynamodb,bundle")
+    monkeypatch.setenv("DYNAMODB_TABLE", "MissingTable")
+
+    session, responses = play("quiz_a_3.json")
+
+    assert "3問" in responses[-1]["messages"][0]["content"]
+    assert local.calls
+
+
+def test_file_backend_runs_offline(local, monkeypatch):
+    quizset = os.path.join(ROOT_DIR, "..", "dynamodb", "quizset")
+    paths = [os.path.join(quizset, "quiz{}.json".format(i)) for i in (1, 2, 3)]
+    monkeypatch.setenv("QUIZ_BACKEND", "file")
+    monkeypatch.setenv("QUIZ_FILE_PATHS", os.pathsep.join(paths))
+    monkeypatch.setenv("QUIZ_LRU_SIZE", "16")
+
+    session, responses = play("quiz_c_7.json")
+
+    assert dialog_action(responses[-1])["type"] == "Close"
+    assert not local.calls
+    lru = quiz_repository.get_repository().stats()[0]
+    assert lru["name"] == "lru" and lru["misses"] == 7
+    quiz_repository.reset()
+
+
+def test_help_is_delegated_to_lex(local):
+    response = app.lambda_handler(
+        lex_event("Help", session_attributes={"userInfo": "太郎"}), None
+    )
+
+    assert dialog_action(response)["type"] == "Delegate"
+    assert response["sessionState"]["intent"]["name"] == "Help"
+    assert response["sessionState"]["sessionAttributes"] == {"userInfo": "太郎"}
+    assert not local.calls
+
+
+def test_error_closes_dialog(local, monkeypatch):
+    def broken(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(app, "fetch_quiz_set", broken)
+    event = lex_event(
+        "StartQuiz", session_attributes={"userInfo": "太郎", "chapterInfo": "~1A:3"}
+    )
+
+    response = app.lambda_handler(event, None)
+
+    assert dialog_action(response)["type"] == "Close"
+    assert response["sessionState"]["intent"]["state"] == "Failed"
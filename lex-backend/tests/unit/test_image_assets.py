@@ -0,0 +1,104 @@
+import json
+import os
+
+import click
+import pytest
+
+import image_assets
+from image_assets import ImageManifest
+
+BASE_URL = "https://example.com/thumbs/"
+
+
+@pytest.fixture()
+def images(tmp_path):
+    source = tmp_path / "images"
+    output = tmp_path / "thumbs"
+    source.mkdir()
+    output.mkdir()
+    (source / "108E021.jpg").write_bytes(b"jpeg-1")
+    (source / "108E022.png").write_bytes(b"png-2")
+    (source / "notes.txt").write_text("not an image")
+    return str(source), str(output)
+
+
+def test_variant_name_changes_with_source_and_settings():
+    name = image_assets.variant_name("108E021.jpg", "a" * 64, 640, 80)
+
+    assert image_assets.VARIANT.match(name).group("stem") == "108E021"
+    assert name == image_assets.variant_name("108E021.jpg", "a" * 64, 640, 80)
+    assert name != image_assets.variant_name("108E021.jpg", "b" * 64, 640, 80)
+    assert name != image_assets.variant_name("108E021.jpg", "a" * 64, 320, 80)
+    assert name != image_assets.variant_name("108E021.jpg", "a" * 64, 640, 70)
+
+
+def test_plan_skips_existing_variants_and_unchanged_hashes(images, monkeypatch):
+    source, output = images
+    manifest = ImageManifest(os.path.join(output, image_assets.MANIFEST_NAME))
+
+    tasks = image_assets.plan(source, output, manifest, 640, 80)
+    assert [(task[0], task[4]) for task in tasks] == [
+        ("108E021.jpg", True),
+        ("108E022.png", True),
+    ]
+
+    for name, stat, digest, file, _ in tasks:
+        manifest.update(name, stat, digest, file)
+    open(os.path.join(output, tasks[0][3]), "wb").close()
+    hashed = []
+    monkeypatch.setattr(
+        image_assets, "source_hash", lambda path: hashed.append(path) or "0" * 64
+    )
+
+    again = image_assets.plan(source, output, manifest, 640, 80)
+    # サイズ・更新時刻が同じなら読み直さず、派生ファイルがあれば作らない
+    assert hashed == []
+    assert [task[3] for task in again] == [task[3] for task in tasks]
+    assert [task[4] for task in again] == [False, True]
+
+
+def test_plan_rejects_sources_sharing_a_stem(images):
+    source, output = images
+    with open(os.path.join(source, "108E021.png"), "wb") as f:
+        f.write(b"png-1")
+    manifest = ImageManifest(os.path.join(output, image_assets.MANIFEST_NAME))
+
+    with pytest.raises(click.ClickException, match="108E021.jpg / 108E021.png"):
+        image_assets.plan(source, output, manifest, 640, 80)
+
+
+def test_rewrite_image_url():
+    files = {"108E021.jpg": "108E021.0123456789ab.jpg"}
+    old = "https://cdn.example.com/thumbs/108E021.ba9876543210.jpg"
+
+    assert (
+        image_assets.rewrite_image_url("s3://bucket/108E021.jpg", files, BASE_URL)
+        == BASE_URL + "108E021.0123456789ab.jpg"
+    )
+    assert (
+        image_assets.rewrite_image_url(old, files, BASE_URL)
+        == BASE_URL + "108E021.0123456789ab.jpg"
+    )
+    unknown = "https://example.com/other.jpg"
+    assert image_assets.rewrite_image_url(unknown, files, BASE_URL) == unknown
+
+
+def test_rewrite_quizset_keeps_formatting(tmp_path):
+    path = tmp_path / "quiz.json"
+    text = (
+        '[\n  {"id": 1, "image": "https://old/108E021.jpg", "q": "これは？"},\n'
+        '  {"id": 2, "image": "https://old/other.jpg"}\n]\n'
+    )
+    path.write_text(text, encoding="utf-8")
+    files = {"108E021.jpg": "108E021.0123456789ab.jpg"}
+
+    assert image_assets.rewrite_quizset(str(path), files, BASE_URL, dry_run=True) == 1
+    assert path.read_text(encoding="utf-8") == text
+
+    assert image_assets.rewrite_quizset(str(path), files, BASE_URL) == 1
+    assert path.read_text(encoding="utf-8") == text.replace(
+        "https://old/108E021.jpg", BASE_URL + "108E021.0123456789ab.jpg"
+    )
+    assert json.loads(path.read_text(encoding="utf-8"))[1]["image"] == (
+        "https://old/other.jpg"
+    )
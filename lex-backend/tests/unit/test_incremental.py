@@ -0,0 +1,153 @@
+from decimal import Decimal
+
+import boto3
+import click
+import pytest
+
+from benchmarks.local_dynamodb import LocalDynamoDB
+
+from incremental import (
+    HASH_ATTRIBUTE,
+    IncrementalPlan,
+    ManifestHashes,
+    StoredHashes,
+    content_hash,
+)
+
+TABLE = "QuizTable"
+
+
+class Previous:
+    def __init__(self, hashes):
+        self.hashes = hashes
+
+    def chapter(self, chapter_code):
+        return self.hashes.get(chapter_code, {})
+
+    def chapters(self):
+        return list(self.hashes)
+
+
+class Deletes:
+    def __init__(self):
+        self.keys = []
+
+    def delete(self, key):
+        self.keys.append((key["chapter_code"], key["id"]))
+
+
+def quiz(q_id, q="問題", chapter_code="A", **attributes):
+    return dict(chapter_code=chapter_code, id=q_id, q=q, **attributes)
+
+
+def test_content_hash_is_stable():
+    item = {"chapter_code": "A", "id": 1, "a": ["はい"], "tags": {"x", "y"}, "n": 1}
+    same = {"n": Decimal("1.0"), "tags": {"y", "x"}, "a": ["はい"], "id": 1}
+    same["chapter_code"] = "A"
+
+    assert content_hash(item) == content_hash(same)
+    assert content_hash(item) == content_hash(dict(item, **{HASH_ATTRIBUTE: "old"}))
+    assert content_hash(item) != content_hash(dict(item, a=["いいえ"]))
+    assert content_hash(item) != content_hash(dict(item, n="1"))
+    assert len(content_hash(item)) == 64
+
+
+def test_check_writes_only_added_and_changed_items():
+    previous = Previous({"A": {1: content_hash(quiz(1)), 2: content_hash(quiz(2))}})
+    plan = IncrementalPlan(previous)
+
+    written = list(plan.select([quiz(1), quiz(2, "変更"), quiz(3)]))
+
+    assert [item["id"] for item in written] == [2, 3]
+    assert written[0][HASH_ATTRIBUTE] == content_hash(quiz(2, "変更"))
+    assert plan.unchanged == {("A", 1)}
+    assert plan.changed == {("A", 2)}
+    assert plan.added == {("A", 3)}
+
+
+def test_scan_skips_items_overwritten_by_a_later_file():
+    plan = IncrementalPlan(Previous({}))
+    first, second = [quiz(1, "古い"), quiz(2)], [quiz(1, "新しい")]
+    plan.scan(first + second)
+
+    written = [item for item in map(plan.check, first + second) if item is not None]
+
+    assert [(item["id"], item["q"]) for item in written] == [(2, "問題"), (1, "新しい")]
+
+
+def test_delete_removed():
+    previous = Previous({"A": {1: "h1", 2: "h2", 3: "h3"}, "B": {11: "h11"}})
+    plan = IncrementalPlan(previous)
+    list(plan.select([quiz(1), quiz(3)]))
+
+    writer = Deletes()
+    assert plan.delete_removed(writer, delete=False) == {}
+    assert writer.keys == []
+    # 入力にないB章は消さない
+    assert plan.removed_keys == [("A", 2)]
+
+    assert plan.delete_removed(writer, delete=True) == {"A": [2]}
+    assert writer.keys == [("A", 2)]
+
+
+def test_manifest_keeps_chapters_missing_from_the_input(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    plan = IncrementalPlan(ManifestHashes(path, TABLE))
+    list(plan.select([quiz(q_id, chapter_code="B") for q_id in range(11, 18)]))
+    plan.save({})
+
+    # 1章分のファイルだけを --delete-missing で取り込む
+    plan = IncrementalPlan(ManifestHashes(path, TABLE))
+    list(plan.select([quiz(1)]))
+    writer = Deletes()
+    deleted = plan.delete_removed(writer, delete=True)
+    plan.save(deleted)
+
+    assert deleted == {}
+    assert writer.keys == []
+    assert set(ManifestHashes(path, TABLE).hashes) == {"A", "B"}
+    assert len(ManifestHashes(path, TABLE).hashes["B"]) == 7
+
+
+def test_manifest_round_trip(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = ManifestHashes(path, TABLE)
+    plan = IncrementalPlan(manifest)
+    list(plan.select([quiz(1), quiz(2), quiz(11, chapter_code="B")]))
+    plan.save({})
+
+    plan = IncrementalPlan(ManifestHashes(path, TABLE))
+    assert list(plan.select([quiz(1), quiz(2, "変更")]))[0]["id"] == 2
+    plan.save(plan.delete_removed(Deletes(), delete=True))
+
+    assert ManifestHashes(path, TABLE).hashes == {
+        "A": {1: content_hash(quiz(1)), 2: content_hash(quiz(2, "変更"))},
+        "B": {11: content_hash(quiz(11, chapter_code="B"))},
+    }
+    with pytest.raises(click.ClickException):
+        ManifestHashes(path, "OtherTable")
+
+
+def test_stored_hashes_are_queried_once_per_chapter(monkeypatch):
+    monkeypatch.setenv("DYNAMODB_TABLE", TABLE)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "local")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "local")
+    local = LocalDynamoDB(page_items=1)
+    local.put(TABLE, {"chapter_code": "A", "id": 0, "version": 3})
+    local.put(TABLE, dict(quiz(1), **{HASH_ATTRIBUTE: content_hash(quiz(1))}))
+    local.put(TABLE, quiz(2))
+    resource = boto3.resource("dynamodb", region_name="us-east-1")
+    local.attach(resource.meta.client)
+    stored = StoredHashes(resource.Table(TABLE))
+
+    plan = IncrementalPlan(stored)
+    written = list(plan.select([quiz(1), quiz(2), quiz(1, chapter_code="B")]))
+
+    # content_hash のない問題は変わったものとして書き込む
+    assert [(item["chapter_code"], item["id"]) for item in written] == [
+        ("A", 2),
+        ("B", 1),
+    ]
+    assert stored.hashes["A"] == {1: content_hash(quiz(1)), 2: None}
+    # A章は2ページ、B章は1ページ。同じ章を読み直さない
+    assert local.calls["Query"] == 3
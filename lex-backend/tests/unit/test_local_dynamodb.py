@@ -0,0 +1,111 @@
+from decimal import Decimal
+
+import pytest
+
+from benchmarks.local_dynamodb import LocalDynamoDB
+
+import dynamo
+
+
+@pytest.fixture()
+def local(monkeypatch):
+    monkeypatch.setenv("DYNAMODB_TABLE", "QuizTable")
+    monkeypatch.setenv("REGION_NAME", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "local")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "local")
+    local = LocalDynamoDB().install()
+    yield local
+    local.uninstall()
+
+
+def test_put_get_and_conditional_put(local):
+    from botocore.exceptions import ClientError
+
+    table = dynamo.get_table()
+    table.put_item(Item={"chapter_code": "A", "id": 1, "q": "q1"})
+    with pytest.raises(ClientError) as e:
+        table.put_item(
+            Item={"chapter_code": "A", "id": 1, "q": "other"},
+            ConditionExpression="attribute_not_exists(id)",
+        )
+
+    assert e.value.response["Error"]["Code"] == "ConditionalCheckFailedException"
+    item = table.get_item(Key={"chapter_code": "A", "id": 1})["Item"]
+    assert item["q"] == "q1"
+    assert local.calls == {"PutItem": 2, "GetItem": 1}
+    assert local.reads() == 1
+    assert local.writes() == 2
+
+
+def test_update_expressions(local):
+    table = dynamo.get_table()
+    key = {"chapter_code": "A", "id": 0}
+    table.update_item(
+        Key=key,
+        UpdateExpression="ADD version :one, ids :ids SET #n = if_not_exists(#n, :n)",
+        ExpressionAttributeNames={"#n": "name"},
+        ExpressionAttributeValues={":one": 1, ":ids": {1, 2}, ":n": "first"},
+    )
+    response = table.update_item(
+        Key=key,
+        UpdateExpression=(
+            "SET #n = if_not_exists(#n, :n), total = :zero + :one "
+            "ADD version :one DELETE ids :gone"
+        ),
+        ExpressionAttributeNames={"#n": "name"},
+        ExpressionAttributeValues={
+            ":one": 1,
+            ":zero": 0,
+            ":n": "second",
+            ":gone": {1},
+        },
+        ReturnValues="ALL_NEW",
+    )
+
+    assert response["Attributes"] == {
+        "chapter_code": "A",
+        "id": 0,
+        "name": "first",
+        "total": 1,
+        "version": 2,
+        "ids": {Decimal(2)},
+    }
+
+
+def test_batch_write_and_delete(local):
+    table = dynamo.get_table()
+    with table.batch_writer() as batch:
+        for q_id in range(1, 4):
+            batch.put_item(Item={"chapter_code": "B", "id": q_id})
+    table.delete_item(Key={"chapter_code": "B", "id": 2})
+
+    assert [item["id"] for item in local.items("QuizTable")] == [1, 3]
+    assert local.calls == {"BatchWriteItem": 1, "DeleteItem": 1}
+    assert local.consumed["write"] == 4
+
+
+def test_read_capacity_is_half_unit_per_4kb(local):
+    local.put("QuizTable", {"chapter_code": "C", "id": 1, "q": "x" * 5000})
+    table = dynamo.get_table()
+    table.get_item(Key={"chapter_code": "C", "id": 1})
+    table.get_item(Key={"chapter_code": "C", "id": 1}, ConsistentRead=True)
+
+    assert local.consumed["read"] == 1 + 2
+
+
+def test_batch_write_over_capacity_is_left_unprocessed(local):
+    local.write_capacity = 2
+    local.clock = lambda: 0.0
+    client = dynamo.get_resource().meta.client
+    requests = [
+        {"PutRequest": {"Item": {"chapter_code": "A", "id": q_id}}}
+        for q_id in range(1, 4)
+    ]
+
+    response = client.batch_write_item(
+        RequestItems={"QuizTable": requests}, ReturnConsumedCapacity="TOTAL"
+    )
+
+    assert response["UnprocessedItems"]["QuizTable"] == requests[2:]
+    assert response["ConsumedCapacity"][0]["CapacityUnits"] == 2
+    assert local.throttled == {"BatchWriteItem": 1}
@@ -0,0 +1,45 @@
+import json
+
+import metrics
+
+
+def test_disabled_timer_does_nothing(monkeypatch):
+    monkeypatch.delenv("METRICS_ENABLED", raising=False)
+    lines = []
+    started = metrics.begin()
+    with metrics.timer("set_quiz"):
+        pass
+
+    assert metrics.timer("set_quiz") is metrics.timer("other")
+    assert metrics.end(started, "StartQuiz", lines.append) is None
+    assert lines == []
+
+
+def test_one_emf_line_per_turn(monkeypatch):
+    monkeypatch.setenv("METRICS_ENABLED", "true")
+    monkeypatch.setenv("METRICS_NAMESPACE", "Test")
+
+    @metrics.timed("set_quiz")
+    def set_quiz():
+        with metrics.timer("convert"):
+            return 1
+
+    lines = []
+    started = metrics.begin()
+    set_quiz()
+    set_quiz()
+    metrics.end(started, "StartQuiz", lines.append)
+    (line,) = lines
+    document = json.loads(line)
+
+    (directive,) = document["_aws"]["CloudWatchMetrics"]
+    assert directive["Namespace"] == "Test"
+    assert directive["Dimensions"] == [["Intent"]]
+    assert [m["Name"] for m in directive["Metrics"]] == ["convert", "set_quiz", "total"]
+    assert document["Intent"] == "StartQuiz"
+    assert len(document["set_quiz"]) == 2
+    assert document["convert"][0] <= document["set_quiz"][0]
+    assert document["total"][0] >= sum(document["set_quiz"])
+
+    # ターンが終わったら計測しない
+    assert metrics.timer("set_quiz") is metrics.timer("other")
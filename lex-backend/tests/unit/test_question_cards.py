@@ -0,0 +1,69 @@
+import question_cards
+
+CHOICE = {"chapter_code": "A", "id": 1, "kind": "ChoiceBool", "q": "胃は臓器？"}
+IMAGE = {
+    "chapter_code": "A",
+    "id": 2,
+    "kind": "Image",
+    "q": "これは？",
+    "image": "x.png",
+}
+
+
+def test_choice_card_matches_previous_format():
+    card = question_cards.question_card(CHOICE, "ヒント", 0)
+
+    assert card == {
+        "contentType": "ImageResponseCard",
+        "content": "第1問：胃は臓器？",
+        "imageResponseCard": {
+            "title": "第1問：胃は臓器？",
+            "subtitle": "ヒント",
+            "imageUrl": None,
+            "buttons": (
+                {"text": "うん!!", "value": "はい"},
+                {"text": "ちがう！！", "value": "いいえ"},
+            ),
+        },
+    }
+
+
+def test_image_card_and_unknown_kind():
+    card = question_cards.question_card(IMAGE, None, 2)
+
+    assert card["content"] == "第3問：これは？"
+    assert card["imageResponseCard"]["imageUrl"] == "x.png"
+    assert card["imageResponseCard"]["buttons"] is None
+    assert question_cards.question_card(dict(CHOICE, id=3, kind="Other"), "", 0) == ""
+
+
+def test_template_is_reused_until_the_question_changes():
+    first = question_cards.template(CHOICE)
+    assert question_cards.template(dict(CHOICE)) is first
+    assert question_cards.question_label(CHOICE, 1) is first.label(1)
+
+    changed = question_cards.template(dict(CHOICE, q="肝臓は臓器？"))
+    assert changed is not first
+    assert changed.label(0) == "第1問：肝臓は臓器？"
+
+
+def test_question_without_chapter_is_not_cached():
+    question_cards.clear()
+    anonymous = dict(CHOICE, chapter_code=None)
+    question_cards.template(anonymous)
+
+    assert question_cards.template(CHOICE).item is CHOICE
+    assert question_cards.template(dict(IMAGE, chapter_code=None, id=1)).image_url
+    assert len(question_cards._templates) == 1
+
+
+def test_options_are_shared_and_limited_to_five():
+    assert question_cards.options("ChapterCode") is question_cards.options(
+        "ChapterCode"
+    )
+    assert question_cards.options("Unknown") is question_cards.DEFAULT_OPTIONS
+
+    options = question_cards.options("QuestionNum")
+    assert question_cards.limit_buttons(options) is options
+    assert len(question_cards.limit_buttons([{"text": str(i)} for i in range(7)])) == 5
+    assert question_cards.limit_buttons(None) is None
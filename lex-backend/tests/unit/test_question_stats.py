@@ -0,0 +1,156 @@
+from collections import Counter
+
+import pytest
+from botocore.exceptions import ClientError
+
+from benchmarks.local_dynamodb import LocalDynamoDB
+
+import answer_matcher
+import question_stats
+from question_stats import StatsCache, StatsCounter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSend:
+    def __init__(self):
+        self.updates = []
+        self.fail_at = None
+
+    def __call__(self, chapter_code, q_id, counts):
+        if self.fail_at == len(self.updates):
+            self.fail_at = None
+            raise RuntimeError("timeout")
+        self.updates.append((chapter_code, q_id, dict(counts)))
+
+
+def test_increments():
+    assert question_stats.increments(answer_matcher.NEAR_MISS) == {
+        "attempts": 1,
+        "correct": 0,
+        "near_miss": 1,
+    }
+
+
+def test_increments_are_coalesced_until_size_trigger():
+    send = FakeSend()
+    counter = StatsCounter(send, max_items=2, interval=60, clock=Clock())
+    for _ in range(3):
+        counter.add("A", 1, {"attempts": 1, "correct": 1})
+        assert counter.maybe_flush() == 0
+
+    counter.add("A", 2, {"attempts": 1})
+    assert counter.maybe_flush() == 2
+    assert send.updates == [
+        ("A", 1, {"attempts": 3, "correct": 3}),
+        ("A", 2, {"attempts": 1}),
+    ]
+    assert len(counter) == 0
+
+
+def test_time_trigger():
+    clock = Clock()
+    send = FakeSend()
+    counter = StatsCounter(send, max_items=100, interval=30, clock=clock)
+    counter.add("A", 1, {"attempts": 1})
+    clock.now = 29
+    assert counter.maybe_flush() == 0
+    clock.now = 30
+    assert counter.maybe_flush() == 1
+
+
+def test_failed_updates_are_kept_for_the_next_flush():
+    send = FakeSend()
+    send.fail_at = 1
+    counter = StatsCounter(send, max_items=100, interval=60, clock=Clock())
+    counter.add("A", 1, {"attempts": 1})
+    counter.add("A", 2, {"attempts": 1})
+    counter.add("A", 3, {"attempts": 1})
+
+    assert counter.flush() == 1
+    counter.add("A", 2, {"attempts": 1})
+    assert counter.flush() == 2
+    assert send.updates == [
+        ("A", 1, {"attempts": 1}),
+        ("A", 2, {"attempts": 2}),
+        ("A", 3, {"attempts": 1}),
+    ]
+
+
+def test_malformed_keys_are_dropped_not_requeued():
+    send = FakeSend()
+    counter = StatsCounter(send, max_items=100, interval=60, clock=Clock())
+    counter.add(None, 1, {"attempts": 1})
+    counter.add("", 2, {"attempts": 1})
+    assert len(counter) == 0
+
+    def invalid(chapter_code, q_id, counts):
+        if q_id == 1:
+            raise ClientError(
+                {"Error": {"Code": "ValidationException", "Message": "bad key"}},
+                "UpdateItem",
+            )
+        send(chapter_code, q_id, counts)
+
+    counter = StatsCounter(invalid, max_items=100, interval=60, clock=Clock())
+    counter.add("A", 1, {"attempts": 1})
+    counter.add("A", 2, {"attempts": 1})
+    assert counter.flush() == 1
+    assert len(counter) == 0
+    assert send.updates == [("A", 2, {"attempts": 1})]
+
+
+def test_cache_serves_reads_within_ttl():
+    clock = Clock()
+    loads = []
+    cache = StatsCache(lambda code: loads.append(code) or {}, ttl=10, clock=clock)
+    cache.get("A")
+    clock.now = 9
+    cache.get("A")
+    clock.now = 10
+    cache.get("A")
+
+    assert loads == ["A", "A"]
+
+
+@pytest.fixture()
+def local(monkeypatch):
+    monkeypatch.setenv("STATS_TABLE", "QuizStats")
+    monkeypatch.setenv("REGION_NAME", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "local")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "local")
+    local = LocalDynamoDB().install()
+    local.create_table("QuizStats", "chapter_code", "id")
+    monkeypatch.setattr(
+        question_stats, "cache", StatsCache(question_stats.load_chapter)
+    )
+    yield local
+    local.uninstall()
+
+
+def test_containers_add_to_the_same_counters(local, monkeypatch):
+    containers = [StatsCounter(question_stats.send_update) for _ in range(3)]
+    for i, counter in enumerate(containers):
+        counter.add("A", 1, {"attempts": 2, "correct": i})
+        counter.add("A", 2, {"attempts": 1, "near_miss": 1})
+        counter.flush()
+
+    assert local.calls == {"UpdateItem": 6}
+    monkeypatch.setattr(
+        question_stats, "counter", StatsCounter(question_stats.send_update)
+    )
+    question_stats.counter.add("A", 2, {"attempts": 1})
+    stats = question_stats.chapter_stats("A")
+    question_stats.chapter_stats("A")
+
+    assert stats == {
+        1: Counter(attempts=6, correct=3),
+        2: Counter(attempts=4, near_miss=3),
+    }
+    assert local.calls["Query"] == 1
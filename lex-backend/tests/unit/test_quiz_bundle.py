@@ -0,0 +1,81 @@
+import json
+import os
+
+import pytest
+
+import quiz_bundle
+
+QUIZSET = os.path.join(
+    os.path.dirname(__file__), "..", "..", "..", "dynamodb", "quizset", "quiz1.json"
+)
+
+
+@pytest.fixture()
+def items():
+    with open(QUIZSET) as f:
+        return json.load(f)
+
+
+@pytest.fixture()
+def path(tmp_path):
+    return str(tmp_path / "quiz_bundle.bin")
+
+
+def test_round_trip(items, path):
+    version = quiz_bundle.build(items, path)
+    bundle = quiz_bundle.QuizBundle(path)
+
+    assert bundle.version == version
+    assert bundle.chapters() == ["A"]
+    assert bundle.ids("A") == sorted(item["id"] for item in items)
+    for item in items:
+        assert bundle.get("A", item["id"]) == item
+        assert bundle.get("A", str(item["id"])) == item
+    bundle.close()
+
+
+def test_missing_chapter_or_id(items, path):
+    quiz_bundle.build(items + [{"chapter_code": "A", "id": 0, "version": 1}], path)
+    bundle = quiz_bundle.QuizBundle(path)
+
+    assert "Z" not in bundle
+    assert bundle.ids("Z") == []
+    assert bundle.get("Z", 1) is None
+    assert bundle.get("A", 0) is None
+    assert bundle.get("A", 999) is None
+    bundle.close()
+
+
+def test_later_item_wins_and_version_follows_content(items, path):
+    first = quiz_bundle.build(items, path)
+    changed = dict(items[0], comment="書き換え")
+    second = quiz_bundle.build(items + [changed], path)
+    bundle = quiz_bundle.QuizBundle(path)
+
+    assert first != second
+    assert bundle.get("A", changed["id"])["comment"] == "書き換え"
+    assert len(bundle.ids("A")) == len(items)
+    bundle.close()
+
+
+def test_rejects_other_files(path):
+    with open(path, "wb") as f:
+        f.write(b"not a bundle")
+
+    with pytest.raises(ValueError):
+        quiz_bundle.QuizBundle(path)
+
+
+def test_backends(monkeypatch):
+    monkeypatch.delenv("QUIZ_BACKEND", raising=False)
+    assert quiz_bundle.backends() == ["dynamodb"]
+
+    monkeypatch.setenv("QUIZ_BACKEND", " Bundle, dynamodb ")
+    assert quiz_bundle.backends() == ["bundle", "dynamodb"]
+
+
+def test_get_bundle_without_file(monkeypatch, path):
+    monkeypatch.setenv("QUIZ_BUNDLE_PATH", path)
+
+    assert quiz_bundle.get_bundle() is None
+    quiz_bundle.reset()
@@ -0,0 +1,119 @@
+import pytest
+
+from quiz_cache import META_ID, ChapterCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSource:
+    def __init__(self):
+        self.version = 1
+        self.items = {
+            "A": [{"id": META_ID}, {"id": 1, "q": "q1"}, {"id": 2, "q": "q2"}]
+        }
+        self.chapter_loads = 0
+        self.version_loads = 0
+
+    def load_chapter(self, chapter_code):
+        self.chapter_loads += 1
+        return [dict(item) for item in self.items[chapter_code]]
+
+    def load_version(self, chapter_code):
+        self.version_loads += 1
+        return self.version
+
+
+@pytest.fixture()
+def source():
+    return FakeSource()
+
+
+@pytest.fixture()
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture()
+def cache(source, clock):
+    return ChapterCache(source.load_chapter, source.load_version, ttl=10, clock=clock)
+
+
+def test_chapter_is_loaded_once_within_ttl(cache, source, clock):
+    assert sorted(cache.get_chapter("A")) == [1, 2]
+    clock.now = 5
+    assert cache.get_item("A", 2)["q"] == "q2"
+    assert source.chapter_loads == 1
+    assert source.version_loads == 1
+
+
+def test_expired_entry_is_kept_when_version_unchanged(cache, source, clock):
+    cache.get_chapter("A")
+    clock.now = 11
+    cache.get_chapter("A")
+    clock.now = 15
+    cache.get_chapter("A")
+
+    assert source.chapter_loads == 1
+    assert source.version_loads == 2
+
+
+def test_version_bump_reloads_chapter(cache, source, clock):
+    cache.get_chapter("A")
+    source.items["A"][1]["q"] = "updated"
+    source.version = 2
+    clock.now = 11
+
+    assert cache.get_item("A", 1)["q"] == "updated"
+    assert source.chapter_loads == 2
+
+
+def test_subscribers_hear_about_version_changes(cache, source, clock):
+    changed = []
+    cache.subscribe(changed.append)
+    cache.get_chapter("A")
+    clock.now = 11
+    cache.get_chapter("A")
+    assert changed == []
+
+    source.version = 2
+    clock.now = 22
+    cache.get_chapter("A")
+    cache.invalidate()
+    assert changed == ["A", None]
+
+
+def test_missing_version_item_reloads_after_ttl(cache, source, clock):
+    source.version = None
+    cache.get_chapter("A")
+    clock.now = 11
+    cache.get_chapter("A")
+
+    assert source.chapter_loads == 2
+
+
+def test_unknown_id_reloads_only_after_version_change(cache, source):
+    cache.get_chapter("A")
+    source.items["A"].append({"id": 3, "q": "q3"})
+    source.version = 2
+
+    assert cache.get_item("A", 3)["q"] == "q3"
+    assert source.chapter_loads == 2
+
+
+def test_missing_id_is_remembered_until_version_changes(cache, source):
+    cache.get_chapter("A")
+    for _ in range(3):
+        assert cache.get_item("A", 99) is None
+    assert source.chapter_loads == 1
+    assert source.version_loads == 2
+
+    source.items["A"].append({"id": 99, "q": "q99"})
+    source.version = 2
+    cache.invalidate("A")
+    assert cache.get_item("A", 99)["q"] == "q99"
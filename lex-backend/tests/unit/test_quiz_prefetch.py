@@ -0,0 +1,55 @@
+import json
+import os
+
+import pytest
+
+import quiz_prefetch
+
+QUIZSET = os.path.join(
+    os.path.dirname(__file__), "..", "..", "..", "dynamodb", "quizset", "quiz1.json"
+)
+
+
+@pytest.fixture()
+def items():
+    with open(QUIZSET) as f:
+        return json.load(f)
+
+
+def test_round_trip_keeps_only_needed_fields(items):
+    decoded = quiz_prefetch.decode_items(quiz_prefetch.encode_items(items))
+
+    assert sorted(decoded) == [item["id"] for item in items]
+    for item in items:
+        expected = {k: v for k, v in item.items() if k in quiz_prefetch.FIELDS}
+        assert decoded[item["id"]] == expected
+
+
+def test_old_payload_gets_chapter_code(items, monkeypatch):
+    monkeypatch.setattr(quiz_prefetch, "FIELDS", quiz_prefetch.FIELDS[:-1])
+    payload = quiz_prefetch.encode_items(items)
+    monkeypatch.undo()
+
+    decoded = quiz_prefetch.decode_items(payload, "A")
+    assert {item["chapter_code"] for item in decoded.values()} == {"A"}
+
+
+def test_payload_is_compressed(items):
+    payload = quiz_prefetch.encode_items(items)
+    raw = json.dumps(items, ensure_ascii=False)
+
+    assert len(payload) < len(raw.encode("utf-8"))
+
+
+def test_decode_tolerates_missing_or_broken_payload():
+    assert quiz_prefetch.decode_items(None) == {}
+    assert quiz_prefetch.decode_items("not-base64!") == {}
+
+
+def test_fits_respects_session_limit(monkeypatch, items):
+    payload = quiz_prefetch.encode_items(items)
+    session = {"userInfo": "匿名", "examState": "{}"}
+
+    assert quiz_prefetch.fits(session, payload)
+    monkeypatch.setenv("SESSION_ATTRIBUTES_MAX_BYTES", str(len(payload)))
+    assert not quiz_prefetch.fits(session, payload)
@@ -0,0 +1,200 @@
+import glob
+import os
+
+import pytest
+
+from benchmarks.local_dynamodb import LocalDynamoDB
+
+import quiz_repository
+from quiz_repository import (
+    FallbackRepository,
+    LRURepository,
+    MemoryRepository,
+    QuizRepository,
+)
+
+QUIZSET_DIR = os.path.join(
+    os.path.dirname(__file__), "..", "..", "..", "dynamodb", "quizset"
+)
+QUIZSETS = sorted(glob.glob(os.path.join(QUIZSET_DIR, "*.json")))
+
+
+@pytest.fixture()
+def memory():
+    return MemoryRepository.from_files(QUIZSETS)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Broken(QuizRepository):
+    name = "broken"
+
+    def ids(self, chapter_code):
+        raise RuntimeError("down")
+
+    def sample_ids(self, chapter_code, k):
+        raise RuntimeError("down")
+
+    def get_item(self, chapter_code, q_id):
+        raise RuntimeError("down")
+
+
+def test_memory_repository(memory):
+    ids = memory.sample_ids("A", 3)
+
+    assert len(set(ids)) == 3
+    assert memory.get_item("A", ids[0])["id"] == ids[0]
+    assert memory.get_item("A", str(ids[0]))["id"] == ids[0]
+    assert memory.get_item("Z", 1) is None
+    assert [item["id"] for item in memory.batch_get("A", [3, 99, 1])] == [3, 1]
+    assert memory.stats()[0]["hits"] == 4
+
+
+def test_lru_evicts_least_recently_used(memory):
+    lru = LRURepository(memory, max_items=2)
+
+    lru.get_item("A", 1)
+    lru.get_item("A", 2)
+    lru.get_item("A", 1)
+    lru.get_item("A", 3)  # 2が捨てられる
+    lru.get_item("A", 1)
+    lru.get_item("A", 2)
+
+    assert len(lru) == 2
+    assert [s["name"] for s in lru.stats()] == ["lru", "memory"]
+    outer, inner = lru.stats()
+    assert (outer["hits"], outer["misses"]) == (2, 4)
+    assert inner["hits"] == 4
+    assert outer["hit_rate"] == pytest.approx(2 / 6)
+
+
+def test_lru_batch_get_reads_only_missing_items(memory):
+    lru = LRURepository(memory, max_items=10)
+    lru.get_item("A", 2)
+
+    items = lru.batch_get("A", [3, 2, 1])
+
+    assert [item["id"] for item in items] == [3, 2, 1]
+    assert memory.hits == 3
+    assert lru.hits == 1
+
+
+def test_lru_entries_expire_and_are_dropped_per_chapter(memory):
+    clock = FakeClock()
+    lru = LRURepository(memory, max_items=10, ttl=10, clock=clock)
+    lru.get_item("A", 1)
+    lru.get_item("B", 11)
+    clock.now = 5
+    lru.get_item("A", 1)
+    assert lru.hits == 1
+
+    lru.invalidate("A")
+    assert len(lru) == 1
+    clock.now = 10
+    lru.get_item("B", 11)
+    assert lru.hits == 1
+    assert memory.hits == 3
+
+
+def test_lru_is_dropped_when_chapter_version_changes(monkeypatch):
+    monkeypatch.setenv("QUIZ_BACKEND", "dynamodb")
+    monkeypatch.setenv("QUIZ_LRU_SIZE", "5")
+    quiz_repository.reset()
+    lru = quiz_repository.get_repository()
+    lru._store(("A", 1), {"id": 1})
+    lru._store(("B", 11), {"id": 11})
+
+    quiz_repository.dynamodb_repository.chapter_cache.invalidate("A")
+
+    assert list(lru._items) == [("B", 11)]
+    quiz_repository.reset()
+
+
+def test_fallback_skips_failing_and_empty_repositories(memory):
+    repository = FallbackRepository([Broken(), MemoryRepository(), memory])
+
+    assert len(repository.sample_ids("B", 2)) == 2
+    assert repository.get_item("B", 11)["chapter_code"] == "B"
+    assert [s["name"] for s in repository.stats()] == ["broken", "memory", "memory"]
+
+
+def test_fallback_batch_get_fills_missing_items(memory):
+    partial = MemoryRepository(
+        item for item in memory.batch_get("A", [1, 2]) if item["id"] == 2
+    )
+    repository = FallbackRepository([Broken(), partial, memory])
+
+    items = repository.batch_get("A", [3, 2, 1])
+
+    assert [item["id"] for item in items] == [3, 2, 1]
+    assert items[1] is partial.get_item("A", 2)
+    assert partial.misses == 2
+
+
+def test_fallback_raises_from_last_repository(memory):
+    repository = FallbackRepository([memory, Broken()])
+
+    with pytest.raises(RuntimeError):
+        repository.get_item("Z", 1)
+
+
+def test_get_repository_from_environment(monkeypatch):
+    monkeypatch.setenv("QUIZ_BACKEND", "file,dynamodb")
+    monkeypatch.setenv("QUIZ_FILE_PATHS", os.pathsep.join(QUIZSETS))
+    monkeypatch.setenv("QUIZ_LRU_SIZE", "5")
+
+    repository = quiz_repository.get_repository()
+
+    assert isinstance(repository, LRURepository)
+    assert repository is quiz_repository.get_repository()
+    assert [s["name"] for s in repository.stats()] == ["lru", "memory", "dynamodb"]
+    assert repository.get_item("C", 21)["chapter_code"] == "C"
+    quiz_repository.reset()
+
+
+def test_dynamodb_batch_get_gives_up_on_unprocessed_keys(monkeypatch):
+    monkeypatch.setenv("DYNAMODB_TABLE", "QuizTable")
+    monkeypatch.setenv("QUIZ_CACHE_ENABLED", "false")
+    monkeypatch.setattr(quiz_repository.time, "sleep", lambda seconds: None)
+    local = LocalDynamoDB().install()
+    local.seed_quizset()
+    batch_get_item = local._op_BatchGetItem
+
+    def throttled(params):
+        # 1件だけ返し、残りはずっと UnprocessedKeys にする
+        table, request = next(iter(params["RequestItems"].items()))
+        response = batch_get_item(
+            {"RequestItems": {table: {"Keys": request["Keys"][:1]}}}
+        )
+        if request["Keys"][1:]:
+            response["UnprocessedKeys"] = {table: {"Keys": request["Keys"][1:]}}
+        return response
+
+    monkeypatch.setattr(local, "_op_BatchGetItem", throttled)
+    try:
+        items = quiz_repository.DynamoDBRepository().batch_get("A", range(1, 8))
+    finally:
+        local.uninstall()
+
+    assert [item["id"] for item in items] == [1, 2, 3, 4, 5]
+    assert local.calls["BatchGetItem"] == quiz_repository.BATCH_GET_MAX_ATTEMPTS
+
+
+def test_repository_must_implement_reads():
+    class Partial(QuizRepository):
+        def get_item(self, chapter_code, q_id):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        quiz_repository.build_repository(["redis"])
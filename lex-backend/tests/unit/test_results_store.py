@@ -0,0 +1,111 @@
+import results_store
+from results_store import ResultsBuffer, build_result
+
+EXAM_STATE = {
+    "is_finished": True,
+    "max_num": 3,
+    "current_num": 3,
+    "q_list": ["3", "1", "2"],
+    "results": [
+        {"id": 3, "result": "correct"},
+        {"id": 1, "result": "incorrect"},
+        {"id": 2, "result": "correct"},
+    ],
+}
+
+
+def result(session_id, quiz_key="A:1"):
+    return {"session_id": session_id, "quiz_key": quiz_key}
+
+
+class FakeSend:
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+        self.unprocessed = 0
+
+    def __call__(self, items):
+        if self.fail:
+            raise RuntimeError("timeout")
+        self.batches.append(list(items))
+        return items[: self.unprocessed]
+
+
+def test_build_result():
+    item = build_result("s1", "太郎", "A", EXAM_STATE, now=1.5)
+
+    assert item["quiz_key"] == "A:3,1,2"
+    assert item["q_list"] == [3, 1, 2]
+    assert item["correct"] == [3, 2]
+    assert item["correct_num"] == 2
+    assert item["question_num"] == 3
+    assert item["finished_at"] == 1500
+
+
+def test_failed_results_are_sent_with_the_next_result():
+    send = FakeSend()
+    buffer = ResultsBuffer(send, max_items=10)
+    send.fail = True
+    buffer.add(result("s1"))
+
+    assert buffer.flush() == 0
+    assert len(buffer) == 1
+
+    send.fail = False
+    buffer.add(result("s2"))
+    assert buffer.flush() == 2
+    assert send.batches == [[result("s1"), result("s2")]]
+    assert len(buffer) == 0
+
+
+def test_unprocessed_items_stay_first():
+    send = FakeSend()
+    send.unprocessed = 1
+    buffer = ResultsBuffer(send, max_items=10)
+    buffer.add(result("s1"))
+    buffer.add(result("s2"))
+
+    assert buffer.flush() == 1
+    send.unprocessed = 0
+    buffer.add(result("s3"))
+    buffer.flush()
+
+    assert send.batches[1] == [result("s1"), result("s3")]
+
+
+def test_same_key_is_sent_once():
+    send = FakeSend()
+    buffer = ResultsBuffer(send, max_items=10)
+    buffer.add(dict(result("s1"), correct_num=1))
+    buffer.add(dict(result("s1"), correct_num=2))
+
+    buffer.flush()
+
+    assert send.batches == [[dict(result("s1"), correct_num=2)]]
+
+
+def test_buffer_is_bounded_and_batches_are_limited():
+    send = FakeSend()
+    buffer = ResultsBuffer(send, max_items=30)
+    for i in range(40):
+        buffer.add(result("s{}".format(i)))
+
+    assert buffer.dropped == 10
+    assert buffer.flush() == results_store.BATCH_WRITE_LIMIT
+    assert send.batches[0][0] == result("s10")
+    assert len(buffer) == 5
+
+
+def test_disabled_without_table(monkeypatch):
+    monkeypatch.delenv("RESULTS_TABLE", raising=False)
+    send = FakeSend()
+    monkeypatch.setattr(results_store, "results_buffer", ResultsBuffer(send))
+
+    assert results_store.save_result("s1", "太郎", "A", EXAM_STATE) == 0
+    assert not send.batches
+
+
+def test_buffer_size_from_environment(monkeypatch):
+    monkeypatch.setenv("RESULTS_BUFFER_MAX", "3")
+
+    assert ResultsBuffer(FakeSend()).max_items == 3
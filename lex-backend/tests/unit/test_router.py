@@ -0,0 +1,69 @@
+import pytest
+
+from router import Router, UnsupportedIntentError
+
+
+def intent_request(intent_name):
+    return {"sessionId": "s", "sessionState": {"intent": {"name": intent_name}}}
+
+
+def test_dispatches_by_intent_name():
+    router = Router()
+    router.add("Welcome", lambda request: "welcome")
+
+    @router.route("StartQuiz")
+    def start_quiz(request):
+        return "start"
+
+    assert router.dispatch(intent_request("Welcome")) == "welcome"
+    assert router.dispatch(intent_request("StartQuiz")) == "start"
+    assert router.intents() == ["StartQuiz", "Welcome"]
+
+
+def test_unknown_intent_uses_fallback_or_raises():
+    router = Router()
+    with pytest.raises(UnsupportedIntentError):
+        router.dispatch(intent_request("Help"))
+
+    router.fallback(lambda request: "fallback")
+    assert router.dispatch(intent_request("Help")) == "fallback"
+
+
+def test_middlewares_run_outside_in():
+    router = Router()
+    calls = []
+
+    def outer(request, call_next):
+        calls.append("outer")
+        return call_next(request) + "!"
+
+    def inner(request, call_next):
+        calls.append("inner")
+        return call_next(request).upper()
+
+    router.use(outer)
+    router.use(inner)
+    router.add("Welcome", lambda request: calls.append("handler") or "hi")
+
+    assert router.dispatch(intent_request("Welcome")) == "HI!"
+    assert calls == ["outer", "inner", "handler"]
+
+
+def test_records_handler_timings():
+    router = Router()
+    router.add("Welcome", lambda request: None)
+    router.dispatch(intent_request("Welcome"))
+    router.dispatch(intent_request("Welcome"))
+
+    count, total_ms, max_ms = router.timings["Welcome"]
+    assert count == 2
+    assert total_ms >= max_ms >= 0
+
+
+def test_unknown_intents_are_not_timed():
+    router = Router()
+    router.fallback(lambda request: "fallback")
+    for i in range(3):
+        router.dispatch(intent_request("Random{}".format(i)))
+
+    assert router.timings == {}
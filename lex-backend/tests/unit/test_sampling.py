@@ -0,0 +1,57 @@
+import random
+from collections import Counter
+
+from sampling import FenwickTree, reservoir_sample, weighted_sample
+
+
+def test_returns_k_distinct_items():
+    picked = reservoir_sample(range(10000), 7, random.Random(1))
+
+    assert len(picked) == 7
+    assert len(set(picked)) == 7
+    assert all(0 <= value < 10000 for value in picked)
+
+
+def test_short_stream_returns_everything():
+    assert sorted(reservoir_sample(iter([3, 1, 2]), 5, random.Random(1))) == [1, 2, 3]
+    assert reservoir_sample(range(10), 0) == []
+
+
+def test_selection_is_roughly_uniform():
+    rng = random.Random(42)
+    counts = Counter()
+    trials = 20000
+    for _ in range(trials):
+        counts.update(reservoir_sample(iter(range(20)), 3, rng))
+
+    expected = trials * 3 / 20
+    assert all(abs(counts[value] - expected) < expected * 0.1 for value in range(20))
+
+
+def test_fenwick_tree_prefix_sums_and_find():
+    tree = FenwickTree([1, 0, 3, 2])
+
+    assert tree.total == 6
+    assert [tree.prefix_sum(i) for i in range(5)] == [0, 1, 1, 4, 6]
+    assert [tree.find(v) for v in (0, 0.5, 1, 3.9, 4, 5.9)] == [0, 0, 2, 2, 3, 3]
+
+    tree.add(1, 5)
+    assert tree.weight(1) == 5
+    assert tree.find(1) == 1
+    assert tree.total == 11
+
+
+def test_weighted_sample_never_picks_zero_weight():
+    picked = weighted_sample("abcd", [1, 0, 1, 0], 4, random.Random(1))
+
+    assert sorted(picked) == ["a", "c"]
+
+
+def test_weighted_sample_follows_weights():
+    rng = random.Random(7)
+    counts = Counter()
+    for _ in range(20000):
+        counts.update(weighted_sample(range(4), [1, 1, 1, 5], 1, rng))
+
+    assert 0.58 < counts[3] / 20000 < 0.67
+    assert all(len(weighted_sample(range(10), [1] * 10, 3, rng)) == 3 for _ in range(5))
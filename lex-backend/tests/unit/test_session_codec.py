@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from session_codec import (
+    decode_chapter_info,
+    decode_exam_state,
+    encode_chapter_info,
+    encode_exam_state,
+    new_exam_state,
+)
+
+
+@pytest.fixture()
+def exam_state():
+    return {
+        "is_finished": False,
+        "max_num": "5",
+        "current_num": 3,
+        "results": [
+            {"id": 4, "result": "incorrect"},
+            {"id": 2, "result": "correct"},
+            {"id": 130, "result": "correct"},
+        ],
+        "q_list": ["4", "2", "130", "7", "1"],
+    }
+
+
+def test_exam_state_round_trip(exam_state):
+    encoded = encode_exam_state(exam_state)
+
+    assert encoded.startswith("~1")
+    assert decode_exam_state(encoded) == exam_state
+
+
+def test_finished_flag_round_trip(exam_state):
+    exam_state["is_finished"] = True
+
+    assert decode_exam_state(encode_exam_state(exam_state))["is_finished"] is True
+
+
+def test_compact_format_is_smaller_than_json(exam_state):
+    assert len(encode_exam_state(exam_state)) < len(json.dumps(exam_state)) / 4
+
+
+def test_new_exam_state_round_trip():
+    state = new_exam_state("3", ["1", "2", "3"])
+
+    assert decode_exam_state(encode_exam_state(state)) == state
+
+
+def test_reads_legacy_json(exam_state):
+    assert decode_exam_state(json.dumps(exam_state)) == exam_state
+    assert decode_exam_state(None) is None
+
+
+def test_results_out_of_question_order_fall_back_to_json(exam_state):
+    exam_state["results"].reverse()
+    encoded = encode_exam_state(exam_state)
+
+    assert encoded.startswith("{")
+    assert decode_exam_state(encoded) == exam_state
+
+
+def test_unknown_version_is_rejected(exam_state):
+    encoded = encode_exam_state(exam_state)
+
+    with pytest.raises(ValueError):
+        decode_exam_state("~9" + encoded[2:])
+
+
+def test_chapter_info_round_trip_and_legacy():
+    chapter_info = {"chapter_code": "A", "question_num": "7"}
+
+    assert encode_chapter_info(chapter_info) == "~1A:7"
+    assert decode_chapter_info("~1A:7") == chapter_info
+    assert decode_chapter_info(json.dumps(chapter_info)) == chapter_info
+    assert decode_chapter_info(None) == {}
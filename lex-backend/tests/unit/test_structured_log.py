@@ -0,0 +1,86 @@
+import json
+import logging
+
+import pytest
+
+import structured_log
+
+
+@pytest.fixture()
+def records(monkeypatch):
+    captured = []
+
+    class Capture(logging.Handler):
+        def emit(self, record):
+            captured.append(structured_log.JsonFormatter().format(record))
+
+    handler = Capture()
+    structured_log.logger.addHandler(handler)
+    monkeypatch.setattr(structured_log.logger, "propagate", False)
+    yield captured
+    structured_log.logger.removeHandler(handler)
+
+
+@pytest.fixture()
+def intent_request():
+    return {
+        "sessionId": "s-1",
+        "invocationSource": "DialogCodeHook",
+        "sessionState": {"intent": {"name": "StartQuiz"}},
+    }
+
+
+def test_end_turn_emits_one_compact_json_line(records, intent_request):
+    started = structured_log.begin_turn("StartQuiz")
+    response = {
+        "sessionState": {
+            "dialogAction": {"type": "ElicitSlot", "slotToElicit": "Answer"}
+        }
+    }
+    structured_log.end_turn(started, intent_request, response)
+
+    assert len(records) == 1
+    line = json.loads(records[0])
+    assert line["msg"] == "turn"
+    assert line["intent"] == "StartQuiz"
+    assert line["action"] == "ElicitSlot"
+    assert line["slotToElicit"] == "Answer"
+    assert "\n" not in records[0]
+
+
+def test_per_intent_levels(monkeypatch, records):
+    monkeypatch.setenv("LOG_LEVEL", "INFO")
+    monkeypatch.setenv("LOG_LEVELS", "StartQuiz=DEBUG, Welcome=WARNING")
+
+    structured_log.begin_turn("StartQuiz")
+    assert structured_log.logger.isEnabledFor(logging.DEBUG)
+    structured_log.begin_turn("Welcome")
+    assert not structured_log.logger.isEnabledFor(logging.INFO)
+    structured_log.begin_turn("CheckChapter")
+    assert structured_log.logger.getEffectiveLevel() == logging.INFO
+
+
+def test_payload_dump_is_sampled(monkeypatch, records):
+    monkeypatch.setenv("LOG_LEVELS", "StartQuiz=DEBUG")
+    structured_log.begin_turn("StartQuiz")
+
+    monkeypatch.setenv("LOG_PAYLOAD_SAMPLE_RATE", "0")
+    structured_log.dump("event", {"a": 1})
+    assert records == []
+
+    monkeypatch.setenv("LOG_PAYLOAD_SAMPLE_RATE", "1")
+    structured_log.dump("event", {"a": 1})
+    assert json.loads(records[0])["payload"] == {"a": 1}
+
+
+def test_lazy_formatting_skips_disabled_levels(monkeypatch, records):
+    monkeypatch.setenv("LOG_LEVEL", "INFO")
+    monkeypatch.delenv("LOG_LEVELS", raising=False)
+    structured_log.begin_turn("Welcome")
+
+    class Expensive:
+        def __str__(self):
+            raise AssertionError("formatted while DEBUG is disabled")
+
+    structured_log.logger.debug("event: %s", Expensive())
+    assert records == []